@@ -0,0 +1,258 @@
+import frappe
+from frappe.utils import flt, getdate, nowdate
+
+from expense_pay.budget import apply_gl_entries_to_budget_spend
+from expense_pay.utils import lock_accounts, logger
+
+
+BALANCE_DOCTYPE = "Expense Pay Account Balance"
+TRACKED_ACCOUNTS_CACHE_KEY = "expense_pay:balance_tracked_accounts"
+
+# GL rows of this voucher type are applied in batches by the expense_pay posting paths
+EXPENSES_ENTRY_VOUCHER_TYPE = "Expenses Entry"
+
+
+def get_account_balance(account, posting_date=None):
+    """
+    Balance (debit - credit, company currency) of `account` as of `posting_date`.
+
+    Reads the closing balance of the latest tracked day on or before the date through the
+    (account, posting_date) unique index. Accounts used as Account Paid From are seeded by
+    the daily `verify_account_balances`; until then the GL is aggregated live. Never
+    writes, so it is safe from draft saves and read endpoints.
+    """
+    if not account:
+        return 0.0
+    posting_date = getdate(posting_date or nowdate())
+
+    if account not in get_tracked_accounts():
+        return flt(
+            frappe.db.sql(
+                """select sum(debit) - sum(credit) from `tabGL Entry`
+                where account = %s and posting_date <= %s and is_cancelled = 0""",
+                (account, posting_date),
+            )[0][0]
+        )
+
+    balance = frappe.db.sql(
+        f"""select balance from `tab{BALANCE_DOCTYPE}`
+        where account = %s and posting_date <= %s
+        order by posting_date desc limit 1""",
+        (account, posting_date),
+    )
+    return flt(balance[0][0]) if balance else 0.0
+
+
+@frappe.whitelist()
+def get_balance_for_expenses_entry(account, posting_date=None):
+    frappe.has_permission("Account", "read", account, throw=True)
+    return get_account_balance(account, posting_date)
+
+
+def apply_gl_entries_to_balances(gl_entries, sign=1):
+    """
+    Add GL rows (dicts) posted or removed by expense_pay to the running balances of the
+    tracked accounts, one update per (account, posting_date), and to the budget spend
+    counters. Reversal rows carry swapped debit/credit, so posting them with sign=1 offsets
+    the rows they cancel.
+
+    Postings of other vouchers reach the balances through `on_gl_entry_submit`.
+    """
+    deltas = {}
+    for d in gl_entries:
+        key = (d.get("company"), d.get("account"), getdate(d.get("posting_date")))
+        deltas[key] = deltas.get(key, 0.0) + sign * (flt(d.get("debit")) - flt(d.get("credit")))
+    _apply_deltas(deltas)
+    apply_gl_entries_to_budget_spend(gl_entries, sign)
+
+
+def remove_voucher_from_balances(voucher_type, voucher_nos):
+    """
+    Take the voucher's active GL rows out of the running balances.
+
+    Call before GL rows are deleted or flagged is_cancelled without posting reversal rows.
+    """
+    if isinstance(voucher_nos, str):
+        voucher_nos = [voucher_nos]
+    voucher_nos = list(voucher_nos or [])
+    if not voucher_nos:
+        return
+
+    rows = frappe.db.sql(
+        """select company, account, cost_center, project, posting_date,
+            sum(debit) as debit, sum(credit) as credit
+        from `tabGL Entry`
+        where voucher_type = %s and voucher_no in %s and is_cancelled = 0
+        group by company, account, cost_center, project, posting_date""",
+        (voucher_type, voucher_nos),
+        as_dict=True,
+    )
+    apply_gl_entries_to_balances(rows, sign=-1)
+
+
+def on_gl_entry_submit(doc, method=None):
+    """
+    GL Entry on_submit: follow postings of other vouchers (Journal Entry, Payment Entry...)
+    to tracked accounts.
+
+    Deltas are only collected here and applied once per transaction just before commit, in
+    the sorted account lock order of GL posting; no lock is taken in the voucher's row
+    order and untracked accounts cost one cached set lookup.
+    """
+    if doc.voucher_type == EXPENSES_ENTRY_VOUCHER_TYPE or doc.account not in get_tracked_accounts():
+        return
+
+    pending = getattr(frappe.local, "expense_pay_pending_balance_deltas", None)
+    if pending is None:
+        pending = {}
+        frappe.local.expense_pay_pending_balance_deltas = pending
+        frappe.db.before_commit.add(_apply_pending_deltas)
+        frappe.db.after_rollback.add(_clear_pending_deltas)
+    key = (doc.company, doc.account, getdate(doc.posting_date))
+    pending[key] = pending.get(key, 0.0) + flt(doc.debit) - flt(doc.credit)
+
+
+def _apply_pending_deltas():
+    deltas = getattr(frappe.local, "expense_pay_pending_balance_deltas", None) or {}
+    _clear_pending_deltas()
+    _apply_deltas(deltas)
+
+
+def _clear_pending_deltas():
+    frappe.local.expense_pay_pending_balance_deltas = None
+
+
+def get_tracked_accounts():
+    """Accounts that have running balances (a small set, cached in Redis)."""
+    return set(
+        frappe.cache().get_value(
+            TRACKED_ACCOUNTS_CACHE_KEY,
+            generator=lambda: frappe.db.sql_list(f"select distinct account from `tab{BALANCE_DOCTYPE}`"),
+        )
+        or []
+    )
+
+
+def _clear_tracked_accounts_cache():
+    frappe.cache().delete_value(TRACKED_ACCOUNTS_CACHE_KEY)
+
+
+def _apply_deltas(deltas):
+    deltas = {key: amount for key, amount in deltas.items() if key[1] and abs(amount) >= 1e-9}
+    if not deltas:
+        return
+
+    # Same lock order as GL posting, so balance maintenance cannot deadlock with it. Reads
+    # below lock too: a plain read could miss rows committed while waiting for the lock.
+    lock_accounts({account for _company, account, _date in deltas})
+
+    for company, account, posting_date in sorted(deltas, key=lambda key: (key[1], key[2])):
+        if not _is_tracked(account, for_update=True):
+            continue
+
+        if not frappe.db.sql(
+            f"""select name from `tab{BALANCE_DOCTYPE}`
+            where account = %s and posting_date = %s for update""",
+            (account, posting_date),
+        ):
+            previous = frappe.db.sql(
+                f"""select balance from `tab{BALANCE_DOCTYPE}`
+                where account = %s and posting_date < %s
+                order by posting_date desc limit 1 for update""",
+                (account, posting_date),
+            )
+            _insert_balance(company, account, posting_date, flt(previous[0][0]) if previous else 0.0)
+
+        frappe.db.sql(
+            f"""update `tab{BALANCE_DOCTYPE}` set balance = balance + %s
+            where account = %s and posting_date >= %s""",
+            (deltas[(company, account, posting_date)], account, posting_date),
+        )
+
+
+def _is_tracked(account, for_update=False):
+    query = f"select name from `tab{BALANCE_DOCTYPE}` where account = %s limit 1"
+    return bool(frappe.db.sql(f"{query} for update" if for_update else query, (account,)))
+
+
+def _insert_balance(company, account, posting_date, balance):
+    doc = frappe.new_doc(BALANCE_DOCTYPE)
+    doc.update({"company": company, "account": account, "posting_date": posting_date, "balance": balance})
+    doc.db_insert()
+
+
+def _rebuild_account_balance(account):
+    """
+    Recompute all tracked days of an account from a full aggregate of its active GL rows.
+
+    Runs under the Account row lock: a concurrent rebuild waits, then its delete sees the
+    committed rows and it rebuilds over them instead of hitting the unique index.
+    """
+    lock_accounts([account])
+    frappe.db.delete(BALANCE_DOCTYPE, {"account": account})
+
+    daily = frappe.db.sql(
+        """select company, posting_date, sum(debit) - sum(credit) as amount
+        from `tabGL Entry`
+        where account = %s and is_cancelled = 0
+        group by company, posting_date
+        order by posting_date""",
+        (account,),
+        as_dict=True,
+    )
+    balance = 0.0
+    for d in daily:
+        balance += flt(d.amount)
+        _insert_balance(d.company, account, d.posting_date, balance)
+
+    _clear_tracked_accounts_cache()
+    frappe.db.after_commit.add(_clear_tracked_accounts_cache)
+
+
+def verify_account_balances():
+    """
+    Nightly check: seed the Account Paid From accounts that are not tracked yet, compare
+    the latest tracked balance of every account with a full GL aggregate and rebuild the
+    accounts that drifted (e.g. GL rows deleted by other apps).
+    """
+    for account in frappe.db.sql_list(
+        f"""select distinct ee.account_paid_from
+        from `tabExpenses Entry` ee
+        where ee.docstatus = 1 and ifnull(ee.account_paid_from, '') != ''
+            and not exists (select 1 from `tab{BALANCE_DOCTYPE}` b where b.account = ee.account_paid_from)"""
+    ):
+        _rebuild_account_balance(account)
+        frappe.db.commit()
+
+    tracked = frappe.db.sql(
+        f"""select b.account, b.balance
+        from `tab{BALANCE_DOCTYPE}` b
+        inner join (
+            select account, max(posting_date) as posting_date
+            from `tab{BALANCE_DOCTYPE}` group by account
+        ) latest on latest.account = b.account and latest.posting_date = b.posting_date""",
+        as_dict=True,
+    )
+    if not tracked:
+        return []
+
+    actual = dict(
+        frappe.db.sql(
+            """select account, sum(debit) - sum(credit)
+            from `tabGL Entry`
+            where is_cancelled = 0 and account in %s
+            group by account""",
+            ([d.account for d in tracked],),
+        )
+    )
+
+    drifted = []
+    for d in tracked:
+        if abs(flt(d.balance) - flt(actual.get(d.account))) >= 0.005:
+            drifted.append(d.account)
+            _rebuild_account_balance(d.account)
+            frappe.db.commit()
+
+    if drifted:
+        logger.warning(f"Rebuilt running balances of drifted accounts: {drifted}")
+    return drifted
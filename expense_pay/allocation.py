@@ -0,0 +1,114 @@
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+ALLOCATION_RULE_DOCTYPE = "Expense Allocation Rule"
+ALLOCATION_RULE_CACHE_KEY = "expense_pay:allocation_rules"
+
+# Percentages are compiled to integer weights (1% = 10000) so splits use exact integer arithmetic
+PERCENT_WEIGHT = 10000
+
+
+def get_split_table(rule):
+    """
+    Return the compiled split table of an allocation rule:
+    ``{"company", "cost_centers": [...], "weights": [...]}``.
+
+    Compiled once per rule and cached in Redis (cleared when the rule changes) and in
+    process memory for the rest of the request.
+    """
+    local_cache = getattr(frappe.local, "expense_pay_split_tables", None)
+    if local_cache is None:
+        local_cache = {}
+        frappe.local.expense_pay_split_tables = local_cache
+    if rule not in local_cache:
+        local_cache[rule] = frappe.cache().hget(
+            ALLOCATION_RULE_CACHE_KEY, rule, generator=lambda: _compile_split_table(rule)
+        )
+    return local_cache[rule]
+
+
+def _compile_split_table(rule):
+    doc = frappe.get_doc(ALLOCATION_RULE_DOCTYPE, rule)
+    if doc.disabled:
+        frappe.throw(_("Allocation Rule {0} is disabled.").format(frappe.bold(rule)))
+    return {
+        "company": doc.company,
+        "cost_centers": [d.cost_center for d in doc.allocations],
+        "weights": [cint(round(flt(d.percentage) * PERCENT_WEIGHT)) for d in doc.allocations],
+    }
+
+
+def clear_allocation_rule_cache(rule=None):
+    if rule:
+        frappe.cache().hdel(ALLOCATION_RULE_CACHE_KEY, rule)
+    else:
+        frappe.cache().delete_value(ALLOCATION_RULE_CACHE_KEY)
+    frappe.local.expense_pay_split_tables = {}
+
+
+def split_amount(split_table, amount, precision):
+    """
+    Split `amount` across the table's cost centers by weight, rounded to `precision`.
+
+    Largest remainder method on integer units of the precision: the parts always add up to
+    the amount exactly; leftover units go to the largest fractional shares (ties to the
+    first row). Returns ``[(cost_center, amount), ...]`` without zero parts.
+    """
+    scale = 10**precision
+    units = int(round(abs(flt(amount)) * scale))
+    sign = -1 if flt(amount) < 0 else 1
+    weights = split_table["weights"]
+    total_weight = sum(weights)
+    if not units or not total_weight:
+        return []
+
+    shares = []
+    remainders = []
+    for i, weight in enumerate(weights):
+        share, remainder = divmod(units * weight, total_weight)
+        shares.append(share)
+        remainders.append((-remainder, i))
+
+    for _remainder, i in sorted(remainders)[: units - sum(shares)]:
+        shares[i] += 1
+
+    return [
+        (cost_center, sign * share / scale)
+        for cost_center, share in zip(split_table["cost_centers"], shares)
+        if share
+    ]
+
+
+def set_allocation_splits(doc):
+    """
+    Store the split table of each allocated line on the line (on submit).
+
+    Reposts after submit and reports then split the line as it was posted, even after the
+    rule is edited or disabled.
+    """
+    for expense in doc.expenses:
+        if expense.allocation_rule and not expense.allocation_split:
+            split_table = get_split_table(expense.allocation_rule)
+            expense.allocation_split = json.dumps(
+                {"cost_centers": split_table["cost_centers"], "weights": split_table["weights"]}
+            )
+
+
+def get_line_split_table(expense):
+    """Split table of an allocated line: the one stored at submit, else the rule's current one."""
+    if expense.get("allocation_split"):
+        return json.loads(expense.allocation_split)
+    return get_split_table(expense.allocation_rule)
+
+
+def get_cost_center_amounts(doc, expense, amount, precision):
+    """
+    Cost center split of one expense line: by its allocation rule if set, otherwise the
+    line's cost center (or the voucher default) for the full amount.
+    """
+    if not expense.get("allocation_rule"):
+        return [(expense.cost_center or doc.default_cost_center, amount)]
+    return split_amount(get_line_split_table(expense), amount, precision)
@@ -0,0 +1,150 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY
+
+API_MAX_PAGE_LENGTH = 1000
+
+POSTING_STATUS_DRAFT = "Draft"
+POSTING_STATUS_POSTED = "Posted"
+POSTING_STATUS_NOT_POSTED = "Not Posted"
+POSTING_STATUS_UNBALANCED = "Unbalanced"
+POSTING_STATUS_CANCELLED = "Cancelled"
+
+HEADER_FIELDS = (
+    "name",
+    "posting_date",
+    "company",
+    "docstatus",
+    "payment_type",
+    "account_paid_from",
+    "default_cost_center",
+    "paid_amount",
+    "multi_currency",
+    "exchange_rate",
+    "paid_amount_in_account_currency",
+    "total_debit",
+    "remarks",
+    "modified",
+)
+
+EXPENSE_FIELDS = (
+    "parent",
+    "name",
+    "idx",
+    "expense_entry_type",
+    "account_paid_to",
+    "cost_center",
+    "allocation_rule",
+    "project",
+    "vat_template",
+    "amount_without_vat",
+    "vat_amount",
+    "amount",
+    "account_currency",
+    "exchange_rate",
+    "amount_in_account_currency",
+    "remarks",
+)
+
+
+@frappe.whitelist()
+def get_expenses_entries(filters=None, after=None, page_length=500):
+    """
+    Page through Expenses Entries with their expense rows and GL posting status.
+
+    Pages are ordered by (posting_date, name) and continued with the `next_cursor` of the
+    previous response passed as `after`, so every page costs the same regardless of depth.
+    A page is served by three queries: headers (with read permission applied), expense
+    rows, and GL aggregates. Returns ``{"data": [...], "next_cursor": {...} | None}``.
+    """
+    filters = frappe.parse_json(filters) if filters else {}
+    after = frappe.parse_json(after) if after else None
+    page_length = min(cint(page_length) or 500, API_MAX_PAGE_LENGTH)
+
+    if isinstance(filters, dict):
+        filters = [[VOUCHER_TYPE_EXPENSES_ENTRY, field, "=", value] for field, value in filters.items()]
+    or_filters = None
+    if after:
+        if not (after.get("posting_date") and after.get("name")):
+            frappe.throw(_("The `after` cursor needs posting_date and name."))
+        # (posting_date, name) > (after.posting_date, after.name)
+        filters.append([VOUCHER_TYPE_EXPENSES_ENTRY, "posting_date", ">=", after["posting_date"]])
+        or_filters = [
+            [VOUCHER_TYPE_EXPENSES_ENTRY, "posting_date", ">", after["posting_date"]],
+            [VOUCHER_TYPE_EXPENSES_ENTRY, "name", ">", after["name"]],
+        ]
+
+    headers = frappe.get_list(
+        VOUCHER_TYPE_EXPENSES_ENTRY,
+        filters=filters,
+        or_filters=or_filters,
+        fields=list(HEADER_FIELDS),
+        order_by="posting_date asc, name asc",
+        limit_page_length=page_length,
+    )
+    if not headers:
+        return {"data": [], "next_cursor": None}
+
+    names = [d.name for d in headers]
+    expenses = _get_expenses_by_parent(names)
+    gl_totals = _get_gl_totals(names)
+
+    for d in headers:
+        d.expenses = expenses.get(d.name, [])
+        d.gl = gl_totals.get(d.name) or frappe._dict(active_rows=0, cancelled_rows=0, debit=0.0, credit=0.0)
+        d.posting_status = _get_posting_status(d, d.gl)
+
+    next_cursor = None
+    if len(headers) == page_length:
+        next_cursor = {"posting_date": str(headers[-1].posting_date), "name": headers[-1].name}
+    return {"data": headers, "next_cursor": next_cursor}
+
+
+def _get_expenses_by_parent(names):
+    expenses = {}
+    for d in frappe.get_all(
+        "Expenses",
+        filters={"parenttype": VOUCHER_TYPE_EXPENSES_ENTRY, "parentfield": "expenses", "parent": ["in", names]},
+        fields=list(EXPENSE_FIELDS),
+        order_by="parent asc, idx asc",
+    ):
+        expenses.setdefault(d.pop("parent"), []).append(d)
+    return expenses
+
+
+def _get_gl_totals(names):
+    rows = frappe.db.sql(
+        """select voucher_no,
+            sum(is_cancelled = 0) as active_rows,
+            sum(is_cancelled = 1) as cancelled_rows,
+            sum(if(is_cancelled = 0, debit, 0)) as debit,
+            sum(if(is_cancelled = 0, credit, 0)) as credit
+        from `tabGL Entry`
+        where voucher_type = %s and voucher_no in %s
+        group by voucher_no""",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, names),
+        as_dict=True,
+    )
+    return {
+        d.voucher_no: frappe._dict(
+            active_rows=cint(d.active_rows),
+            cancelled_rows=cint(d.cancelled_rows),
+            debit=flt(d.debit),
+            credit=flt(d.credit),
+        )
+        for d in rows
+    }
+
+
+def _get_posting_status(header, gl):
+    if header.docstatus == 0:
+        return POSTING_STATUS_DRAFT
+    if header.docstatus == 2:
+        return POSTING_STATUS_CANCELLED
+    if not gl.active_rows:
+        return POSTING_STATUS_NOT_POSTED
+    if abs(gl.debit - gl.credit) >= 0.005:
+        return POSTING_STATUS_UNBALANCED
+    return POSTING_STATUS_POSTED
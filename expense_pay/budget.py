@@ -0,0 +1,310 @@
+import frappe
+from frappe import _
+from frappe.utils import flt, fmt_money, getdate
+
+from expense_pay.utils import lock_accounts, logger
+
+
+SPEND_DOCTYPE = "Expense Pay Budget Spend"
+BUDGET_CACHE_KEY = "expense_pay:budgets"
+SPEND_CACHE_KEY = "expense_pay:budget_spend"
+
+# Budget "against" dimensions and the GL Entry field that carries them
+BUDGET_DIMENSIONS = (("Cost Center", "cost_center"), ("Project", "project"))
+
+BUDGET_ACTION_STOP = "Stop"
+BUDGET_ACTION_WARN = "Warn"
+
+
+def validate_budget(doc, gl_entries):
+    """
+    Check the expense GL rows of a voucher against the submitted ERPNext Budgets of its
+    fiscal year (annual budget on actual expenses).
+
+    Costs one indexed counter read per distinct (cost center / project, account) with a
+    budget. The voucher's accounts and then those counters are locked (the order GL posting
+    uses) until the transaction ends, so concurrent submits against one budget are checked
+    one after the other instead of both passing the limit.
+    For a voucher edited after submit only the change against its posted rows is counted,
+    and vouchers of the same batch whose GL rows are not posted yet are added to the spend
+    (see `add_pending_budget_spend`).
+    Stops or warns according to the budget's "Action if Annual Budget Exceeded on Actual".
+    """
+    fiscal_year, from_date, to_date = _get_fiscal_year(doc.posting_date, doc.company)
+    budgets = get_budgets(doc.company, fiscal_year)
+    if not budgets:
+        return
+
+    amounts = _get_budget_amounts(gl_entries)
+    if doc.docstatus == 1:
+        for key, amount in _get_budget_amounts(_get_posted_gl_entries(doc.doctype, doc.name)).items():
+            amounts[key] = amounts.get(key, 0.0) - amount
+
+    budgeted = [
+        (key, amount) for key, amount in sorted(amounts.items()) if budgets.get("|".join(key)) and amount > 0
+    ]
+    if not budgeted:
+        return
+    lock_accounts(d.get("account") for d in gl_entries)
+
+    currency = frappe.get_cached_value("Company", doc.company, "default_currency")
+    pending = _get_pending_spend()
+    exceeded = {BUDGET_ACTION_STOP: [], BUDGET_ACTION_WARN: []}
+    for key, amount in budgeted:
+        budget = budgets["|".join(key)]
+        budget_against, budget_against_value, account = key
+        spent = get_budget_spend(
+            doc.company,
+            budget_against,
+            budget_against_value,
+            account,
+            fiscal_year,
+            from_date,
+            to_date,
+            for_update=True,
+        )
+        spent += pending.get((*key, fiscal_year), 0.0)
+        excess = flt(spent + amount - budget["amount"], 2)
+        if excess > 0:
+            exceeded[budget["action"]].append(
+                _("Annual Budget for Account {0} against {1} {2} is {3}. It will be exceeded by {4}.").format(
+                    frappe.bold(account),
+                    _(budget_against),
+                    frappe.bold(budget_against_value),
+                    fmt_money(budget["amount"], currency=currency),
+                    fmt_money(excess, currency=currency),
+                )
+            )
+
+    if exceeded[BUDGET_ACTION_STOP]:
+        frappe.throw("<br>".join(exceeded[BUDGET_ACTION_STOP]), title=_("Budget Exceeded"))
+    if exceeded[BUDGET_ACTION_WARN]:
+        frappe.msgprint("<br>".join(exceeded[BUDGET_ACTION_WARN]), title=_("Budget Exceeded"), indicator="orange")
+
+
+def add_pending_budget_spend(doc, gl_entries):
+    """
+    Count the GL rows of a voucher submitted in a batch whose rows are posted together at
+    the end (see expense_pay.recurring), so the budget checks of the next vouchers in the
+    batch include it. Clear with `clear_pending_budget_spend` once the batch is posted or
+    rolled back.
+    """
+    fiscal_year = _get_fiscal_year(doc.posting_date, doc.company)[0]
+    pending = _get_pending_spend()
+    for key, amount in _get_budget_amounts(gl_entries).items():
+        pending[(*key, fiscal_year)] = pending.get((*key, fiscal_year), 0.0) + amount
+
+
+def clear_pending_budget_spend():
+    frappe.local.expense_pay_pending_budget_spend = {}
+
+
+def _get_pending_spend():
+    pending = getattr(frappe.local, "expense_pay_pending_budget_spend", None)
+    if pending is None:
+        pending = {}
+        frappe.local.expense_pay_pending_budget_spend = pending
+    return pending
+
+
+def get_budgets(company, fiscal_year):
+    """
+    Submitted budgets enforced on actual expenses for a company and fiscal year, cached in
+    Redis as ``{"<budget_against>|<value>|<account>": {"budget", "amount", "action"}}``.
+    """
+    cache_field = f"{company}|{fiscal_year}"
+    budgets = frappe.cache().hget(BUDGET_CACHE_KEY, cache_field)
+    if budgets is None:
+        budgets = {}
+        for d in frappe.db.sql(
+            """select b.name, b.budget_against, b.cost_center, b.project,
+                b.action_if_annual_budget_exceeded as action, ba.account, ba.budget_amount
+            from `tabBudget` b
+            inner join `tabBudget Account` ba on ba.parent = b.name and ba.parenttype = 'Budget'
+            where b.company = %s and b.fiscal_year = %s and b.docstatus = 1
+                and b.applicable_on_booking_actual_expenses = 1
+                and b.action_if_annual_budget_exceeded in %s""",
+            (company, fiscal_year, (BUDGET_ACTION_STOP, BUDGET_ACTION_WARN)),
+            as_dict=True,
+        ):
+            value = d.cost_center if d.budget_against == "Cost Center" else d.project
+            budgets[f"{d.budget_against}|{value}|{d.account}"] = {
+                "budget": d.name,
+                "amount": flt(d.budget_amount),
+                "action": d.action,
+            }
+        frappe.cache().hset(BUDGET_CACHE_KEY, cache_field, budgets)
+    return budgets
+
+
+def clear_budget_cache(doc=None, method=None):
+    """Budget on_submit / on_cancel / on_update_after_submit."""
+    frappe.cache().delete_value(BUDGET_CACHE_KEY)
+
+
+def get_budget_spend(
+    company, budget_against, budget_against_value, account, fiscal_year, from_date, to_date, for_update=False
+):
+    """
+    Actual spend for a budget key in a fiscal year: Redis, then the counter row, then a
+    one-time GL seed. With `for_update` the counter row is read with a lock (and Redis is
+    skipped); the caller must hold the account's lock, which also serializes the seed.
+    """
+    cache_field = _spend_cache_field(budget_against, budget_against_value, account, from_date)
+    if not for_update:
+        spent = frappe.cache().hget(SPEND_CACHE_KEY, cache_field)
+        if spent is not None:
+            return flt(spent)
+
+    spent = frappe.db.get_value(
+        SPEND_DOCTYPE,
+        {
+            "budget_against": budget_against,
+            "budget_against_value": budget_against_value,
+            "account": account,
+            "fiscal_year": fiscal_year,
+        },
+        "spent",
+        for_update=for_update,
+    )
+    if spent is None:
+        spent = _seed_spend(company, budget_against, budget_against_value, account, fiscal_year, from_date, to_date)
+
+    if not for_update:
+        frappe.cache().hset(SPEND_CACHE_KEY, cache_field, flt(spent))
+    return flt(spent)
+
+
+def apply_gl_entries_to_budget_spend(gl_entries, sign=1):
+    """
+    Add GL rows posted or removed by expense_pay to the spend counters of their cost
+    center and project. Called after the rows' accounts are locked.
+
+    Only counters that exist are updated; the others are seeded from the GL the first time
+    a budget check needs them. Postings made outside expense_pay are not followed;
+    `verify_budget_spend` corrects the counters they moved every night.
+    """
+    deltas = {}
+    for d in gl_entries:
+        amount = sign * (flt(d.get("debit")) - flt(d.get("credit")))
+        for budget_against, fieldname in BUDGET_DIMENSIONS:
+            if d.get(fieldname) and d.get("account"):
+                key = (budget_against, d.get(fieldname), d.get("account"), getdate(d.get("posting_date")))
+                deltas[key] = deltas.get(key, 0.0) + amount
+
+    cache_fields = []
+    for (budget_against, budget_against_value, account, posting_date), amount in sorted(deltas.items()):
+        if abs(amount) < 1e-9:
+            continue
+        counters = frappe.db.sql(
+            f"""select name, from_date from `tab{SPEND_DOCTYPE}`
+            where budget_against_value = %s and account = %s and budget_against = %s
+                and from_date <= %s and to_date >= %s""",
+            (budget_against_value, account, budget_against, posting_date, posting_date),
+            as_dict=True,
+        )
+        for counter in counters:
+            frappe.db.sql(
+                f"update `tab{SPEND_DOCTYPE}` set spent = spent + %s where name = %s", (amount, counter.name)
+            )
+            cache_fields.append(_spend_cache_field(budget_against, budget_against_value, account, counter.from_date))
+
+    if cache_fields:
+        _clear_spend_cache(cache_fields)
+
+
+def verify_budget_spend():
+    """Nightly check: recompute every spend counter from the GL and fix the ones that drifted."""
+    drifted = []
+    for budget_against, fieldname in BUDGET_DIMENSIONS:
+        for d in frappe.db.sql(
+            f"""select s.name, s.budget_against_value, s.account, s.from_date, s.spent,
+                (select ifnull(sum(gle.debit) - sum(gle.credit), 0)
+                    from `tabGL Entry` gle
+                    where gle.account = s.account and gle.`{fieldname}` = s.budget_against_value
+                        and gle.posting_date between s.from_date and s.to_date and gle.is_cancelled = 0
+                ) as actual
+            from `tab{SPEND_DOCTYPE}` s
+            where s.budget_against = %s""",
+            (budget_against,),
+            as_dict=True,
+        ):
+            if abs(flt(d.spent) - flt(d.actual)) >= 0.005:
+                frappe.db.set_value(SPEND_DOCTYPE, d.name, "spent", flt(d.actual), update_modified=False)
+                drifted.append(_spend_cache_field(budget_against, d.budget_against_value, d.account, d.from_date))
+
+    if drifted:
+        frappe.db.commit()
+        _clear_spend_cache(drifted)
+        logger.warning(f"Corrected drifted budget spend counters: {drifted}")
+    return drifted
+
+
+def _seed_spend(company, budget_against, budget_against_value, account, fiscal_year, from_date, to_date):
+    fieldname = dict(BUDGET_DIMENSIONS)[budget_against]
+    spent = frappe.db.sql(
+        f"""select ifnull(sum(debit) - sum(credit), 0)
+        from `tabGL Entry`
+        where account = %s and `{fieldname}` = %s and posting_date between %s and %s and is_cancelled = 0""",
+        (account, budget_against_value, from_date, to_date),
+    )[0][0]
+
+    counter = frappe.new_doc(SPEND_DOCTYPE)
+    counter.update(
+        {
+            "company": company,
+            "budget_against": budget_against,
+            "budget_against_value": budget_against_value,
+            "account": account,
+            "fiscal_year": fiscal_year,
+            "from_date": from_date,
+            "to_date": to_date,
+            "spent": flt(spent),
+        }
+    )
+    counter.db_insert()
+    return flt(spent)
+
+
+def _get_budget_amounts(gl_entries):
+    """Net debit per (budget_against, value, account)."""
+    amounts = {}
+    for d in gl_entries:
+        amount = flt(d.get("debit")) - flt(d.get("credit"))
+        for budget_against, fieldname in BUDGET_DIMENSIONS:
+            if d.get(fieldname) and d.get("account"):
+                key = (budget_against, d.get(fieldname), d.get("account"))
+                amounts[key] = amounts.get(key, 0.0) + amount
+    return amounts
+
+
+def _get_posted_gl_entries(voucher_type, voucher_no):
+    return frappe.db.sql(
+        """select account, cost_center, project, sum(debit) as debit, sum(credit) as credit
+        from `tabGL Entry`
+        where voucher_type = %s and voucher_no = %s and is_cancelled = 0
+        group by account, cost_center, project""",
+        (voucher_type, voucher_no),
+        as_dict=True,
+    )
+
+
+def _get_fiscal_year(posting_date, company):
+    from erpnext.accounts.utils import get_fiscal_year
+
+    fiscal_year, from_date, to_date = get_fiscal_year(posting_date, company=company)[:3]
+    return fiscal_year, getdate(from_date), getdate(to_date)
+
+
+def _spend_cache_field(budget_against, budget_against_value, account, from_date):
+    return f"{budget_against}|{budget_against_value}|{account}|{getdate(from_date)}"
+
+
+def _clear_spend_cache(cache_fields):
+    def clear():
+        for cache_field in cache_fields:
+            frappe.cache().hdel(SPEND_CACHE_KEY, cache_field)
+
+    # Clear now and again after commit, so a reader cannot re-cache the pre-commit value
+    clear()
+    frappe.db.after_commit.add(clear)
@@ -0,0 +1,245 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, create_batch, now
+
+from expense_pay.account_balance import remove_voucher_from_balances
+from expense_pay.create_gl_entry import (
+    VOUCHER_TYPE_EXPENSES_ENTRY,
+    _get_vat_account,
+    _post_gl_entries,
+    build_reversal_gl_entries,
+    logger,
+)
+from expense_pay.gl_archive import delete_archived_gl_entries
+
+BULK_ACTION_CANCEL = "cancel"
+BULK_ACTION_DELETE = "delete"
+BULK_CHUNK_SIZE = 100
+
+
+@frappe.whitelist()
+def bulk_cancel_expenses_entries(names=None, filters=None, chunk_size=BULK_CHUNK_SIZE, run_in_background=0):
+    """
+    Cancel many submitted Expenses Entries, selected by a list of names and/or filters.
+
+    GL reversals (or deletions for vouchers with group accounts / missing accounts) are
+    written for a whole chunk at once with one commit per chunk and no per-document messages.
+    Returns a summary dict.
+    """
+    return _run_bulk_action(BULK_ACTION_CANCEL, names, filters, chunk_size, run_in_background)
+
+
+@frappe.whitelist()
+def bulk_delete_expenses_entries(names=None, filters=None, chunk_size=BULK_CHUNK_SIZE, run_in_background=0):
+    """
+    Delete many Expenses Entries together with their GL Entries.
+
+    Submitted documents are cancelled first without posting reversals, since their GL
+    Entries are deleted anyway. Returns a summary dict.
+    """
+    return _run_bulk_action(BULK_ACTION_DELETE, names, filters, chunk_size, run_in_background)
+
+
+def _run_bulk_action(action, names, filters, chunk_size, run_in_background=0):
+    names = _get_target_names(action, names, filters)
+    if cint(run_in_background):
+        frappe.enqueue(
+            "expense_pay.bulk_actions.process_bulk_action",
+            queue="long",
+            timeout=3600,
+            action=action,
+            names=names,
+            chunk_size=chunk_size,
+            user=frappe.session.user,
+        )
+        return {"queued": True, "total": len(names)}
+    return process_bulk_action(action, names, chunk_size)
+
+
+def _get_target_names(action, names=None, filters=None):
+    names = frappe.parse_json(names) if names else None
+    filters = frappe.parse_json(filters) if filters else None
+    if not names and not filters:
+        frappe.throw(_("Select the Expenses Entries to process by name or by filters."))
+
+    if isinstance(filters, list):
+        filters = list(filters)
+    else:
+        filters = [[VOUCHER_TYPE_EXPENSES_ENTRY, field, "=", value] for field, value in (filters or {}).items()]
+    if names:
+        filters.append([VOUCHER_TYPE_EXPENSES_ENTRY, "name", "in", names])
+    if action == BULK_ACTION_CANCEL:
+        filters.append([VOUCHER_TYPE_EXPENSES_ENTRY, "docstatus", "=", 1])
+
+    return frappe.get_list(
+        VOUCHER_TYPE_EXPENSES_ENTRY, filters=filters, pluck="name", order_by="name", limit_page_length=0
+    )
+
+
+def process_bulk_action(action, names, chunk_size=BULK_CHUNK_SIZE, user=None):
+    summary = frappe._dict(
+        action=action, total=len(names), succeeded=0, gl_reversed=0, gl_deleted=0, failed=[]
+    )
+
+    for chunk in create_batch(names, cint(chunk_size) or BULK_CHUNK_SIZE):
+        try:
+            result = _process_chunk(action, chunk)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            logger.warning(
+                f"Bulk {action} failed for chunk {chunk[0]}..{chunk[-1]}, retrying per document: "
+                f"{frappe.get_traceback()}"
+            )
+            result = _process_chunk_per_document(action, chunk)
+
+        summary.succeeded += result.succeeded
+        summary.gl_reversed += result.gl_reversed
+        summary.gl_deleted += result.gl_deleted
+        summary.failed.extend(result.failed)
+
+    logger.info(
+        f"Bulk {action}: {summary.succeeded}/{summary.total} Expenses Entries processed, "
+        f"{len(summary.failed)} failed"
+    )
+    if user:
+        frappe.publish_realtime(
+            "msgprint",
+            _("Bulk {0} of Expenses Entries finished: {1} of {2} processed, {3} failed.").format(
+                _(action), summary.succeeded, summary.total, len(summary.failed)
+            ),
+            user=user,
+        )
+    return summary
+
+
+def _process_chunk(action, names):
+    """Process one chunk with the GL hooks disabled and GL rows handled in grouped queries."""
+    result = frappe._dict(succeeded=0, gl_reversed=0, gl_deleted=0, failed=[])
+    docs = [frappe.get_doc(VOUCHER_TYPE_EXPENSES_ENTRY, name) for name in names]
+
+    mute_messages = frappe.flags.mute_messages
+    frappe.flags.mute_messages = True
+    frappe.flags.in_bulk_expenses_action = True
+    try:
+        if action == BULK_ACTION_CANCEL:
+            with_gl = _get_vouchers_with_gl(names, active_only=True)
+            invalid = _get_vouchers_with_invalid_accounts(docs) & with_gl
+            to_reverse = [doc for doc in docs if doc.name in with_gl and doc.name not in invalid]
+
+            for doc in docs:
+                doc.ignore_linked_doctypes = ("GL Entry",)
+                doc.cancel()
+
+            _delete_gl_entries_bulk(invalid)
+            _reverse_gl_entries_bulk(to_reverse)
+            result.gl_deleted = len(invalid)
+            result.gl_reversed = len(to_reverse)
+        else:
+            # Cancelled vouchers keep their original and reversal rows: delete those too
+            with_gl = _get_vouchers_with_gl(names)
+            _delete_gl_entries_bulk(with_gl)
+            delete_archived_gl_entries(names)
+            result.gl_deleted = len(with_gl)
+            for doc in docs:
+                if doc.docstatus == 1:
+                    doc.ignore_linked_doctypes = ("GL Entry",)
+                    doc.cancel()
+                frappe.delete_doc(VOUCHER_TYPE_EXPENSES_ENTRY, doc.name)
+    finally:
+        frappe.flags.in_bulk_expenses_action = False
+        frappe.flags.mute_messages = mute_messages
+
+    result.succeeded = len(docs)
+    return result
+
+
+def _process_chunk_per_document(action, names):
+    """Fallback: run each document through the regular cancel / delete hooks."""
+    result = frappe._dict(succeeded=0, gl_reversed=0, gl_deleted=0, failed=[])
+    mute_messages = frappe.flags.mute_messages
+    frappe.flags.mute_messages = True
+    try:
+        for name in names:
+            try:
+                doc = frappe.get_doc(VOUCHER_TYPE_EXPENSES_ENTRY, name)
+                if action == BULK_ACTION_CANCEL or doc.docstatus == 1:
+                    doc.cancel()
+                if action == BULK_ACTION_DELETE:
+                    frappe.delete_doc(VOUCHER_TYPE_EXPENSES_ENTRY, name)
+                frappe.db.commit()
+                result.succeeded += 1
+            except Exception as e:
+                frappe.db.rollback()
+                result.failed.append({"name": name, "error": str(e)})
+    finally:
+        frappe.flags.mute_messages = mute_messages
+    return result
+
+
+def _get_vouchers_with_gl(names, active_only=False):
+    filters = {"voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY, "voucher_no": ["in", names]}
+    if active_only:
+        filters["is_cancelled"] = 0
+    return set(frappe.get_all("GL Entry", filters=filters, pluck="voucher_no", distinct=True))
+
+
+def _get_vouchers_with_invalid_accounts(docs):
+    """
+    Vouchers whose GL Entries must be deleted instead of reversed on cancel (same rules as
+    cancel_gl_entries): posted rows on a group account, missing accounts on the document, or
+    a group account on the document or as the VAT account of a row's template. Uses two
+    grouped queries for the whole chunk (VAT templates come from the document cache).
+    """
+    names = [doc.name for doc in docs]
+    invalid = set(
+        frappe.db.sql_list(
+            """select distinct gle.voucher_no
+            from `tabGL Entry` gle
+            inner join `tabAccount` acc on acc.name = gle.account
+            where gle.voucher_type = %s and gle.voucher_no in %s and acc.is_group = 1""",
+            (VOUCHER_TYPE_EXPENSES_ENTRY, names),
+        )
+    )
+
+    accounts_by_voucher = {}
+    for doc in docs:
+        accounts = {doc.account_paid_from, *(d.account_paid_to for d in doc.expenses)}
+        if not all(accounts):
+            invalid.add(doc.name)
+        accounts.update(_get_vat_account(d.vat_template)[0] for d in doc.expenses if d.vat_template)
+        accounts_by_voucher[doc.name] = accounts - {None, ""}
+
+    all_accounts = set().union(*accounts_by_voucher.values()) if accounts_by_voucher else set()
+    if all_accounts:
+        group_accounts = set(
+            frappe.get_all("Account", filters={"name": ["in", list(all_accounts)], "is_group": 1}, pluck="name")
+        )
+        invalid.update(name for name, accounts in accounts_by_voucher.items() if accounts & group_accounts)
+
+    return invalid
+
+
+def _delete_gl_entries_bulk(voucher_nos):
+    if not voucher_nos:
+        return
+    from erpnext.accounts.utils import _delete_gl_entries
+
+    remove_voucher_from_balances(VOUCHER_TYPE_EXPENSES_ENTRY, voucher_nos)
+    for voucher_no in sorted(voucher_nos):
+        _delete_gl_entries(VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no)
+
+
+def _reverse_gl_entries_bulk(docs):
+    if not docs:
+        return
+
+    gl_entries = build_reversal_gl_entries([doc.name for doc in docs])
+    _post_gl_entries(f"{len(docs)} Expenses Entries", gl_entries)
+
+    frappe.db.sql(
+        """UPDATE `tabGL Entry` SET is_cancelled = 1,
+        modified=%s, modified_by=%s
+        where voucher_type=%s and voucher_no in %s and is_cancelled = 0""",
+        (now(), frappe.session.user, VOUCHER_TYPE_EXPENSES_ENTRY, [doc.name for doc in docs]),
+    )
@@ -0,0 +1,42 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("export-expenses")
+@click.option("--fiscal-year", help="Fiscal Year to export (instead of --from-date / --to-date)")
+@click.option("--from-date", help="Export vouchers posted on or after this date (YYYY-MM-DD)")
+@click.option("--to-date", help="Export vouchers posted on or before this date (YYYY-MM-DD)")
+@click.option("--company", help="Only export this company")
+@click.option("--format", "export_format", type=click.Choice(["csv", "parquet"]), default="csv")
+@click.option("--rows-per-file", type=int, default=500_000, help="Start a new file after this many rows")
+@click.option("--include-cancelled", is_flag=True, default=False, help="Include cancelled vouchers and GL rows")
+@click.option("--directory", help="Output directory (default: private/files/expense_pay_exports/<timestamp>)")
+@pass_context
+def export_expenses(
+    context, fiscal_year, from_date, to_date, company, export_format, rows_per_file, include_cancelled, directory
+):
+    """Stream Expenses Entries, their lines and GL rows to chunked CSV / Parquet files."""
+    from expense_pay.export import export_expenses_entries
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        paths = export_expenses_entries(
+            fiscal_year=fiscal_year,
+            from_date=from_date,
+            to_date=to_date,
+            company=company,
+            export_format=export_format,
+            rows_per_file=rows_per_file,
+            include_cancelled=include_cancelled,
+            directory=directory,
+        )
+    finally:
+        frappe.destroy()
+
+    for path in paths:
+        click.echo(path)
+
+
+commands = [export_expenses]
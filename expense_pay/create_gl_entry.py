@@ -1,13 +1,36 @@
+import hashlib
+import json
+import random
+import re
+import time
+
 import frappe
 from frappe import _
-from frappe.utils import flt, now, logger
-from erpnext.accounts.utils import _delete_gl_entries
+from frappe.utils import flt, now
+
+from expense_pay.account_balance import apply_gl_entries_to_balances, remove_voucher_from_balances
+from expense_pay.allocation import get_cost_center_amounts
+from expense_pay.exchange_rate import get_exchange_rate
+from expense_pay.utils import lock_accounts, logger
 
-logger.set_log_level("DEBUG")
-logger = frappe.logger("expensepay", file_count=1, allow_site=True)
 
 VOUCHER_TYPE_EXPENSES_ENTRY = "Expenses Entry"
 
+REMARKS_POLICY_FULL = "Full"
+REMARKS_POLICY_SUMMARY = "Summary"
+REMARKS_POLICY_REFERENCE = "Reference Only"
+REMARKS_POLICIES = (REMARKS_POLICY_FULL, REMARKS_POLICY_SUMMARY, REMARKS_POLICY_REFERENCE)
+GL_POSTING_MODE_PER_LINE = "Per Line"
+GL_POSTING_MODE_SUMMARY = "Per Voucher Summary"
+GL_POSTING_MAX_RETRIES = 3
+GL_POSTING_RETRY_DELAY = 0.05  # seconds, doubled on each retry
+
+# The voucher name must end in a naming series counter (ACC-PAY-2025-00001, amended ...-00001-1),
+# so a one-word Full / Summary remark such as "Rent" is not taken for a reference
+_REFERENCE_REMARKS_RE = re.compile(
+    r"^(?P<cancelled>On Cancelled )?(?P<voucher_no>\S*[-/.]\d+)(?: #(?P<row_idx>\d+)(?P<vat> VAT)?)?$"
+)
+
 
 def validate_account_is_ledger(account, doc_name, field_label="Account"):
     """
@@ -17,7 +40,7 @@ def validate_account_is_ledger(account, doc_name, field_label="Account"):
     if not account:
         return
     
-    is_group = frappe.db.get_value("Account", account, "is_group")
+    is_group = frappe.get_cached_value("Account", account, "is_group")
     if is_group:
         frappe.throw(
             _("{0} '{1}' is a Group Account. Group accounts cannot be used in transactions. "
@@ -89,33 +112,348 @@ def _delete_voucher_gl_entries(voucher_no: str, reason: str | None = None) -> No
     """Delete GL Entries for this voucher (used to clean up invalid historical data)."""
     if reason:
         logger.warning(f"Deleting GL entries for {voucher_no}: {reason}")
-    _delete_gl_entries(VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no)
+    _remove_and_delete_gl_entries(voucher_no)
     frappe.db.commit()
 
 
+def _remove_and_delete_gl_entries(voucher_no: str) -> None:
+    """
+    Delete the voucher's GL Entries, archived ones included, and take them out of the
+    running account balances.
+    """
+    # erpnext.accounts.utils is heavy; import it on first delete, not on worker boot
+    from erpnext.accounts.utils import _delete_gl_entries
+    # expense_pay.gl_archive imports this module
+    from expense_pay.gl_archive import delete_archived_gl_entries
+
+    frappe.db.savepoint("expense_pay_gl_delete")
+    try:
+        remove_voucher_from_balances(VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no)
+        _delete_gl_entries(VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no)
+        delete_archived_gl_entries([voucher_no])
+    except Exception:
+        frappe.db.rollback(save_point="expense_pay_gl_delete")
+        raise
+
+
 def _get_amount_precision(doc):
 	return doc.precision("paid_amount") or 2
 
 
+def _get_remarks_policy() -> str:
+    """Return the GL remarks policy configured in Expense Entry Settings (defaults to Full)."""
+    policy = frappe.db.get_single_value("Expense Entry Settings", "gl_remarks_policy")
+    return policy if policy in REMARKS_POLICIES else REMARKS_POLICY_FULL
+
+
+def _get_gl_posting_mode() -> str:
+    """Return the GL posting mode configured in Expense Entry Settings (defaults to Per Line)."""
+    mode = frappe.db.get_single_value("Expense Entry Settings", "gl_posting_mode")
+    return GL_POSTING_MODE_SUMMARY if mode == GL_POSTING_MODE_SUMMARY else GL_POSTING_MODE_PER_LINE
+
+
+def _cancel_prefix(cancelled: bool) -> str:
+    return "On Cancelled " if cancelled else ""
+
+
+def _render_voucher_remarks(doc, policy=REMARKS_POLICY_FULL, cancelled=False) -> str:
+    """
+    Remarks for the Account Paid From (header) GL row.
+
+    Full embeds one VAT line per expense, Summary keeps the voucher remark plus totals,
+    Reference Only stores just the voucher name (details are rendered by the report).
+    """
+    prefix = _cancel_prefix(cancelled)
+    if policy == REMARKS_POLICY_REFERENCE:
+        return f"{prefix}{doc.name}"
+
+    if policy == REMARKS_POLICY_SUMMARY:
+        total_vat = sum(flt(expense.vat_amount) for expense in doc.expenses)
+        return f"{prefix}{doc.remarks or ''}\n{len(doc.expenses)} expense line(s), VAT total: {total_vat}"
+
+    label = "Cancelled Expense" if cancelled else "Expense"
+    vat_remarks = "".join(
+        f"{label}: {expense.account_paid_to}, VAT: {expense.vat_amount} ({expense.vat_template})\n"
+        for expense in doc.expenses
+    )
+    return f"{prefix}{doc.remarks or ''}\nVAT Info:\n{vat_remarks}"
+
+
+def _render_expense_remarks(doc, expense, policy=REMARKS_POLICY_FULL, cancelled=False) -> str:
+    """Remarks for the debit GL row of a single expense line."""
+    prefix = _cancel_prefix(cancelled)
+    if policy == REMARKS_POLICY_REFERENCE:
+        return f"{prefix}{doc.name} #{expense.idx}"
+
+    if policy == REMARKS_POLICY_SUMMARY:
+        return f"{prefix}{expense.remarks or ''}"
+
+    if cancelled:
+        return (
+            f"On Cancelled {expense.remarks or ''} | \n Amount without VAT: {expense.amount_without_vat} "
+            f"\n VAT Amount: {expense.vat_amount} ({expense.vat_template})"
+        )
+    amt_precision = _get_amount_precision(doc)
+    return (
+        f"{expense.remarks or ''} | Amount without VAT: {flt(expense.amount_without_vat, amt_precision)} "
+        f"| VAT Amount: {flt(expense.vat_amount, amt_precision)} ({expense.vat_template})"
+    )
+
+
+def _render_vat_remarks(doc, expense, vat_account, vat_cost_center, policy=REMARKS_POLICY_FULL, cancelled=False) -> str:
+    """Remarks for the VAT GL row of a single expense line."""
+    prefix = _cancel_prefix(cancelled)
+    if policy == REMARKS_POLICY_REFERENCE:
+        return f"{prefix}{doc.name} #{expense.idx} VAT"
+
+    vat_amount = expense.vat_amount if cancelled else flt(expense.vat_amount, _get_amount_precision(doc))
+    return f"{prefix}VAT Amount: {vat_amount} | VAT Account: {vat_account} | Cost Center: {vat_cost_center}"
+
+
+def _render_summary_remarks(doc, line_count, policy=REMARKS_POLICY_FULL, cancelled=False) -> str:
+    """Remarks for a GL row that sums several expense lines (Per Voucher Summary mode)."""
+    prefix = _cancel_prefix(cancelled)
+    if policy == REMARKS_POLICY_REFERENCE:
+        return f"{prefix}{doc.name}"
+    return f"{prefix}{line_count} expense lines of {doc.name}"
+
+
+def summarize_gl_entries(doc, gl_entries, policy=REMARKS_POLICY_FULL, cancelled=False):
+    """
+    Merge GL rows of one voucher by (account, cost center, project) into one row each.
+
+    Net amounts per key are unchanged, so the posting hash, delta reposting and reversal
+    stay valid whichever mode a voucher was posted in. Line-level detail stays in the
+    Expenses table.
+    """
+    grouped = {}
+    for gl_entry in gl_entries:
+        key = (gl_entry.get("account"), gl_entry.get("cost_center") or "", gl_entry.get("project") or "")
+        if key not in grouped:
+            grouped[key] = (dict(gl_entry), [gl_entry.get("against")], 1)
+            continue
+
+        merged, against, count = grouped[key]
+        for field in ("debit", "credit", "debit_in_account_currency", "credit_in_account_currency"):
+            merged[field] = flt(merged.get(field)) + flt(gl_entry.get(field))
+        against.append(gl_entry.get("against"))
+        grouped[key] = (merged, against, count + 1)
+
+    precision = _get_amount_precision(doc)
+    summarized = []
+    for merged, against, count in grouped.values():
+        if count > 1:
+            for field in ("debit", "credit", "debit_in_account_currency", "credit_in_account_currency"):
+                merged[field] = flt(merged[field], precision)
+            merged["against"] = ", ".join(dict.fromkeys(a for a in against if a))
+            merged["remarks"] = _render_summary_remarks(doc, count, policy, cancelled)
+        summarized.append(merged)
+    return summarized
+
+
+def parse_reference_remarks(remarks):
+    """
+    Parse a Reference Only remark (``[On Cancelled ]<voucher_no>[ #<idx>[ VAT]]``).
+
+    Returns a dict with voucher_no, row_idx, vat and cancelled keys, or None when the
+    remark was not written by the Reference Only policy.
+    """
+    match = _REFERENCE_REMARKS_RE.match(remarks or "")
+    if not match:
+        return None
+    return frappe._dict(
+        cancelled=bool(match.group("cancelled")),
+        voucher_no=match.group("voucher_no"),
+        row_idx=frappe.utils.cint(match.group("row_idx")),
+        vat=bool(match.group("vat")),
+    )
+
+
+def render_reference_remarks(remarks_list):
+    """
+    Expand Reference Only remarks into the full remarks text.
+
+    Vouchers are loaded in two queries (headers and expense rows) regardless of how many
+    remarks are passed. Returns a dict of ``{remarks: rendered_remarks}``; remarks that are
+    not references or point to a missing voucher are left out.
+    """
+    references = {}
+    for remarks in set(remarks_list or []):
+        reference = parse_reference_remarks(remarks)
+        if reference:
+            references[remarks] = reference
+    if not references:
+        return {}
+
+    voucher_names = list({d.voucher_no for d in references.values()})
+    headers = frappe.get_all(
+        VOUCHER_TYPE_EXPENSES_ENTRY,
+        filters={"name": ["in", voucher_names]},
+        fields=["name", "company", "remarks"],
+    )
+    if not headers:
+        return {}
+    rows = frappe.get_all(
+        "Expenses",
+        filters={"parenttype": VOUCHER_TYPE_EXPENSES_ENTRY, "parent": ["in", voucher_names]},
+        fields=["parent", "idx", "account_paid_to", "amount_without_vat", "vat_amount", "vat_template", "remarks"],
+        order_by="parent, idx",
+    )
+    rows_by_parent = {}
+    for row in rows:
+        rows_by_parent.setdefault(row.pop("parent"), []).append(row)
+
+    docs = {
+        header.name: frappe.get_doc(
+            {"doctype": VOUCHER_TYPE_EXPENSES_ENTRY, **header, "expenses": rows_by_parent.get(header.name, [])}
+        )
+        for header in headers
+    }
+
+    rendered = {}
+    for remarks, reference in references.items():
+        doc = docs.get(reference.voucher_no)
+        if not doc:
+            continue
+        if not reference.row_idx:
+            rendered[remarks] = _render_voucher_remarks(doc, cancelled=reference.cancelled)
+            continue
+
+        expense = next((d for d in doc.expenses if d.idx == reference.row_idx), None)
+        if not expense:
+            continue
+        if reference.vat:
+            vat_account, vat_cost_center = _get_vat_account(expense.vat_template)
+            rendered[remarks] = _render_vat_remarks(
+                doc, expense, vat_account, vat_cost_center, cancelled=reference.cancelled
+            )
+        else:
+            rendered[remarks] = _render_expense_remarks(doc, expense, cancelled=reference.cancelled)
+    return rendered
+
+
 @frappe.whitelist()
-def create_gl_entries(doc, method):
+def get_gl_remarks(remarks: str) -> str:
+    """Return the full remarks for a GL row posted with a Reference Only remark."""
+    reference = parse_reference_remarks(remarks)
+    if not reference:
+        return remarks
+    frappe.has_permission(VOUCHER_TYPE_EXPENSES_ENTRY, "read", reference.voucher_no, throw=True)
+    return render_reference_remarks([remarks]).get(remarks, remarks)
+
+
+def _get_vat_account(vat_template):
+    """Return (account_head, cost_center) from the first tax row of a VAT template."""
+    if not vat_template:
+        return None, None
+    vat_template = frappe.get_cached_doc("Purchase Taxes and Charges Template", vat_template)
+    if not vat_template.taxes:
+        return None, None
+    return vat_template.taxes[0].account_head, vat_template.taxes[0].cost_center
+
+
+def _in_account_currency(doc, account, amount, source=None):
+    """
+    Convert a company-currency amount into the currency of `account`.
+
+    `source` (the voucher for Account Paid From, the expense row for its account) supplies
+    the rate entered on the document when its currency is the account's currency; other
+    foreign-currency accounts use the Currency Exchange rate on the posting date.
+    """
+    amount = flt(amount)
+    if not amount or not account:
+        return amount
+
+    account_currency = frappe.get_cached_value("Account", account, "account_currency")
+    company_currency = frappe.get_cached_value("Company", doc.company, "default_currency")
+    if not account_currency or account_currency == company_currency:
+        return amount
+
+    exchange_rate = 0
+    if source is not None and doc.get("multi_currency"):
+        currency = source.get("account_currency_from") if source is doc else source.get("account_currency")
+        if currency == account_currency:
+            exchange_rate = flt(source.get("exchange_rate"))
+    if not exchange_rate:
+        exchange_rate = get_exchange_rate(account_currency, company_currency, doc.posting_date)
+    return flt(amount / exchange_rate, _get_amount_precision(doc))
+
+
+def _is_lock_error(exc) -> bool:
+    """Return True for deadlocks and lock wait timeouts, which are safe to retry."""
+    return frappe.db.is_deadlocked(exc) or frappe.db.is_timedout(exc)
+
+
+def _post_gl_entries(voucher_no, gl_entries) -> None:
+    """
+    Submit GL Entry rows for one voucher inside a savepoint.
+
+    Account locks are taken in sorted order before any insert. A lock wait timeout only
+    rolls back the failing statement, so the savepoint is rolled back and the posting is
+    retried with exponential backoff; deadlocks roll back the whole transaction and are
+    re-raised for the transaction owner (see `run_with_lock_retry`).
+    """
+    savepoint = "expense_pay_gl_posting"
+    for attempt in range(GL_POSTING_MAX_RETRIES + 1):
+        frappe.db.savepoint(savepoint)
+        try:
+            lock_accounts(d.get("account") for d in gl_entries)
+            for gl_entry in gl_entries:
+                gle = frappe.new_doc("GL Entry")
+                gle.update(gl_entry)
+                gle.flags.ignore_permissions = 1
+                gle.flags.notify_update = False
+                gle.submit()
+            apply_gl_entries_to_balances(gl_entries)
+            frappe.db.release_savepoint(savepoint)
+            return
+        except Exception as e:
+            if frappe.db.is_deadlocked(e):
+                raise
+            frappe.db.rollback(save_point=savepoint)
+            if not frappe.db.is_timedout(e) or attempt == GL_POSTING_MAX_RETRIES:
+                raise
+            logger.warning(f"Lock wait timeout posting GL for {voucher_no}, retry {attempt + 1}: {e}")
+            _backoff(attempt)
+
+
+def _backoff(attempt: int) -> None:
+    time.sleep(GL_POSTING_RETRY_DELAY * (2**attempt) * (1 + random.random()))
+
+
+def run_with_lock_retry(fn, *args, **kwargs):
+    """
+    Run a unit of work that owns its transaction, retrying on deadlock / lock wait timeout.
+
+    The transaction is rolled back before each retry, so `fn` must be safe to re-run from
+    scratch and should commit its own work (short transactions per voucher). Only call it
+    where the whole transaction belongs to `fn` (jobs, scripts), never from a doc hook.
+    """
+    for attempt in range(GL_POSTING_MAX_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not _is_lock_error(e) or attempt == GL_POSTING_MAX_RETRIES:
+                raise
+            frappe.db.rollback()
+            logger.warning(f"Lock conflict in {getattr(fn, '__name__', fn)}, retry {attempt + 1}: {e}")
+            _backoff(attempt)
+
+
+def build_gl_entries(doc):
+    """
+    Build the GL Entry dicts (one credit, debits per row and VAT) posted for an Expenses Entry.
+
+    In Per Voucher Summary mode rows with the same account, cost center and project are merged.
+    """
     gl_entries = []
     amt_precision = _get_amount_precision(doc)
     paid_amount = flt(doc.paid_amount, amt_precision)
 
-    # Validate all accounts before creating GL entries
-    validate_all_accounts(doc)
-
     # Create GL entry for Account Paid From
     paid_to_accounts = ", ".join([d.account_paid_to for d in doc.expenses])
-    
-    # Update the remarks with VAT details
-    vat_remarks = ""
-    for expense in doc.expenses:
-        vat_remarks += f"Expense: {expense.account_paid_to}, VAT: {expense.vat_amount} ({expense.vat_template})\n"
+    remarks_policy = _get_remarks_policy()
 
-    main_remarks = f"{doc.remarks}\nVAT Info:\n{vat_remarks}"
-    
     # GL entry for the account paid from
     gl_entry = {
         "doctype": "GL Entry",
@@ -125,7 +463,7 @@ def create_gl_entries(doc, method):
         "debit": 0,
         "credit": paid_amount,
         "debit_in_account_currency": 0,
-        "credit_in_account_currency": paid_amount,
+        "credit_in_account_currency": _in_account_currency(doc, doc.account_paid_from, paid_amount, doc),
         "against": paid_to_accounts,
         "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
         "voucher_no": doc.name,
@@ -133,7 +471,7 @@ def create_gl_entries(doc, method):
         "is_advance": "No",
         "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
         "company": doc.company,
-        "remarks": main_remarks
+        "remarks": _render_voucher_remarks(doc, remarks_policy)
     }
     gl_entries.append(gl_entry)
 
@@ -141,37 +479,34 @@ def create_gl_entries(doc, method):
     for expense in doc.expenses:
         amount_without_vat = flt(expense.amount_without_vat, amt_precision)
         vat_amount = flt(expense.vat_amount, amt_precision)
-        expense_remarks = f"{expense.remarks or ''} | Amount without VAT: {amount_without_vat} | VAT Amount: {vat_amount} ({expense.vat_template})"
         logger.info(f"Amount without vat : {amount_without_vat}\n")
-        # GL entry for the amount without VAT
-        gl_entry = {
-            "doctype": "GL Entry",
-            "posting_date": doc.posting_date,
-            "account": expense.account_paid_to,
-            "cost_center": expense.cost_center or doc.default_cost_center,
-            "project": expense.project or "",
-            "debit": amount_without_vat,
-            "credit": 0,
-            "debit_in_account_currency": amount_without_vat,
-            "credit_in_account_currency": 0,
-            "against": doc.account_paid_from,
-            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-            "voucher_no": doc.name,
-            "is_opening": "No",
-            "is_advance": "No",
-            "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-            "company": doc.company,
-            "remarks": expense_remarks
-        }
-        gl_entries.append(gl_entry)
+        # GL entry for the amount without VAT (one per cost center of the line's allocation rule)
+        for cost_center, amount in get_cost_center_amounts(doc, expense, amount_without_vat, amt_precision):
+            gl_entry = {
+                "doctype": "GL Entry",
+                "posting_date": doc.posting_date,
+                "account": expense.account_paid_to,
+                "cost_center": cost_center,
+                "project": expense.project or "",
+                "debit": amount,
+                "credit": 0,
+                "debit_in_account_currency": _in_account_currency(doc, expense.account_paid_to, amount, expense),
+                "credit_in_account_currency": 0,
+                "against": doc.account_paid_from,
+                "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+                "voucher_no": doc.name,
+                "is_opening": "No",
+                "is_advance": "No",
+                "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
+                "company": doc.company,
+                "remarks": _render_expense_remarks(doc, expense, remarks_policy)
+            }
+            gl_entries.append(gl_entry)
 
         # GL entry for VAT amount
         if expense.vat_template and (vat_amount > 0):
-            vat_template = frappe.get_doc("Purchase Taxes and Charges Template", expense.vat_template)
-            if vat_template and vat_template.taxes:
-                vat_account = vat_template.taxes[0].account_head
-                vat_cost_center = vat_template.taxes[0].cost_center
-
+            vat_account, vat_cost_center = _get_vat_account(expense.vat_template)
+            if vat_account:
                 vat_gl_entry = {
                     "doctype": "GL Entry",
                     "posting_date": doc.posting_date,
@@ -179,7 +514,7 @@ def create_gl_entries(doc, method):
                     "cost_center": vat_cost_center,
                     "debit": vat_amount,
                     "credit": 0,
-                    "debit_in_account_currency": vat_amount,
+                    "debit_in_account_currency": _in_account_currency(doc, vat_account, vat_amount),
                     "credit_in_account_currency": 0,
                     "against": expense.account_paid_to,
                     "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
@@ -188,21 +523,119 @@ def create_gl_entries(doc, method):
                     "is_advance": "No",
                     "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
                     "company": doc.company,
-                    "remarks": f"VAT Amount: {vat_amount} | VAT Account: {vat_account} | Cost Center: {vat_cost_center}"
+                    "remarks": _render_vat_remarks(doc, expense, vat_account, vat_cost_center, remarks_policy)
                 }
                 gl_entries.append(vat_gl_entry)
 
+    if _get_gl_posting_mode() == GL_POSTING_MODE_SUMMARY:
+        gl_entries = summarize_gl_entries(doc, gl_entries, remarks_policy)
+
+    return gl_entries
+
+
+def _net_amounts_by_key(gl_entries):
+    """Net (debit - credit) per (account, cost center, project)."""
+    net = {}
+    for d in gl_entries:
+        key = (d.get("account") or "", d.get("cost_center") or "", d.get("project") or "")
+        net[key] = net.get(key, 0.0) + flt(d.get("debit")) - flt(d.get("credit"))
+    return net
+
+
+def get_gl_posting_hash(gl_entries) -> str:
+    """
+    Digest of what a set of GL rows posts: net amount per (account, cost center, project).
+
+    Remarks, fiscal year and how lines are grouped into rows do not change the digest, so
+    the same hash is obtained from `build_gl_entries` output and from the posted GL rows.
+    """
+    net = _net_amounts_by_key(gl_entries)
+    payload = [
+        (str(gl_entries[0].get("posting_date")), gl_entries[0].get("company")) if gl_entries else None,
+        sorted((*key, f"{amount:.6f}") for key, amount in net.items() if abs(amount) >= 1e-9),
+    ]
+    return hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def _get_posted_gl_hash(voucher_no):
+    """
+    Return the posting hash stored for a voucher, locking the voucher row.
+
+    Vouchers posted before the hash existed get it backfilled from their active GL rows once.
+    Returns None when nothing has been posted.
+    """
+    posted_hash = frappe.db.get_value(
+        VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no, "gl_posting_hash", for_update=True
+    )
+    if posted_hash:
+        return posted_hash
+
+    posted_rows = frappe.get_all(
+        "GL Entry",
+        filters={"voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY, "voucher_no": voucher_no, "is_cancelled": 0},
+        fields=["posting_date", "company", "account", "cost_center", "project", "debit", "credit"],
+    )
+    if not posted_rows:
+        return None
+
+    posted_hash = get_gl_posting_hash(posted_rows)
+    _set_gl_posting_hash(voucher_no, posted_hash)
+    return posted_hash
+
+
+def _set_gl_posting_hash(voucher_no, posting_hash) -> None:
+    frappe.db.set_value(
+        VOUCHER_TYPE_EXPENSES_ENTRY, voucher_no, "gl_posting_hash", posting_hash, update_modified=False
+    )
+
+
+def has_gl_posting_drift(doc) -> bool:
+    """Return True when the voucher's current content no longer matches what was posted."""
+    return bool(doc.gl_posting_hash) and doc.gl_posting_hash != get_gl_posting_hash(build_gl_entries(doc))
+
+
+@frappe.whitelist()
+def create_gl_entries(doc, method):
+    """
+    Post GL Entries for a submitted Expenses Entry.
+
+    Idempotent per voucher: a call is a no-op when the voucher has already been posted with
+    the same content (same posting hash), so retries and the sync job can overlap safely.
+    Returns True when rows were posted.
+    """
+    if frappe.flags.in_bulk_expenses_action:
+        # GL Entries are posted for the whole batch by the caller (e.g. expense_pay.recurring)
+        return False
+
+    # Validate all accounts before creating GL entries
+    validate_all_accounts(doc)
+
+    gl_entries = build_gl_entries(doc)
+    posting_hash = get_gl_posting_hash(gl_entries)
+
+    posted_hash = _get_posted_gl_hash(doc.name)
+    if posted_hash == posting_hash:
+        logger.info(f"GL Entries already posted for Doc: {doc.name}, skipping")
+        doc.gl_posting_hash = posted_hash
+        return False
+    if posted_hash:
+        # Never post a second set of rows on top of an existing posting
+        logger.warning(f"GL Entries for Doc: {doc.name} were posted with different content, skipping")
+        doc.gl_posting_hash = posted_hash
+        return False
+
     # Save and submit all GL Entries atomically
     try:
-        for gl_entry in gl_entries:
-            gle = frappe.new_doc("GL Entry")
-            gle.update(gl_entry)
-            gle.flags.ignore_permissions = 1
-            gle.flags.notify_update = False
-            gle.submit()
+        _post_gl_entries(doc.name, gl_entries)
+        _set_gl_posting_hash(doc.name, posting_hash)
+        doc.gl_posting_hash = posting_hash
         logger.info(f"GL Entry successfully submitted for Doc: {doc.name}")
     except Exception as e:
-        frappe.db.rollback()
+        if _is_lock_error(e):
+            # A deadlock took the whole request transaction with it (the submit, the budget
+            # check, the naming series...): never roll back or retry inside the hook, let the
+            # transaction owner retry from scratch (run_with_lock_retry, or the user resubmits).
+            raise
         logger.error(f"Error submitting GL Entry for Doc {doc.name}: {frappe.get_traceback()}")
         frappe.throw(
             _("Failed to create GL Entries for Expenses Entry {0}. No ledger entries were posted. Error: {1}").format(
@@ -213,13 +646,72 @@ def create_gl_entries(doc, method):
 
     logger.info(f"GL Entry created for Doc: {doc.name} using create_gl_entries")
     frappe.msgprint(f"GL Entry Created for {doc.name}", alert=True, indicator="green")
+    return True
 
 
 
+def build_cancel_gl_entries(doc):
+    """Build the reversal GL Entry dicts (flagged is_cancelled) for cancelling an Expenses Entry."""
+    return build_reversal_gl_entries([doc.name])
+
+
+def build_reversal_gl_entries(voucher_nos):
+    """
+    Reverse the active GL rows of the given vouchers as they were posted (debit and credit
+    swapped), in one query.
+
+    Nothing is rebuilt from the documents: allocation rules, VAT templates, the posting
+    mode or the voucher layout may have changed since submit, and the reversal must still
+    net every (account, cost center, project) to zero.
+    """
+    if not voucher_nos:
+        return []
+
+    posted = frappe.get_all(
+        "GL Entry",
+        filters={
+            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+            "voucher_no": ["in", list(voucher_nos)],
+            "is_cancelled": 0,
+        },
+        fields=[
+            "posting_date", "account", "cost_center", "project", "debit", "credit",
+            "debit_in_account_currency", "credit_in_account_currency", "against", "voucher_no",
+            "is_opening", "is_advance", "fiscal_year", "company", "remarks",
+        ],
+        order_by="voucher_no asc, creation asc, name asc",
+    )
+    return [
+        {
+            "doctype": "GL Entry",
+            "posting_date": d.posting_date,
+            "account": d.account,
+            "cost_center": d.cost_center,
+            "project": d.project or "",
+            "debit": d.credit,
+            "credit": d.debit,
+            "debit_in_account_currency": d.credit_in_account_currency,
+            "credit_in_account_currency": d.debit_in_account_currency,
+            "against": d.against,
+            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+            "voucher_no": d.voucher_no,
+            "is_opening": d.is_opening or "No",
+            "is_advance": d.is_advance or "No",
+            "fiscal_year": d.fiscal_year,
+            "company": d.company,
+            "is_cancelled": 1,
+            "remarks": _cancel_prefix(True) + (d.remarks or ""),
+        }
+        for d in posted
+    ]
+
+
 def cancel_gl_entries(doc, method):
     doc.ignore_linked_doctypes = ("GL Entry",)
-    
-    gl_entries = []
+
+    if frappe.flags.in_bulk_expenses_action:
+        # GL Entries are reversed / deleted for the whole chunk by expense_pay.bulk_actions
+        return
 
     # Check if GL Entries exist for the current document
     existing_gl_entries = frappe.get_all(
@@ -289,6 +781,7 @@ def cancel_gl_entries(doc, method):
             # Fallback: mark as cancelled if deletion fails
             voucher_type = VOUCHER_TYPE_EXPENSES_ENTRY
             voucher_no = doc.name
+            remove_voucher_from_balances(voucher_type, voucher_no)
             frappe.db.sql(
                 """UPDATE `tabGL Entry` SET is_cancelled = 1,
                 modified=%s, modified_by=%s
@@ -303,176 +796,18 @@ def cancel_gl_entries(doc, method):
             )
         return  # Exit early - we've handled the invalid entries
 
-    # Check if the necessary fields exist to identify if it's a newer version
-    is_new_version = all(
-        hasattr(expense, "vat_amount") and hasattr(expense, "amount_without_vat") and hasattr(expense, "vat_template") and expense.amount_without_vat > 0
-        for expense in doc.expenses
-    )
-
-    if not is_new_version:
-        logger.info(f"Old version of the expenses entry")
-        # If it's an older document, execute the older function logic
-
-        paid_to_accounts = ", ".join([d.account_paid_to for d in doc.expenses])
-
-        # Create GL entry for Account Paid From
-        gl_entry = {
-            "doctype": "GL Entry",
-            "posting_date": doc.posting_date,
-            "account": doc.account_paid_from,
-            "cost_center": doc.default_cost_center,
-            "debit": doc.paid_amount,
-            "credit": 0,
-            "debit_in_account_currency": doc.paid_amount,
-            "credit_in_account_currency": 0,
-            "against": paid_to_accounts,
-            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-            "voucher_no": doc.name,
-            "is_opening": "No",
-            "is_advance": "No",
-            "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-            "company": doc.company,
-            "is_cancelled": 1,
-            "to_rename": 1,
-            "remarks": "On Cancelled " + (doc.remarks if doc.remarks else "")
-        }
-        gl_entries.append(gl_entry)
-
-        # Create GL entries for Expenses child table
-        for expense in doc.expenses:
-            gl_entry = {
-                "doctype": "GL Entry",
-                "posting_date": doc.posting_date,
-                "account": expense.account_paid_to,
-                "debit": 0,
-                "credit": expense.amount,
-                "cost_center": (expense.cost_center if expense.cost_center else doc.default_cost_center),
-                "project": (expense.project if expense.project else ""),
-                "debit_in_account_currency": 0,
-                "credit_in_account_currency": expense.amount,
-                "against": doc.account_paid_from,
-                "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-                "voucher_no": doc.name,
-                "is_opening": "No",
-                "is_advance": "No",
-                "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-                "company": doc.company,
-                "is_cancelled": 1,
-                "to_rename": 1,
-                "remarks": "On Cancelled " + (expense.remarks if expense.remarks else "")
-            }
-            gl_entries.append(gl_entry)
-
-    else:
-        logger.info(f"New expense entry version selected")
-        # New version logic - Proceed with the updated logic
-
-        paid_to_accounts = ", ".join([d.account_paid_to for d in doc.expenses])
-
-        # Update the remarks for cancellation with VAT details
-        vat_remarks = ""
-        for expense in doc.expenses:
-            vat_remarks += f"Cancelled Expense: {expense.account_paid_to}, VAT: {expense.vat_amount} ({expense.vat_template})\n"
-
-        cancel_remarks = f"On Cancelled {doc.remarks if doc.remarks else ''}\nVAT Info:\n{vat_remarks}"
-
-        # Create GL entry for Account Paid From
-        gl_entry = {
-            "doctype": "GL Entry",
-            "posting_date": doc.posting_date,
-            "account": doc.account_paid_from,
-            "cost_center": doc.default_cost_center,
-            "debit": doc.paid_amount,
-            "credit": 0,
-            "debit_in_account_currency": doc.paid_amount,
-            "credit_in_account_currency": 0,
-            "against": paid_to_accounts,
-            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-            "voucher_no": doc.name,
-            "is_opening": "No",
-            "is_advance": "No",
-            "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-            "company": doc.company,
-            "is_cancelled": 1,
-            "to_rename": 1,
-            "remarks": cancel_remarks  # Use updated remarks with VAT info
-        }
-        gl_entries.append(gl_entry)
-
-        # Create GL entries for Expenses child table and VAT
-        for expense in doc.expenses:
-            # Update the remarks for cancellation with VAT information
-            expense_cancel_remarks = f"On Cancelled {expense.remarks if expense.remarks else ''} | \n Amount without VAT: {expense.amount_without_vat} \n VAT Amount: {expense.vat_amount} ({expense.vat_template})"
-            
-            # 1. GL entry for the amount without VAT (Expense Cancellation)
-            gl_entry = {
-                "doctype": "GL Entry",
-                "posting_date": doc.posting_date,
-                "account": expense.account_paid_to,
-                "debit": 0,
-                "credit": expense.amount_without_vat,
-                "cost_center": (expense.cost_center if expense.cost_center else doc.default_cost_center),
-                "project": (expense.project if expense.project else ""),
-                "debit_in_account_currency": 0,
-                "credit_in_account_currency": expense.amount_without_vat,
-                "against": doc.account_paid_from,
-                "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-                "voucher_no": doc.name,
-                "is_opening": "No",
-                "is_advance": "No",
-                "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-                "company": doc.company,
-                "is_cancelled": 1,
-                "to_rename": 1,
-                "remarks": expense_cancel_remarks  # Include VAT info in each expense's remark for cancellation
-            }
-            gl_entries.append(gl_entry)
-
-            # 2. Fetch VAT account and cost center from the VAT template
-            if expense.vat_template:
-                vat_template = frappe.get_doc("Purchase Taxes and Charges Template", expense.vat_template)
-                if vat_template and vat_template.taxes:
-                    vat_account = vat_template.taxes[0].account_head
-                    vat_cost_center = vat_template.taxes[0].cost_center
-
-                    # 3. GL entry for the VAT amount (Cancellation)
-                    vat_cancel_remarks = f"On Cancelled VAT Amount: {expense.vat_amount} | VAT Account: {vat_account} | Cost Center: {vat_cost_center}"
-                    vat_gl_entry = {
-                        "doctype": "GL Entry",
-                        "posting_date": doc.posting_date,
-                        "account": vat_account,  # Use VAT account from the template
-                        "cost_center": vat_cost_center,  # Use VAT cost center from the template
-                        "debit": 0,
-                        "credit": expense.vat_amount,  # Credit for VAT
-                        "debit_in_account_currency": 0,
-                        "credit_in_account_currency": expense.vat_amount,
-                        "against": expense.account_paid_to,  # VAT is against the expense's account_paid_to
-                        "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
-                        "voucher_no": doc.name,
-                        "is_opening": "No",
-                        "is_advance": "No",
-                        "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
-                        "company": doc.company,
-                        "is_cancelled": 1,
-                        "remarks": vat_cancel_remarks  # VAT cancellation remarks
-                    }
-                    gl_entries.append(vat_gl_entry)
+    gl_entries = build_cancel_gl_entries(doc)
 
     # Save and submit all GL Entries with cancellation flag
     try:
-        for gl_entry in gl_entries:
-            gle = frappe.new_doc("GL Entry")
-            gle.update(gl_entry)
-            gle.flags.ignore_permissions = 1
-            gle.flags.notify_update = False
-            # Note: We let validation run normally to catch genuine errors
-            # If validation fails due to legacy data issues (group accounts, company mismatch),
-            # we handle it in the except block below
-            gle.submit()
+        # Note: We let validation run normally to catch genuine errors
+        # If validation fails due to legacy data issues (group accounts, company mismatch),
+        # we handle it in the except block below
+        _post_gl_entries(doc.name, gl_entries)
 
         # Set all original GL Entries as cancelled
-        voucher_type = gle.voucher_type
-        voucher_no = gle.voucher_no
+        voucher_type = VOUCHER_TYPE_EXPENSES_ENTRY
+        voucher_no = doc.name
         frappe.db.sql(
             """UPDATE `tabGL Entry` SET is_cancelled = 1,
             modified=%s, modified_by=%s
@@ -481,6 +816,9 @@ def cancel_gl_entries(doc, method):
         )
         frappe.db.commit()
     except Exception as e:
+        if _is_lock_error(e):
+            raise
+
         # If creating reversal entries fails (e.g., due to group accounts, company mismatch,
         # or missing mandatory account fields), delete entries and allow cancel to succeed.
         error_message = str(e)
@@ -514,6 +852,7 @@ def cancel_gl_entries(doc, method):
                 # Fallback: mark as cancelled if deletion fails
                 voucher_type = VOUCHER_TYPE_EXPENSES_ENTRY
                 voucher_no = doc.name
+                remove_voucher_from_balances(voucher_type, voucher_no)
                 frappe.db.sql(
                     """UPDATE `tabGL Entry` SET is_cancelled = 1,
                     modified=%s, modified_by=%s
@@ -532,6 +871,7 @@ def cancel_gl_entries(doc, method):
                           f"Marking existing GL entries as cancelled only.")
             voucher_type = VOUCHER_TYPE_EXPENSES_ENTRY
             voucher_no = doc.name
+            remove_voucher_from_balances(voucher_type, voucher_no)
             frappe.db.sql(
                 """UPDATE `tabGL Entry` SET is_cancelled = 1,
                 modified=%s, modified_by=%s
@@ -548,9 +888,12 @@ def delete_gl_entries(doc, method):
     """
     doc.ignore_linked_doctypes = ("GL Entry",)
 
+    if frappe.flags.in_bulk_expenses_action:
+        return
+
     logger.info(f"Deleting GL Entries related to Expenses Entry {doc.name}")
     try:
-        _delete_gl_entries(VOUCHER_TYPE_EXPENSES_ENTRY, doc.name)
+        _remove_and_delete_gl_entries(doc.name)
         frappe.db.commit()
         frappe.msgprint(_("Cancelled and deleted GL Entries related to Expenses Entry {0}.").format(doc.name), alert=True)
     except Exception as e:
@@ -562,6 +905,100 @@ def delete_gl_entries(doc, method):
         )
 
 
+def repost_gl_entries_after_submit(doc, method):
+    """
+    Bring the ledger in line with a submitted Expenses Entry edited after submit.
+
+    Only the difference between the voucher's current GL rows and what the document should
+    post is written, as one adjustment row per changed (account, cost center, project), so a
+    one-line fix touches a couple of GL rows instead of reversing and reposting the voucher.
+    """
+    if not doc.gl_posting_hash:
+        # Posted before the hash existed: backfill it from the GL rows. Never posted: there is
+        # nothing to adjust, create_gl_entries / sync_missing_gl_entries post it in full.
+        doc.gl_posting_hash = _get_posted_gl_hash(doc.name)
+        if not doc.gl_posting_hash:
+            return
+
+    gl_entries = build_gl_entries(doc)
+    posting_hash = get_gl_posting_hash(gl_entries)
+    if posting_hash == doc.gl_posting_hash:
+        return
+
+    validate_all_accounts(doc)
+
+    posted = frappe.db.sql(
+        """select account, cost_center, project, sum(debit) as debit, sum(credit) as credit
+        from `tabGL Entry`
+        where voucher_type = %s and voucher_no = %s and is_cancelled = 0
+        group by account, cost_center, project""",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, doc.name),
+        as_dict=True,
+    )
+    expected_net = _net_amounts_by_key(gl_entries)
+    posted_net = _net_amounts_by_key(posted)
+
+    amt_precision = _get_amount_precision(doc)
+    paid_to_accounts = ", ".join(sorted({d.account_paid_to for d in doc.expenses if d.account_paid_to}))
+    # Convert with the rate the original rows used: the voucher's for Account Paid From,
+    # the expense row's for its account, the Currency Exchange rate otherwise (VAT)
+    rate_sources = {expense.account_paid_to: expense for expense in reversed(doc.expenses)}
+    rate_sources[doc.account_paid_from] = doc
+    adjustments = []
+    for key in sorted(set(expected_net) | set(posted_net)):
+        delta = flt(expected_net.get(key, 0) - posted_net.get(key, 0), amt_precision)
+        if not delta:
+            continue
+        account, cost_center, project = key
+        source = rate_sources.get(account)
+        adjustments.append({
+            "doctype": "GL Entry",
+            "posting_date": doc.posting_date,
+            "account": account,
+            "cost_center": cost_center,
+            "project": project,
+            "debit": max(delta, 0),
+            "credit": max(-delta, 0),
+            "debit_in_account_currency": _in_account_currency(doc, account, max(delta, 0), source),
+            "credit_in_account_currency": _in_account_currency(doc, account, max(-delta, 0), source),
+            "against": paid_to_accounts if account == doc.account_paid_from else doc.account_paid_from,
+            "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+            "voucher_no": doc.name,
+            "is_opening": "No",
+            "is_advance": "No",
+            "fiscal_year": frappe.defaults.get_user_default("fiscal_year"),
+            "company": doc.company,
+            "remarks": f"Updated after submit: {doc.name}",
+        })
+
+    if adjustments:
+        try:
+            _post_gl_entries(doc.name, adjustments)
+        except Exception as e:
+            if _is_lock_error(e):
+                raise
+            logger.error(f"Error reposting GL Entry for Doc {doc.name}: {frappe.get_traceback()}")
+            frappe.throw(
+                _("Failed to update GL Entries for Expenses Entry {0}. Error: {1}").format(doc.name, str(e)),
+                title=_("GL Posting Failed")
+            )
+        logger.info(f"Posted {len(adjustments)} adjustment GL Entries for Doc: {doc.name}")
+        frappe.msgprint(
+            _("GL Entries updated for {0} ({1} adjustment rows).").format(doc.name, len(adjustments)),
+            alert=True,
+            indicator="green",
+        )
+
+    _set_gl_posting_hash(doc.name, posting_hash)
+    doc.gl_posting_hash = posting_hash
+
+
+def _create_and_commit_gl_entries(doc):
+    posted = create_gl_entries(doc, "on_submit")
+    frappe.db.commit()
+    return posted
+
+
 @frappe.whitelist()
 def sync_missing_gl_entries():
     missing_entries = []
@@ -570,26 +1007,28 @@ def sync_missing_gl_entries():
     # Log the start of the function
     logger.info("Starting sync_missing_gl_entries function")
 
-    # Fetch submitted Expenses Entries
-    expenses_entries = frappe.get_all("Expenses Entry", filters={"docstatus": 1}, fields=["name"])
-    logger.info(f"Fetched {len(expenses_entries)} submitted Expenses Entries")
+    # Fetch submitted Expenses Entries that have no posting hash yet (never posted, or posted
+    # before the hash existed - create_gl_entries backfills those without double-posting)
+    expenses_entries = frappe.get_all(
+        "Expenses Entry",
+        filters={"docstatus": 1, "gl_posting_hash": ["is", "not set"]},
+        fields=["name"],
+    )
+    logger.info(f"Fetched {len(expenses_entries)} submitted Expenses Entries without a posting hash")
 
     for entry in expenses_entries:
         # Fetch the Expenses Entry document
         doc = frappe.get_doc("Expenses Entry", entry.name)
         logger.info(f"Processing Expenses Entry: {doc.name}")
 
-        # Update amounts if amount_without_vat and vat_amount are zero
-        for expense in doc.expenses:
-            if expense.amount_without_vat == 0 and expense.vat_amount == 0 and expense.amount > 0:
-                logger.info(f"Updating amount_without_vat for row #{expense.idx} in doc {doc.name}")
-                expense.amount_without_vat = expense.amount
-
-        # Save the updated document before creating GL Entries
+        # Update amounts if amount_without_vat and vat_amount are zero. Written to the rows
+        # directly: saving would run the after-submit repost before the voucher is posted.
         try:
-            doc.save()
+            for expense in doc.expenses:
+                if expense.amount_without_vat == 0 and expense.vat_amount == 0 and expense.amount > 0:
+                    logger.info(f"Updating amount_without_vat for row #{expense.idx} in doc {doc.name}")
+                    expense.db_set("amount_without_vat", expense.amount, update_modified=False)
             frappe.db.commit()
-            logger.info(f"Saved updated document {doc.name}")
         except Exception as e:
             logger.error(f"Error saving document {doc.name}: {e}")
             validation_errors.append(f"Error saving document {doc.name}: {str(e)}")
@@ -619,21 +1058,15 @@ def sync_missing_gl_entries():
             validation_errors.extend(doc_validation_errors)
             continue  # Skip to the next document
 
-        # Check if GL Entries exist for this Expenses Entry
-        gl_entries = frappe.get_all("GL Entry", filters={"voucher_type": "Expenses Entry", "voucher_no": entry.name})
-        logger.info(f"GL Entries found for {doc.name}: {len(gl_entries)}")
-
-        if not gl_entries:
-            logger.info(f"No GL Entries found for {doc.name}, creating GL Entries")
-
-            # Call the existing function to create GL Entries
-            try:
-                create_gl_entries(doc, "on_submit")
+        # create_gl_entries is idempotent: it skips vouchers that are already posted
+        # (one short transaction per doc)
+        try:
+            if run_with_lock_retry(_create_and_commit_gl_entries, doc):
                 logger.info(f"GL Entries successfully created for {doc.name}")
                 missing_entries.append(doc.name)
-            except Exception as e:
-                logger.error(f"Error creating GL Entries for document {doc.name}: {e}")
-                validation_errors.append(f"Error creating GL Entries for document {doc.name}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error creating GL Entries for document {doc.name}: {e}")
+            validation_errors.append(f"Error creating GL Entries for document {doc.name}: {str(e)}")
 
     # After processing all documents, throw an error if any validation errors were collected
     if validation_errors:
@@ -0,0 +1,123 @@
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate
+
+EXPENSES_DOCTYPE = "Expenses"
+
+
+def get_expense_fingerprint(company, posting_date, account_paid_to, amount, remarks, precision=2) -> str:
+    """
+    Fingerprint of an expense line: company, posting date, paid-to account, amount and remarks.
+
+    Remarks are compared case-insensitively with whitespace collapsed, so re-typed or
+    re-imported lines produce the same value.
+    """
+    remarks = " ".join((remarks or "").lower().split())
+    payload = "\x1f".join(
+        (
+            company or "",
+            str(getdate(posting_date)) if posting_date else "",
+            account_paid_to or "",
+            f"{flt(amount, precision):.{precision}f}",
+            remarks,
+        )
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()[:20]
+
+
+def set_expense_fingerprints(doc) -> None:
+    precision = doc.precision("paid_amount") or 2
+    for expense in doc.expenses:
+        expense.fingerprint = get_expense_fingerprint(
+            doc.company,
+            doc.posting_date,
+            expense.account_paid_to,
+            expense.amount,
+            expense.remarks,
+            expense.precision("amount") or precision,
+        )
+
+
+def get_duplicate_expenses(doc):
+    """Return lines of other draft / submitted Expenses Entries that match this voucher's lines."""
+    fingerprints = list({d.fingerprint for d in doc.expenses if d.fingerprint})
+    if not fingerprints:
+        return []
+
+    return frappe.db.sql(
+        """select e.fingerprint, e.parent, e.idx
+        from `tabExpenses` e
+        inner join `tabExpenses Entry` ee on ee.name = e.parent
+        where e.fingerprint in %s and e.parenttype = 'Expenses Entry'
+            and e.parent != %s and ee.docstatus < 2
+        order by e.parent, e.idx""",
+        (fingerprints, doc.name or ""),
+        as_dict=True,
+    )
+
+
+def warn_duplicate_expenses(doc) -> None:
+    duplicates = get_duplicate_expenses(doc)
+    if not duplicates:
+        return
+
+    rows_by_fingerprint = {}
+    for d in doc.expenses:
+        rows_by_fingerprint.setdefault(d.fingerprint, []).append(d.idx)
+
+    messages = []
+    for d in duplicates[:20]:
+        for idx in rows_by_fingerprint.get(d.fingerprint, []):
+            messages.append(_("Row #{0} matches {1} row #{2}").format(idx, d.parent, d.idx))
+    if len(duplicates) > 20:
+        messages.append(_("... and {0} more").format(len(duplicates) - 20))
+
+    frappe.msgprint(
+        "<br>".join(messages),
+        title=_("Possible Duplicate Expenses"),
+        indicator="orange",
+    )
+
+
+@frappe.whitelist()
+def find_duplicate_expenses(company=None, from_date=None, to_date=None, limit=500):
+    """
+    Site-wide duplicate report: fingerprints shared by lines of more than one draft or
+    submitted Expenses Entry.
+
+    Grouped over the fingerprint index, so the cost grows with the number of lines instead
+    of comparing every pair. Returns ``{"fingerprint", "vouchers", "lines"}`` dicts.
+    """
+    frappe.only_for(("Accounts Manager", "Accounts User", "System Manager"))
+
+    conditions, values = [], {"limit": cint(limit) or 500}
+    if company:
+        conditions.append("ee.company = %(company)s")
+        values["company"] = company
+    if from_date:
+        conditions.append("ee.posting_date >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("ee.posting_date <= %(to_date)s")
+        values["to_date"] = to_date
+
+    duplicates = frappe.db.sql(
+        f"""select e.fingerprint, count(*) as line_count,
+            group_concat(distinct e.parent order by e.parent separator ', ') as vouchers
+        from `tabExpenses` e
+        inner join `tabExpenses Entry` ee on ee.name = e.parent
+        where e.parenttype = 'Expenses Entry' and e.fingerprint is not null and e.fingerprint != ''
+            and ee.docstatus < 2 {"".join(" and " + c for c in conditions)}
+        group by e.fingerprint
+        having count(distinct e.parent) > 1
+        order by e.fingerprint
+        limit %(limit)s""",
+        values,
+        as_dict=True,
+    )
+    return [
+        {"fingerprint": d.fingerprint, "vouchers": d.vouchers.split(", "), "lines": d.line_count}
+        for d in duplicates
+    ]
@@ -0,0 +1,101 @@
+import bisect
+
+import frappe
+from frappe import _
+from frappe.utils import getdate, nowdate
+
+EXCHANGE_RATE_VERSION_CACHE_KEY = "expense_pay:currency_exchange_version"
+
+# Per site: {"version": ..., "pairs": {(from_currency, to_currency): (dates, rates, names)}}
+_rate_indexes = {}
+
+
+def get_exchange_rate(from_currency, to_currency, date=None, raise_exception=True):
+    """
+    Rate converting `from_currency` into `to_currency` on `date`: the latest buying
+    `Currency Exchange` on or before that date, or the inverse of the opposite pair.
+
+    Rates come from a per-process index of each currency pair sorted by date and searched
+    with bisect; a pair is loaded with one query and reused until a Currency Exchange
+    changes, so posting many foreign-currency vouchers needs no per-row rate query.
+    """
+    if not from_currency or not to_currency or from_currency == to_currency:
+        return 1.0
+
+    found = _find_rate(from_currency, to_currency, date)
+    if found:
+        return found[0]
+    found = _find_rate(to_currency, from_currency, date)
+    if found and found[0]:
+        return 1.0 / found[0]
+
+    if raise_exception:
+        frappe.throw(
+            _("No Currency Exchange from {0} to {1} on or before {2}.").format(
+                frappe.bold(from_currency), frappe.bold(to_currency), frappe.bold(getdate(date or nowdate()))
+            ),
+            title=_("Missing Exchange Rate"),
+        )
+    return None
+
+
+def get_exchange_rate_details(from_currency, to_currency, date=None):
+    """The Currency Exchange used for a pair on `date`: ``{"exchange_rate", "date", "name"}`` or None."""
+    found = _find_rate(from_currency, to_currency, date)
+    if not found:
+        return None
+    rate, rate_date, name = found
+    return frappe._dict(exchange_rate=rate, date=rate_date, name=name)
+
+
+@frappe.whitelist()
+def get_exchange_rate_for_date(from_currency, company, date=None):
+    """Rate of `from_currency` into the company currency on `date`, for the Expenses Entry form."""
+    return get_exchange_rate_details(
+        from_currency, frappe.get_cached_value("Company", company, "default_currency"), date
+    )
+
+
+def _find_rate(from_currency, to_currency, date):
+    dates, rates, names = _get_pair_index(from_currency, to_currency)
+    i = bisect.bisect_right(dates, getdate(date or nowdate())) - 1
+    if i < 0:
+        return None
+    return rates[i], dates[i], names[i]
+
+
+def _get_pair_index(from_currency, to_currency):
+    pairs = _get_site_pairs()
+    pair = (from_currency, to_currency)
+    if pair not in pairs:
+        rows = frappe.db.sql(
+            """select date, exchange_rate, name
+            from `tabCurrency Exchange`
+            where from_currency = %s and to_currency = %s and for_buying = 1
+            order by date asc, creation asc""",
+            pair,
+        )
+        # Several rates on one date: bisect_right lands on the last one created
+        pairs[pair] = ([getdate(d[0]) for d in rows], [float(d[1]) for d in rows], [d[2] for d in rows])
+    return pairs[pair]
+
+
+def _get_site_pairs():
+    site_index = _rate_indexes.setdefault(frappe.local.site, {"version": None, "pairs": {}})
+    # Compare with the shared version once per request / job
+    if not getattr(frappe.local, "expense_pay_rate_index_checked", False):
+        version = frappe.cache().get_value(
+            EXCHANGE_RATE_VERSION_CACHE_KEY, generator=lambda: frappe.generate_hash(length=12)
+        )
+        if version != site_index["version"]:
+            site_index["version"] = version
+            site_index["pairs"] = {}
+        frappe.local.expense_pay_rate_index_checked = True
+    return site_index["pairs"]
+
+
+def clear_exchange_rate_index(doc=None, method=None):
+    """Currency Exchange on_update / on_trash / after_rename: every process reloads its pairs."""
+    frappe.cache().set_value(EXCHANGE_RATE_VERSION_CACHE_KEY, frappe.generate_hash(length=12))
+    _rate_indexes.pop(frappe.local.site, None)
+    frappe.local.expense_pay_rate_index_checked = False
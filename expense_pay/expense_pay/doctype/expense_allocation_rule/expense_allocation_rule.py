@@ -0,0 +1,47 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from expense_pay.allocation import clear_allocation_rule_cache
+
+
+class ExpenseAllocationRule(Document):
+	def validate(self):
+		errors = []
+		seen = set()
+		for d in self.allocations:
+			if flt(d.percentage) <= 0:
+				errors.append(_("Row #{0}: Percentage must be greater than zero.").format(d.idx))
+			if d.cost_center in seen:
+				errors.append(_("Row #{0}: Cost Center {1} is listed more than once.").format(d.idx, d.cost_center))
+			seen.add(d.cost_center)
+
+			is_group, company = frappe.get_cached_value("Cost Center", d.cost_center, ["is_group", "company"])
+			if is_group:
+				errors.append(_("Row #{0}: Cost Center {1} is a group cost center.").format(d.idx, d.cost_center))
+			if company != self.company:
+				errors.append(
+					_("Row #{0}: Cost Center {1} does not belong to company {2}.").format(
+						d.idx, d.cost_center, self.company
+					)
+				)
+
+		self.total_percentage = flt(sum(flt(d.percentage) for d in self.allocations), 4)
+		if self.total_percentage != 100:
+			errors.append(_("Percentages must add up to 100 (currently {0}).").format(self.total_percentage))
+
+		if errors:
+			frappe.throw("<br>".join(errors), title=_("Invalid Allocation Rule"))
+
+	def on_update(self):
+		clear_allocation_rule_cache(self.name)
+
+	def on_trash(self):
+		clear_allocation_rule_cache(self.name)
+
+	def after_rename(self, old, new, merge=False):
+		clear_allocation_rule_cache(old)
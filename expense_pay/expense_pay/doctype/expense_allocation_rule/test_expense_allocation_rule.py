@@ -0,0 +1,54 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from expense_pay.allocation import get_split_table, split_amount
+
+
+def make_allocation_rule(rule_name, allocations, company="_Test Company"):
+	if frappe.db.exists("Expense Allocation Rule", rule_name):
+		frappe.delete_doc("Expense Allocation Rule", rule_name, force=True)
+	return frappe.get_doc(
+		{
+			"doctype": "Expense Allocation Rule",
+			"rule_name": rule_name,
+			"company": company,
+			"allocations": [
+				{"cost_center": cost_center, "percentage": percentage} for cost_center, percentage in allocations
+			],
+		}
+	).insert()
+
+
+class TestExpenseAllocationRule(FrappeTestCase):
+	def test_split_amount_keeps_total(self):
+		split_table = {"cost_centers": ["A", "B", "C"], "weights": [333333, 333333, 333334]}
+		split = split_amount(split_table, 100, 2)
+		self.assertEqual(split, [("A", 33.33), ("B", 33.33), ("C", 33.34)])
+		self.assertAlmostEqual(sum(amount for _cost_center, amount in split), 100)
+
+		split = split_amount({"cost_centers": ["A", "B"], "weights": [500000, 500000]}, 0.01, 2)
+		self.assertEqual(split, [("A", 0.01)])
+
+	def test_split_table_follows_rule_changes(self):
+		rule = make_allocation_rule(
+			"_Test Allocation Rule", [("_Test Cost Center - _TC", 60), ("_Test Cost Center 2 - _TC", 40)]
+		)
+
+		split_table = get_split_table(rule.name)
+		self.assertEqual(split_table["company"], "_Test Company")
+		self.assertEqual(split_table["cost_centers"], ["_Test Cost Center - _TC", "_Test Cost Center 2 - _TC"])
+		self.assertEqual(split_table["weights"], [600000, 400000])
+		# served from the request cache the second time
+		self.assertIs(get_split_table(rule.name), split_table)
+
+		rule.allocations[0].percentage = 50
+		rule.allocations[1].percentage = 50
+		rule.save()
+		self.assertEqual(get_split_table(rule.name)["weights"], [500000, 500000])
+
+		rule.disabled = 1
+		rule.save()
+		self.assertRaises(frappe.ValidationError, get_split_table, rule.name)
@@ -1,9 +1,46 @@
 # Copyright (c) 2025, Kishan Panchal and contributors
 # For license information, please see license.txt
 
-# import frappe
+import hashlib
+
+import frappe
 from frappe.model.document import Document
 
+# Fields that roles listed in Expense Entry Settings may edit on a submitted Expenses Entry
+AFTER_SUBMIT_HEADER_FIELDS = ("paid_amount", "exchange_rate", "total_debit")
+AFTER_SUBMIT_ROW_FIELDS = ("vat_template", "vat_amount", "amount", "amount_without_vat")
+
+AFTER_SUBMIT_PERMISSION_CACHE_KEY = "expense_pay:after_submit_permission"
+
 
 class ExpenseEntrySettings(Document):
-	pass
+	def on_update(self):
+		clear_after_submit_permission_cache()
+
+
+def clear_after_submit_permission_cache():
+	frappe.cache().delete_value(AFTER_SUBMIT_PERMISSION_CACHE_KEY)
+
+
+def get_after_submit_permission(user=None):
+	"""
+	Return whether `user` may edit submitted Expenses Entries, and which fields.
+
+	The result only depends on the user's roles, so it is cached in Redis per role set and
+	cleared whenever Expense Entry Settings is saved.
+	"""
+	roles = frappe.get_roles(user)
+	role_key = hashlib.md5(",".join(sorted(roles)).encode()).hexdigest()
+
+	permission = frappe.cache().hget(AFTER_SUBMIT_PERMISSION_CACHE_KEY, role_key)
+	if permission is None:
+		settings = frappe.get_cached_doc("Expense Entry Settings")
+		allowed_roles = {d.role for d in settings.allowed_roles}
+		permission = {
+			"can_edit": bool(settings.allow_after_submit_entries and allowed_roles.intersection(roles)),
+			"header_fields": list(AFTER_SUBMIT_HEADER_FIELDS),
+			"row_fields": list(AFTER_SUBMIT_ROW_FIELDS),
+		}
+		frappe.cache().hset(AFTER_SUBMIT_PERMISSION_CACHE_KEY, role_key, permission)
+
+	return permission
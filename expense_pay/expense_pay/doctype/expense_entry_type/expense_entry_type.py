@@ -1,9 +1,74 @@
 # Copyright (c) 2024, Kishan Panchal and contributors
 # For license information, please see license.txt
 
-# import frappe
+import hashlib
+import json
+
+import frappe
+from frappe import _
 from frappe.model.document import Document
 
+EXPENSE_ENTRY_TYPE_INDEX_CACHE_KEY = "expense_pay:expense_entry_type_index"
+
 
 class ExpenseEntryType(Document):
-	pass
+	def on_update(self):
+		clear_expense_entry_type_index()
+
+	def on_trash(self):
+		clear_expense_entry_type_index()
+
+	def after_rename(self, old, new, merge=False):
+		clear_expense_entry_type_index()
+
+
+def clear_expense_entry_type_index():
+	frappe.cache().delete_value(EXPENSE_ENTRY_TYPE_INDEX_CACHE_KEY)
+
+
+def get_expense_entry_type_index_data():
+	"""
+	Return ``{"version", "types"}`` for all Expense Entry Types, cached in Redis.
+
+	``types`` is a list of ``[name, account, default_cost_center, default_vat_template]``
+	sorted by name. ``version`` is a digest of ``types``, so it only changes when the
+	index content changes.
+	"""
+	index = frappe.cache().get_value(EXPENSE_ENTRY_TYPE_INDEX_CACHE_KEY)
+	if index is None:
+		types = [
+			[d.name, d.account, d.default_cost_center, d.default_vat_template]
+			for d in frappe.get_all(
+				"Expense Entry Type",
+				fields=["name", "account", "default_cost_center", "default_vat_template"],
+				order_by="name asc",
+			)
+		]
+		version = hashlib.md5(json.dumps(types).encode()).hexdigest()[:12]
+		index = {"version": version, "types": types}
+		frappe.cache().set_value(EXPENSE_ENTRY_TYPE_INDEX_CACHE_KEY, index)
+
+	return index
+
+
+def get_expense_entry_type_index_version():
+	return get_expense_entry_type_index_data()["version"]
+
+
+@frappe.whitelist()
+def get_expense_entry_type_index(version=None):
+	"""
+	Index used by the Expenses Entry form for row autofill and typeahead.
+
+	Returns only ``{"version"}`` when the caller already holds the current version.
+	"""
+	if not (
+		frappe.has_permission("Expense Entry Type", "select")
+		or frappe.has_permission("Expense Entry Type", "read")
+	):
+		frappe.throw(_("Not permitted to read Expense Entry Types"), frappe.PermissionError)
+
+	index = get_expense_entry_type_index_data()
+	if version and version == index["version"]:
+		return {"version": version}
+	return index
@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ExpensePayAccountBalance(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique("Expense Pay Account Balance", ["account", "posting_date"])
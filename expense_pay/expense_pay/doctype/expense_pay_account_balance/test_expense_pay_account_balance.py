@@ -0,0 +1,70 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from expense_pay import account_balance
+from expense_pay.account_balance import get_account_balance, verify_account_balances
+from expense_pay.expense_pay.doctype.expenses_entry.test_expenses_entry import make_expenses_entry
+
+
+def get_gl_balance(account):
+	return flt(
+		frappe.db.sql(
+			"select sum(debit) - sum(credit) from `tabGL Entry` where account = %s and is_cancelled = 0",
+			account,
+		)[0][0]
+	)
+
+
+class TestExpensePayAccountBalance(FrappeTestCase):
+	def setUp(self):
+		# seeded the way the daily job seeds Account Paid From accounts
+		account_balance._rebuild_account_balance("Cash - _TC")
+
+	def test_untracked_account_is_read_live_without_writes(self):
+		frappe.db.delete("Expense Pay Account Balance", {"account": "_Test Bank - _TC"})
+		account_balance._clear_tracked_accounts_cache()
+
+		self.assertEqual(get_account_balance("_Test Bank - _TC"), get_gl_balance("_Test Bank - _TC"))
+		self.assertFalse(frappe.db.exists("Expense Pay Account Balance", {"account": "_Test Bank - _TC"}))
+
+	def test_balance_follows_expense_pay_postings(self):
+		opening = get_account_balance("Cash - _TC")
+		self.assertEqual(opening, get_gl_balance("Cash - _TC"))
+
+		doc = make_expenses_entry()
+		self.assertEqual(get_account_balance("Cash - _TC"), flt(opening - 100, 2))
+		# only Account Paid From accounts are tracked
+		self.assertFalse(
+			frappe.db.exists(
+				"Expense Pay Account Balance", {"account": "_Test Account Cost for Goods Sold - _TC"}
+			)
+		)
+
+		doc.cancel()
+		self.assertEqual(get_account_balance("Cash - _TC"), opening)
+
+	def test_outside_postings_are_applied_at_commit(self):
+		opening = get_account_balance("Cash - _TC")
+
+		make_journal_entry("Cash - _TC", "_Test Bank - _TC", 50, "_Test Cost Center - _TC", submit=True)
+		# collected per transaction, applied in account order just before commit
+		self.assertEqual(get_account_balance("Cash - _TC"), opening)
+		frappe.db.before_commit.run()
+		self.assertEqual(get_account_balance("Cash - _TC"), flt(opening + 50, 2))
+
+	def test_drift_is_corrected_by_verify(self):
+		opening = get_account_balance("Cash - _TC")
+		frappe.db.sql(
+			"update `tabExpense Pay Account Balance` set balance = balance + 1 where account = %s", "Cash - _TC"
+		)
+
+		with patch.object(frappe.db, "commit"):
+			self.assertIn("Cash - _TC", verify_account_balances())
+		self.assertEqual(get_account_balance("Cash - _TC"), opening)
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ExpensePayBudgetSpend(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"Expense Pay Budget Spend", ["budget_against_value", "account", "fiscal_year", "budget_against"]
+	)
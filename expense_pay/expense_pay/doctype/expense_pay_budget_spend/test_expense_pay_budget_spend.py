@@ -0,0 +1,63 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.budget.test_budget import make_budget
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from expense_pay import budget as budget_module
+from expense_pay.budget import clear_budget_cache, get_budget_spend, verify_budget_spend
+from expense_pay.expense_pay.doctype.expenses_entry.test_expenses_entry import make_expenses_entry
+
+BUDGET_KEY = ("Cost Center", "_Test Cost Center - _TC", "_Test Account Cost for Goods Sold - _TC")
+
+
+class TestExpensePayBudgetSpend(FrappeTestCase):
+	def setUp(self):
+		self.budget = make_budget(budget_against="Cost Center", cost_center="_Test Cost Center - _TC")
+		self.budget.db_set("action_if_annual_budget_exceeded", "Stop")
+		self.fiscal_year, self.from_date, self.to_date = budget_module._get_fiscal_year(nowdate(), "_Test Company")
+		clear_budget_cache()
+
+	def get_spend(self, **kwargs):
+		return get_budget_spend(
+			"_Test Company", *BUDGET_KEY, self.fiscal_year, self.from_date, self.to_date, **kwargs
+		)
+
+	def set_budget_amount(self, amount):
+		frappe.db.set_value("Budget Account", {"parent": self.budget.name}, "budget_amount", amount)
+		clear_budget_cache()
+
+	def test_submit_stops_at_budget(self):
+		spent = self.get_spend(for_update=True)
+		self.set_budget_amount(spent + 150)
+
+		make_expenses_entry()
+		self.assertEqual(self.get_spend(for_update=True), spent + 100)
+		self.assertRaises(frappe.ValidationError, make_expenses_entry)
+
+	def test_check_reads_locked_counter_not_cache(self):
+		spent = self.get_spend(for_update=True)
+		self.set_budget_amount(spent + 150)
+		make_expenses_entry()
+
+		# another worker cached a value from before the first voucher was committed
+		cache_field = budget_module._spend_cache_field(*BUDGET_KEY, self.from_date)
+		frappe.cache().hset(budget_module.SPEND_CACHE_KEY, cache_field, spent)
+		self.assertRaises(frappe.ValidationError, make_expenses_entry)
+
+	def test_outside_postings_are_picked_up_by_verify(self):
+		spent = self.get_spend(for_update=True)
+
+		make_journal_entry(
+			"_Test Account Cost for Goods Sold - _TC", "_Test Bank - _TC", 70, "_Test Cost Center - _TC", submit=True
+		)
+		self.assertEqual(self.get_spend(for_update=True), spent)
+
+		with patch.object(frappe.db, "commit"):
+			self.assertTrue(verify_budget_spend())
+		self.assertEqual(self.get_spend(for_update=True), spent + 70)
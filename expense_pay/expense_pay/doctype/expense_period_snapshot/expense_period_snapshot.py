@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ExpensePeriodSnapshot(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique("Expense Period Snapshot", ["company", "period_end_date"])
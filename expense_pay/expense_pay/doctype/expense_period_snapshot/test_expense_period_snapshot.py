@@ -0,0 +1,72 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, nowdate
+
+from expense_pay import period_snapshot
+from expense_pay.expense_pay.doctype.expense_allocation_rule.test_expense_allocation_rule import (
+	make_allocation_rule,
+)
+from expense_pay.expense_pay.doctype.expenses_entry.test_expenses_entry import make_expenses_entry
+from expense_pay.period_snapshot import get_expense_totals, rebuild_period_snapshots
+
+ACCOUNT = "_Test Write Off - _TC"
+COST_CENTERS = ("_Test Cost Center - _TC", "_Test Cost Center 2 - _TC")
+
+
+def make_snapshot(period_end_date, company="_Test Company"):
+	name = frappe.db.get_value("Expense Period Snapshot", {"company": company, "period_end_date": period_end_date})
+	snapshot = frappe.get_doc("Expense Period Snapshot", name) if name else frappe.new_doc("Expense Period Snapshot")
+	snapshot.update({"company": company, "period_end_date": period_end_date, "status": "Stale"})
+	return snapshot.save()
+
+
+def get_totals(to_date):
+	"""Totals of ACCOUNT per cost center (lines without project and expense type)."""
+	return {
+		d["cost_center"]: flt(d["amount"])
+		for d in get_expense_totals("_Test Company", to_date)
+		if d["account"] == ACCOUNT and not d["project"] and not d["expense_entry_type"]
+	}
+
+
+class TestExpensePeriodSnapshot(FrappeTestCase):
+	def setUp(self):
+		# rebuilds run inline below; commits stay inside the test transaction
+		for target, attribute in ((period_snapshot, "enqueue_period_snapshot_rebuild"), (frappe.db, "commit")):
+			patcher = patch.object(target, attribute)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_snapshot_is_invalidated_and_rebuilt(self):
+		period_end_date = add_days(nowdate(), -1)
+		rule = make_allocation_rule("_Test Allocation Rule Snapshot", [(COST_CENTERS[0], 60), (COST_CENTERS[1], 40)])
+		snapshot = make_snapshot(period_end_date)
+		rebuild_period_snapshots("_Test Company")
+		self.assertEqual(frappe.db.get_value("Expense Period Snapshot", snapshot.name, "status"), "Valid")
+		before = get_totals(period_end_date)
+
+		make_expenses_entry(
+			[{"account_paid_to": ACCOUNT, "amount_without_vat": 100, "allocation_rule": rule.name}],
+			posting_date=period_end_date,
+		)
+		self.assertEqual(frappe.db.get_value("Expense Period Snapshot", snapshot.name, "status"), "Stale")
+
+		# totals follow the split posted to the GL, not the rule as edited afterwards
+		rule.allocations[0].percentage = 50
+		rule.allocations[1].percentage = 50
+		rule.save()
+		expected = dict(before)
+		for cost_center, amount in zip(COST_CENTERS, (60, 40)):
+			expected[cost_center] = flt(expected.get(cost_center, 0) + amount, 2)
+
+		# a stale snapshot is skipped: the lines are read instead
+		self.assertEqual(get_totals(period_end_date), expected)
+
+		self.assertTrue(rebuild_period_snapshots("_Test Company"))
+		self.assertEqual(frappe.db.get_value("Expense Period Snapshot", snapshot.name, "status"), "Valid")
+		self.assertEqual(get_totals(period_end_date), expected)
@@ -0,0 +1,17 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ExpenseSearchIndex(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Expense Search Index", ["company", "posting_date"])
+	if frappe.db.db_type == "mariadb" and not frappe.db.sql(
+		"""show index from `tabExpense Search Index` where Key_name = 'content_fulltext'"""
+	):
+		frappe.db.sql_ddl("alter table `tabExpense Search Index` add fulltext index content_fulltext (content)")
@@ -0,0 +1,95 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from expense_pay.expense_pay.doctype.expenses_entry.test_expenses_entry import (
+	make_expenses_entry,
+	purge_expenses_entry,
+)
+from expense_pay.search import search_expenses
+
+SEARCH_USER = "expense-search@example.com"
+
+
+def get_search_user():
+	if not frappe.db.exists("User", SEARCH_USER):
+		frappe.get_doc(
+			{
+				"doctype": "User",
+				"email": SEARCH_USER,
+				"first_name": "Expense Search",
+				"send_welcome_email": 0,
+				"roles": [{"role": "Accounts User"}],
+			}
+		).insert(ignore_permissions=True)
+	return SEARCH_USER
+
+
+class TestExpenseSearchIndex(FrappeTestCase):
+	def setUp(self):
+		# InnoDB applies FULLTEXT changes at commit: the vouchers are committed and purged
+		self.token = f"vendor{frappe.generate_hash(length=8)}"
+
+	def make_voucher(self, remarks, **args):
+		doc = make_expenses_entry(submit=False, remarks=remarks, **args)
+		frappe.db.commit()
+		self.addCleanup(purge_expenses_entry, doc.name)
+		return doc
+
+	def search(self, query, **kwargs):
+		return search_expenses(query, **kwargs)
+
+	def test_index_follows_the_voucher(self):
+		doc = self.make_voucher(f"Invoice 4711 {self.token}")
+		row = frappe.db.get_value(
+			"Expense Search Index", doc.name, ["expenses_entry", "status", "total_amount", "content"], as_dict=True
+		)
+		self.assertEqual((row.expenses_entry, row.status, row.total_amount), (doc.name, "Draft", 100))
+		self.assertIn(self.token, row.content)
+		self.assertIn("_Test Account Cost for Goods Sold - _TC", row.content)
+
+		doc.submit()
+		frappe.db.commit()
+		self.assertEqual(frappe.db.get_value("Expense Search Index", doc.name, "status"), "Submitted")
+
+	def test_every_word_must_match_as_prefix(self):
+		doc = self.make_voucher(f"Invoice 4711 {self.token}")
+		self.make_voucher(f"Invoice 4712 {self.token}")
+
+		self.assertEqual([d.expenses_entry for d in self.search(f"{self.token} 4711")["data"]], [doc.name])
+		self.assertEqual(len(self.search(self.token[:-2])["data"]), 2)
+		self.assertEqual(self.search(f"{self.token} 9999")["data"], [])
+		self.assertRaises(frappe.ValidationError, self.search, "ab")
+
+	def test_pagination(self):
+		names = {self.make_voucher(f"Rent {self.token}").name for _i in range(3)}
+
+		first = self.search(self.token, page_length=2)
+		self.assertEqual((len(first["data"]), first["has_more"]), (2, True))
+		second = self.search(self.token, start=2, page_length=2)
+		self.assertEqual((len(second["data"]), second["has_more"]), (1, False))
+		self.assertEqual({d.expenses_entry for d in first["data"] + second["data"]}, names)
+
+	def test_permissions_apply_before_paging(self):
+		visible = self.make_voucher(f"Rent {self.token}")
+		for _i in range(2):
+			self.make_voucher(f"Rent {self.token}")
+
+		user = get_search_user()
+		frappe.get_doc(
+			{"doctype": "User Permission", "user": user, "allow": "Expenses Entry", "for_value": visible.name}
+		).insert(ignore_permissions=True)
+		frappe.db.commit()
+		self.addCleanup(self.remove_user_permissions, user)
+
+		frappe.set_user(user)
+		self.addCleanup(frappe.set_user, "Administrator")
+		# the hidden vouchers match too: filtered before the limit, the page holds the visible one
+		result = self.search(self.token, page_length=1)
+		self.assertEqual(([d.expenses_entry for d in result["data"]], result["has_more"]), ([visible.name], False))
+
+	def remove_user_permissions(self, user):
+		frappe.db.delete("User Permission", {"user": user})
+		frappe.db.commit()
@@ -52,6 +52,8 @@ frappe.ui.form.on("Expenses Entry", {
     },
     onload: function (frm) {
         field_control(frm);
+        load_expense_entry_type_index(frm);
+        bind_expense_entry_type_search(frm);
         const get_account_filters = () => {
             const filters = [["Account", "is_group", "=", 0]];
             if (frm.doc.company) {
@@ -70,6 +72,13 @@ frappe.ui.form.on("Expenses Entry", {
     before_save: function (frm) {
         update_total_debit(frm);
     },
+    account_paid_from: function (frm) {
+        update_account_balance_from(frm);
+    },
+    posting_date: function (frm) {
+        update_account_balance_from(frm);
+        update_exchange_rate(frm);
+    },
 
     // validate event: Perform all validation checks
     validate: function (frm) {
@@ -325,6 +334,36 @@ frappe.ui.form.on("Expenses", {
             }
         }
     },
+    expense_entry_type: function (frm, cdt, cdn) {
+        const row = locals[cdt][cdn];
+        if (!row.expense_entry_type) {
+            return;
+        }
+        const apply_defaults = (type) => {
+            if (!type) {
+                return;
+            }
+            frappe.model.set_value(cdt, cdn, "account_paid_to", type.account).then(() => {
+                // After account_paid_to, whose handler resets the cost center to the voucher default
+                if (type.default_cost_center) {
+                    frappe.model.set_value(cdt, cdn, "cost_center", type.default_cost_center);
+                }
+                if (type.default_vat_template && !row.vat_template) {
+                    frappe.model.set_value(cdt, cdn, "vat_template", type.default_vat_template);
+                }
+            });
+        };
+
+        const type = expense_entry_type_index.types[row.expense_entry_type];
+        if (type) {
+            apply_defaults(type);
+        } else {
+            // Created after the index was loaded
+            load_expense_entry_type_index(frm, true).then(() =>
+                apply_defaults(expense_entry_type_index.types[row.expense_entry_type])
+            );
+        }
+    },
     account_paid_to: function (frm, cdt, cdn) {
         let d = locals[cdt][cdn];
         if (d.account_paid_to) {
@@ -428,19 +467,15 @@ frappe.ui.form.on("Expenses", {
         var row = locals[cdt][cdn];
         if (frm.doc.multi_currency) {
             frappe.call({
-                method: "frappe.client.get_list",
+                method: "expense_pay.exchange_rate.get_exchange_rate_for_date",
                 args: {
-                    doctype: "Currency Exchange",
-                    filters: {
-                        from_currency: row.account_currency,
-                    },
-                    fields: ["name", "exchange_rate", "date"],
-                    order_by: "date desc",
-                    limit_page_length: 1,
+                    from_currency: row.account_currency,
+                    company: frm.doc.company,
+                    date: frm.doc.posting_date,
                 },
                 callback: function (r) {
-                    if (r.message && r.message.length > 0) {
-                        var latest_exchange = r.message[0];
+                    if (r.message) {
+                        var latest_exchange = r.message;
                         // Update fields in your doctype
                         frappe.model.set_value(
                             cdt,
@@ -630,21 +665,17 @@ function modify_row(row) {
 
 function update_exchange_rate(frm) {
     if (frm.doc.account_currency_from && frm.doc.multi_currency) {
-        // Fetch the latest exchange rate
+        // Fetch the exchange rate in effect on the posting date
         frappe.call({
-            method: "frappe.client.get_list",
+            method: "expense_pay.exchange_rate.get_exchange_rate_for_date",
             args: {
-                doctype: "Currency Exchange",
-                filters: {
-                    from_currency: frm.doc.account_currency_from,
-                },
-                fields: ["name", "exchange_rate", "date"],
-                order_by: "date desc",
-                limit_page_length: 1,
+                from_currency: frm.doc.account_currency_from,
+                company: frm.doc.company,
+                date: frm.doc.posting_date,
             },
             callback: function (r) {
-                if (r.message && r.message.length > 0) {
-                    var latest_exchange = r.message[0];
+                if (r.message) {
+                    var latest_exchange = r.message;
                     // Update fields in your doctype
                     frappe.model.set_value(
                         frm.doctype,
@@ -705,77 +736,149 @@ function update_total_debit(frm) {
     console.log("Total debit amount updated");
 }
 
-function field_control(frm) {
-    if (frm.doc.docstatus === 1) {
-        // Check if the document is submitted
-        frappe.call({
-            method: "frappe.client.get",
-            args: {
-                doctype: "Expense Entry Settings",
-            },
-            callback: function (r) {
-                if (r.message) {
-                    const settings = r.message;
-                    const user_roles = frappe.user_roles;
+// Expense Entry Type -> defaults, shared by every Expenses Entry form of this session and
+// refreshed only when the server reports a different version.
+const expense_entry_type_index = { version: null, types: {}, names: [] };
 
-                    // Check if user has allowed roles and the setting to allow editing after submit is true
-                    const is_allowed = settings.allowed_roles.some((role) =>
-                        user_roles.includes(role.role)
-                    );
-
-                    if (settings.allow_after_submit_entries && is_allowed) {
-                        // Allow editing
-                        frm.set_df_property("paid_amount", "read_only", 0);
-                        frm.set_df_property("exchange_rate", "read_only", 0);
-                        frm.set_df_property("total_debit", "read_only", 0);
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "vat_template",
-                            "read_only",
-                            0
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "vat_amount",
-                            "read_only",
-                            0
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "amount",
-                            "read_only",
-                            0
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "amount_without_vat",
-                            "read_only",
-                            0
-                        );
-                    } else {
-                        // Make fields read-only
-                        frm.set_df_property("paid_amount", "read_only", 1);
-                        frm.set_df_property("exchange_rate", "read_only", 1);
-                        frm.set_df_property("total_debit", "read_only", 1);
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "vat_template",
-                            "read_only",
-                            1
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "vat_amount",
-                            "read_only",
-                            1
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "amount",
-                            "read_only",
-                            1
-                        );
-                        frm.fields_dict.expenses.grid.update_docfield_property(
-                            "amount_without_vat",
-                            "read_only",
-                            1
-                        );
-                    }
-                }
-            },
+function load_expense_entry_type_index(frm, force) {
+    const version = frm.doc.__onload && frm.doc.__onload.expense_entry_type_index_version;
+    if (!force && expense_entry_type_index.version && version === expense_entry_type_index.version) {
+        return Promise.resolve(expense_entry_type_index);
+    }
+    return frappe
+        .xcall(
+            "expense_pay.expense_pay.doctype.expense_entry_type.expense_entry_type.get_expense_entry_type_index",
+            { version: force ? null : expense_entry_type_index.version }
+        )
+        .then((index) => {
+            if (index.types) {
+                expense_entry_type_index.types = {};
+                index.types.forEach(([name, account, default_cost_center, default_vat_template]) => {
+                    expense_entry_type_index.types[name] = {
+                        account,
+                        default_cost_center,
+                        default_vat_template,
+                    };
+                });
+                // Sorted by lower-cased name for prefix range lookups
+                expense_entry_type_index.names = index.types
+                    .map(([name]) => [name.toLowerCase(), name])
+                    .sort((a, b) => (a[0] < b[0] ? -1 : a[0] > b[0] ? 1 : 0));
+            }
+            expense_entry_type_index.version = index.version;
+            return expense_entry_type_index;
         });
+}
+
+function search_expense_entry_types(term, limit) {
+    const names = expense_entry_type_index.names;
+    const prefix = (term || "").toLowerCase();
+    let lo = 0;
+    let hi = names.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (names[mid][0] < prefix) {
+            lo = mid + 1;
+        } else {
+            hi = mid;
+        }
+    }
+
+    const matches = [];
+    for (let i = lo; i < names.length && matches.length < limit; i++) {
+        if (!names[i][0].startsWith(prefix)) {
+            break;
+        }
+        const name = names[i][1];
+        matches.push({ value: name, description: expense_entry_type_index.types[name].account });
+    }
+    return matches;
+}
+
+function get_expense_entry_type_control(frm, input) {
+    for (const row of frm.fields_dict.expenses.grid.grid_rows || []) {
+        const controls = [
+            row.on_grid_fields_dict && row.on_grid_fields_dict.expense_entry_type,
+            row.grid_form && row.grid_form.fields_dict && row.grid_form.fields_dict.expense_entry_type,
+        ];
+        for (const control of controls) {
+            if (control && control.$input && control.$input.get(0) === input) {
+                return control;
+            }
+        }
+    }
+}
+
+function bind_expense_entry_type_search(frm) {
+    // Grid controls are created lazily, so take over each expense_entry_type input the first
+    // time it gets focus (capture phase, before the link control's own focus search runs) and
+    // answer its suggestions from the local index as the user types. The handler is namespaced
+    // so the link control's own input handlers (value parsing, dirty state) stay bound.
+    const wrapper = frm.fields_dict.expenses.grid.wrapper.get(0);
+    if (wrapper.expense_entry_type_search_bound) {
+        return;
+    }
+    wrapper.expense_entry_type_search_bound = true;
+
+    wrapper.addEventListener(
+        "focus",
+        (e) => {
+            if (
+                e.target.getAttribute("data-fieldname") !== "expense_entry_type" ||
+                !expense_entry_type_index.version
+            ) {
+                return;
+            }
+            const control = get_expense_entry_type_control(frm, e.target);
+            if (!control || !control.awesomplete || control.expense_entry_type_search_bound) {
+                return;
+            }
+            control.expense_entry_type_search_bound = true;
+            control.$input.off("input.expense_pay").on("input.expense_pay", () => {
+                control.awesomplete.list = search_expense_entry_types(control.$input.val(), 20);
+                control.awesomplete.evaluate();
+            });
+        },
+        true
+    );
+}
+
+function update_account_balance_from(frm) {
+    if (frm.doc.docstatus !== 0 || !frm.doc.account_paid_from) {
+        return;
     }
+    frappe.call({
+        method: "expense_pay.account_balance.get_balance_for_expenses_entry",
+        args: {
+            account: frm.doc.account_paid_from,
+            posting_date: frm.doc.posting_date,
+        },
+        callback: function (r) {
+            frm.set_value("account_balance_from", r.message || 0);
+        },
+    });
+}
+
+function field_control(frm) {
+    if (frm.doc.docstatus !== 1) {
+        return;
+    }
+
+    // Resolved (and cached) on the server from Expense Entry Settings, sent with the form
+    const permission = (frm.doc.__onload || {}).after_submit_permission;
+    if (!permission) {
+        return;
+    }
+
+    const read_only = permission.can_edit ? 0 : 1;
+    permission.header_fields.forEach((fieldname) => {
+        frm.set_df_property(fieldname, "read_only", read_only);
+    });
+    permission.row_fields.forEach((fieldname) => {
+        frm.fields_dict.expenses.grid.update_docfield_property(
+            fieldname,
+            "read_only",
+            read_only
+        );
+    });
 }
@@ -6,20 +6,70 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from expense_pay.account_balance import get_account_balance
+from expense_pay.allocation import set_allocation_splits
+from expense_pay.budget import validate_budget
+from expense_pay.create_gl_entry import build_gl_entries
+from expense_pay.duplicates import set_expense_fingerprints, warn_duplicate_expenses
+from expense_pay.exchange_rate import get_exchange_rate_details
+from expense_pay.expense_pay.doctype.expense_entry_settings.expense_entry_settings import (
+	AFTER_SUBMIT_HEADER_FIELDS,
+	AFTER_SUBMIT_ROW_FIELDS,
+	get_after_submit_permission,
+)
+from expense_pay.expense_pay.doctype.expense_entry_type.expense_entry_type import (
+	get_expense_entry_type_index_data,
+	get_expense_entry_type_index_version,
+)
+
 
 def _get_vat_tax_rate(vat_template):
-	taxes = frappe.get_all(
-		"Purchase Taxes and Charges",
-		filters={"parent": vat_template, "parenttype": "Purchase Taxes and Charges Template"},
-		fields=["rate"],
-		limit=1,
-	)
+	# Templates come from the document cache (see expense_pay.warmup), not one query per row
+	try:
+		taxes = frappe.get_cached_doc("Purchase Taxes and Charges Template", vat_template).taxes
+	except frappe.DoesNotExistError:
+		frappe.clear_last_message()
+		return None
 	return taxes[0].rate if taxes else None
 
 
 class ExpensesEntry(Document):
+	def onload(self):
+		self.set_onload("expense_entry_type_index_version", get_expense_entry_type_index_version())
+		if self.docstatus == 1:
+			self.set_onload("after_submit_permission", get_after_submit_permission())
+
 	def before_save(self):
+		self._set_accounts_from_expense_entry_type()
+		if self.multi_currency and self.docstatus == 0:
+			self._set_exchange_rates()
 		self._normalize_expense_amounts()
+		set_expense_fingerprints(self)
+		if self.docstatus == 0:
+			warn_duplicate_expenses(self)
+		if self.docstatus == 0 and self.account_paid_from:
+			self.account_balance_from = get_account_balance(self.account_paid_from, self.posting_date)
+
+	def _set_accounts_from_expense_entry_type(self):
+		"""Fill Account Paid To from the row's Expense Entry Type when the client did not."""
+		rows = [d for d in self.expenses if d.expense_entry_type and not d.account_paid_to]
+		if not rows:
+			return
+		accounts = {d[0]: d[1] for d in get_expense_entry_type_index_data()["types"]}
+		for d in rows:
+			d.account_paid_to = accounts.get(d.expense_entry_type)
+
+	def _set_exchange_rates(self):
+		"""Fill missing exchange rates with the Currency Exchange on the posting date."""
+		company_currency = frappe.get_cached_value("Company", self.company, "default_currency")
+		for d, currency in [(self, self.account_currency_from)] + [(e, e.account_currency) for e in self.expenses]:
+			if not currency or currency == company_currency or flt(d.exchange_rate):
+				continue
+			rate = get_exchange_rate_details(currency, company_currency, self.posting_date)
+			if rate:
+				d.exchange_rate = rate.exchange_rate
+				d.exchange_rate_date = rate.date
+				d.currency_exchange_link = rate.name
 
 	def _normalize_expense_amounts(self):
 		"""Round child-row amounts and recompute VAT so GL debits match paid_amount credit."""
@@ -52,6 +102,51 @@ class ExpensesEntry(Document):
 		if not self.multi_currency:
 			self.paid_amount = self.total_debit
 
+	def before_submit(self):
+		# Reposts and reports split allocated lines as posted, whatever happens to the rule later
+		set_allocation_splits(self)
+
+	def before_update_after_submit(self):
+		self._check_after_submit_permission()
+		# Edits after submit are posted to the ledger as adjustments, so they must balance
+		self._normalize_expense_amounts()
+		set_expense_fingerprints(self)
+		self.validate()
+
+	def _check_after_submit_permission(self):
+		"""Only roles allowed in Expense Entry Settings may change amounts after submit."""
+		if self.flags.ignore_after_submit_permission:
+			return
+
+		previous = self.get_doc_before_save()
+		if not previous or not self._after_submit_fields_changed(previous):
+			return
+
+		if not get_after_submit_permission()["can_edit"]:
+			frappe.throw(
+				_("You are not allowed to edit amounts of a submitted Expenses Entry. "
+				  "Check the Allowed Roles in Expense Entry Settings."),
+				frappe.PermissionError,
+				title=_("Not Permitted"),
+			)
+
+	def _after_submit_fields_changed(self, previous):
+		if any((self.get(field) or None) != (previous.get(field) or None) for field in AFTER_SUBMIT_HEADER_FIELDS):
+			return True
+
+		previous_rows = {d.name: d for d in previous.expenses}
+		if set(previous_rows) != {d.name for d in self.expenses}:
+			return True
+		return any(
+			(row.get(field) or None) != (previous_rows[row.name].get(field) or None)
+			for row in self.expenses
+			for field in AFTER_SUBMIT_ROW_FIELDS
+		)
+
+	def on_cancel(self):
+		# Cancellation reverses (or removes) the posted rows, so nothing is posted any more
+		self.db_set("gl_posting_hash", None, update_modified=False)
+
 	def validate(self):
 		"""Validate entries and collect all errors before throwing once."""
 		errors = []
@@ -104,9 +199,27 @@ class ExpensesEntry(Document):
 					)
 				)
 
+			# Submitted lines keep the split stored at submit, so the rule may have changed since
+			if expense.allocation_rule and not expense.allocation_split:
+				rule = frappe.get_cached_value(
+					"Expense Allocation Rule", expense.allocation_rule, ["company", "disabled"], as_dict=True
+				)
+				if not rule or rule.disabled:
+					errors.append(
+						_("Row #{0}: Allocation Rule '{1}' does not exist or is disabled.").format(
+							row_no, expense.allocation_rule
+						)
+					)
+				elif rule.company != self.company:
+					errors.append(
+						_("Row #{0}: Allocation Rule '{1}' belongs to another company.").format(
+							row_no, expense.allocation_rule
+						)
+					)
+
 			if expense.vat_template:
 				try:
-					vat_template = frappe.get_doc("Purchase Taxes and Charges Template", expense.vat_template)
+					vat_template = frappe.get_cached_doc("Purchase Taxes and Charges Template", expense.vat_template)
 					if vat_template and vat_template.taxes:
 						vat_account = vat_template.taxes[0].account_head
 						if not vat_account:
@@ -143,13 +256,16 @@ class ExpensesEntry(Document):
 				_("Please correct the following validation errors:<br><br>{0}").format(message),
 				title=_("Validation Errors Found")
 			)
+
+		if self._action in ("submit", "update_after_submit"):
+			validate_budget(self, build_gl_entries(self))
 	
 	def _validate_account_is_ledger(self, account, field_label="Account", errors=None):
 		"""Validate that the given account is a ledger account (not a group account)."""
 		if not account:
 			return
 		
-		is_group = frappe.db.get_value("Account", account, "is_group")
+		is_group = frappe.get_cached_value("Account", account, "is_group")
 		if is_group:
 			message = _(
 				"{0} '{1}' is a Group Account. Group accounts cannot be used in transactions. "
@@ -162,3 +278,8 @@ class ExpensesEntry(Document):
 					message,
 					title=_("Invalid Account")
 				)
+
+
+def on_doctype_update():
+	# Keyset pagination of expense_pay.api.get_expenses_entries
+	frappe.db.add_index("Expenses Entry", ["posting_date", "name"])
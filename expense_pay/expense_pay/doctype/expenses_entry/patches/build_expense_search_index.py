@@ -0,0 +1,43 @@
+import frappe
+
+from expense_pay.search import write_search_index_rows
+
+BATCH_SIZE = 1000
+
+
+def execute():
+    """Index existing Expenses Entries in batches (keyset on the voucher name), two queries per batch."""
+    last_name = ""
+
+    while True:
+        headers = frappe.get_all(
+            "Expenses Entry",
+            filters={"name": [">", last_name]},
+            fields=[
+                "name",
+                "company",
+                "posting_date",
+                "docstatus",
+                "remarks",
+                "account_paid_from",
+                "paid_amount",
+                "total_debit",
+            ],
+            order_by="name asc",
+            limit_page_length=BATCH_SIZE,
+        )
+        if not headers:
+            break
+
+        expenses = {}
+        for d in frappe.get_all(
+            "Expenses",
+            filters={"parenttype": "Expenses Entry", "parent": ["in", [h.name for h in headers]]},
+            fields=["parent", "expense_entry_type", "account_paid_to", "remarks", "amount_without_vat", "amount"],
+            order_by="parent asc, idx asc",
+        ):
+            expenses.setdefault(d.parent, []).append(d)
+
+        write_search_index_rows([(h, expenses.get(h.name, [])) for h in headers])
+        frappe.db.commit()
+        last_name = headers[-1].name
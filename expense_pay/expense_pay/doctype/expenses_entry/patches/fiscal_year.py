@@ -1,8 +1,9 @@
 import frappe
-from frappe.utils import getdate, logger
+from frappe.utils import getdate
 
-logger.set_log_level("DEBUG")
-logger = frappe.logger("fiscal_year_patch", allow_site=True, file_count=1)
+from expense_pay.utils import LazyLogger
+
+logger = LazyLogger("fiscal_year_patch")
 
 def execute():
     # Fetch all GL Entry documents that have a voucher_no containing "ACC-JV"
@@ -0,0 +1,41 @@
+import frappe
+
+from expense_pay.duplicates import get_expense_fingerprint
+
+BATCH_SIZE = 5000
+
+
+def execute():
+    """Backfill Expenses.fingerprint for existing lines in batches (keyset on the row name)."""
+    precision = frappe.get_precision("Expenses", "amount") or 2
+    last_name = ""
+
+    while True:
+        rows = frappe.db.sql(
+            """select e.name, e.account_paid_to, e.amount, e.remarks, ee.company, ee.posting_date
+            from `tabExpenses` e
+            inner join `tabExpenses Entry` ee on ee.name = e.parent
+            where e.parenttype = 'Expenses Entry' and e.name > %s
+                and (e.fingerprint is null or e.fingerprint = '')
+            order by e.name
+            limit %s""",
+            (last_name, BATCH_SIZE),
+            as_dict=True,
+        )
+        if not rows:
+            break
+
+        frappe.db.bulk_update(
+            "Expenses",
+            {
+                d.name: {
+                    "fingerprint": get_expense_fingerprint(
+                        d.company, d.posting_date, d.account_paid_to, d.amount, d.remarks, precision
+                    )
+                }
+                for d in rows
+            },
+            update_modified=False,
+        )
+        frappe.db.commit()
+        last_name = rows[-1].name
@@ -1,9 +1,579 @@
 # Copyright (c) 2023, Kishan Panchal and Contributors
 # See license.txt
 
-# import frappe
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import frappe
+import pymysql
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, getdate, nowdate
+
+from expense_pay import bulk_actions, create_gl_entry, exchange_rate, gl_archive, warmup
+from expense_pay.create_gl_entry import (
+	get_gl_posting_hash,
+	parse_reference_remarks,
+	run_with_lock_retry,
+	summarize_gl_entries,
+)
+from expense_pay.duplicates import get_expense_fingerprint
+from expense_pay.expense_pay.doctype.expense_allocation_rule.test_expense_allocation_rule import (
+	make_allocation_rule,
+)
+from expense_pay.export import export_expenses_entries
+from expense_pay.gl_reconciliation import MISMATCH_AMOUNT, check_gl_consistency
+
+# Budget for importing the app's hook modules on top of an already imported frappe (microseconds)
+IMPORT_TIME_BUDGET_US = 150_000
+
+# MariaDB ER_LOCK_DEADLOCK
+LOCK_DEADLOCK = 1213
+
+# Parallel submitters of the concurrency stress test
+STRESS_WORKERS = 4
+STRESS_VOUCHERS_PER_WORKER = 5
+
+
+def make_expenses_entry(expenses=None, submit=True, **args):
+	"""Expenses Entry of _Test Company paid from Cash - _TC; `expenses` rows default to one line of 100."""
+	expenses = expenses or [{"account_paid_to": "_Test Account Cost for Goods Sold - _TC", "amount_without_vat": 100}]
+	for expense in expenses:
+		expense.setdefault("amount", flt(expense["amount_without_vat"]) + flt(expense.get("vat_amount")))
+
+	doc = frappe.get_doc(
+		{
+			"doctype": "Expenses Entry",
+			"company": "_Test Company",
+			"posting_date": nowdate(),
+			"account_paid_from": "Cash - _TC",
+			"default_cost_center": "_Test Cost Center - _TC",
+			"paid_amount": sum(expense["amount"] for expense in expenses),
+			"remarks": "_Test Expenses Entry",
+			**args,
+			"expenses": expenses,
+		}
+	).insert()
+	if submit:
+		doc.submit()
+	return doc
+
+
+def purge_expenses_entry(name):
+	"""Remove a voucher committed by a test, with its GL Entries, whatever its docstatus."""
+	create_gl_entry._remove_and_delete_gl_entries(name)
+	frappe.db.delete("Expense Search Index", {"name": name})
+	frappe.db.delete("Expenses", {"parenttype": "Expenses Entry", "parent": name})
+	frappe.db.delete("Expenses Entry", {"name": name})
+	frappe.db.commit()
+
+
+def get_posted_gl_entries(voucher_no):
+	return frappe.get_all(
+		"GL Entry",
+		filters={"voucher_type": "Expenses Entry", "voucher_no": voucher_no, "is_cancelled": 0},
+		fields=["posting_date", "company", "account", "cost_center", "project", "debit", "credit", "remarks"],
+		order_by="account, cost_center, creation",
+	)
 
 
 class TestExpensesEntry(FrappeTestCase):
-	pass
+	def test_parse_reference_remarks(self):
+		reference = parse_reference_remarks("On Cancelled ACC-PAY-2025-00001 #3 VAT")
+		self.assertEqual(reference.voucher_no, "ACC-PAY-2025-00001")
+		self.assertEqual(reference.row_idx, 3)
+		self.assertTrue(reference.vat)
+		self.assertTrue(reference.cancelled)
+
+		reference = parse_reference_remarks("ACC-PAY-2025-00001")
+		self.assertEqual(reference.row_idx, 0)
+		self.assertFalse(reference.vat)
+
+		self.assertIsNone(parse_reference_remarks("Office rent | Amount without VAT: 100.0"))
+		# one-word voucher or line remarks (Full / Summary policies) are not references
+		for remarks in ("Rent", "On Cancelled Rent", "Invoice4711", "Rent #2"):
+			self.assertIsNone(parse_reference_remarks(remarks))
+		self.assertEqual(parse_reference_remarks("ACC-PAY-2025-00001-1 #2").voucher_no, "ACC-PAY-2025-00001-1")
+
+	def test_run_with_lock_retry(self):
+		calls = []
+
+		def flaky():
+			calls.append(1)
+			if len(calls) < 3:
+				raise frappe.QueryDeadlockError("Deadlock found when trying to get lock")
+			return "posted"
+
+		with (
+			patch.object(create_gl_entry, "_is_lock_error", return_value=True),
+			patch.object(create_gl_entry, "_backoff"),
+			patch.object(frappe.db, "rollback"),
+		):
+			self.assertEqual(run_with_lock_retry(flaky), "posted")
+		self.assertEqual(len(calls), 3)
+
+	def test_deadlock_on_submit_is_retried_by_the_transaction_owner(self):
+		doc = make_expenses_entry(submit=False)
+		frappe.db.commit()
+		self.addCleanup(purge_expenses_entry, doc.name)
+
+		lock_accounts = create_gl_entry.lock_accounts
+		calls = []
+
+		def deadlock_once(accounts):
+			calls.append(1)
+			if len(calls) == 1:
+				raise pymysql.err.OperationalError(LOCK_DEADLOCK, "Deadlock found when trying to get lock")
+			return lock_accounts(accounts)
+
+		def submit():
+			frappe.get_doc("Expenses Entry", doc.name).submit()
+			frappe.db.commit()
+
+		with patch.object(create_gl_entry, "lock_accounts", side_effect=deadlock_once):
+			# the hook neither rolls back nor retries: the request transaction is not its own
+			with patch.object(frappe.db, "rollback") as rollback:
+				self.assertRaises(pymysql.err.OperationalError, submit)
+			rollback.assert_not_called()
+			frappe.db.rollback()
+
+			calls.clear()
+			with patch.object(create_gl_entry, "_backoff"):
+				run_with_lock_retry(submit)
+
+		self.assertEqual(len(calls), 2)
+		self.assertEqual(frappe.db.get_value("Expenses Entry", doc.name, "docstatus"), 1)
+		posted = get_posted_gl_entries(doc.name)
+		self.assertEqual(sum(flt(d.debit) for d in posted), 100)
+		self.assertEqual(sum(flt(d.credit) for d in posted), 100)
+
+	def test_concurrent_submitters(self):
+		"""Parallel workers submitting on one cash account: every voucher is posted exactly once."""
+		site, sites_path = frappe.local.site, frappe.local.sites_path
+		names, errors = [], []
+		frappe.db.commit()
+
+		def submit_one():
+			doc = make_expenses_entry([{"account_paid_to": "_Test Write Off - _TC", "amount_without_vat": 10}])
+			frappe.db.commit()
+			return doc.name
+
+		def worker():
+			frappe.init(site=site, sites_path=sites_path)
+			frappe.connect()
+			frappe.set_user("Administrator")
+			try:
+				for _i in range(STRESS_VOUCHERS_PER_WORKER):
+					names.append(run_with_lock_retry(submit_one))
+			except Exception:
+				errors.append(frappe.get_traceback())
+			finally:
+				frappe.destroy()
+
+		threads = [threading.Thread(target=worker) for _i in range(STRESS_WORKERS)]
+		started = time.monotonic()
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		elapsed = time.monotonic() - started
+		for name in names:
+			self.addCleanup(purge_expenses_entry, name)
+
+		self.assertEqual(errors, [])
+		self.assertEqual(len(set(names)), STRESS_WORKERS * STRESS_VOUCHERS_PER_WORKER)
+		for name in names:
+			posted = get_posted_gl_entries(name)
+			self.assertEqual(len(posted), 2)
+			self.assertEqual(frappe.db.get_value("Expenses Entry", name, "gl_posting_hash"), get_gl_posting_hash(posted))
+		create_gl_entry.logger.info(f"{len(names)} vouchers submitted by {STRESS_WORKERS} workers in {elapsed:.2f}s")
+
+	def test_gl_consistency_check(self):
+		def get_mismatches(*vouchers):
+			return {
+				d["voucher_no"]: d["reason"]
+				for d in check_gl_consistency("_Test Company")
+				if d["voucher_no"] in vouchers
+			}
+
+		matching = make_expenses_entry()
+		# posted before VAT was split out: the row amount went to Account Paid To
+		legacy = make_expenses_entry()
+		frappe.db.set_value("Expenses", legacy.expenses[0].name, "amount_without_vat", 0)
+		tampered = make_expenses_entry()
+		frappe.db.sql(
+			"""update `tabGL Entry` set debit = debit - 1
+			where voucher_type = 'Expenses Entry' and voucher_no = %s and debit > 0""",
+			tampered.name,
+		)
+
+		self.assertEqual(
+			get_mismatches(matching.name, legacy.name, tampered.name), {tampered.name: MISMATCH_AMOUNT}
+		)
+
+	def test_edit_after_submit_posts_deltas(self):
+		doc = make_expenses_entry(
+			[
+				{"account_paid_to": "_Test Account Cost for Goods Sold - _TC", "amount_without_vat": 100},
+				{"account_paid_to": "_Test Write Off - _TC", "amount_without_vat": 50},
+			]
+		)
+		doc.flags.ignore_after_submit_permission = True
+		adjustment_remarks = f"Updated after submit: {doc.name}"
+
+		def get_adjustments():
+			return sorted(
+				(d.account, flt(d.debit), flt(d.credit))
+				for d in get_posted_gl_entries(doc.name)
+				if d.remarks == adjustment_remarks
+			)
+
+		doc.save()
+		self.assertEqual(len(get_posted_gl_entries(doc.name)), 3)
+
+		doc.expenses[0].amount_without_vat = 120
+		doc.save()
+		self.assertEqual(
+			get_adjustments(),
+			[("Cash - _TC", 0, 20), ("_Test Account Cost for Goods Sold - _TC", 20, 0)],
+		)
+
+		doc.append("expenses", {"account_paid_to": "_Test Write Off - _TC", "amount_without_vat": 30, "amount": 30})
+		doc.flags.ignore_validate_update_after_submit = True
+		doc.save()
+		self.assertEqual(
+			get_adjustments(),
+			[
+				("Cash - _TC", 0, 20),
+				("Cash - _TC", 0, 30),
+				("_Test Account Cost for Goods Sold - _TC", 20, 0),
+				("_Test Write Off - _TC", 30, 0),
+			],
+		)
+		self.assertEqual(doc.gl_posting_hash, get_gl_posting_hash(get_posted_gl_entries(doc.name)))
+
+	def test_edit_after_submit_updates_fingerprint(self):
+		doc = make_expenses_entry()
+		doc.flags.ignore_after_submit_permission = True
+		doc.expenses[0].amount_without_vat = 120
+		doc.save()
+
+		expected = get_expense_fingerprint(
+			doc.company, doc.posting_date, doc.expenses[0].account_paid_to, 120, doc.expenses[0].remarks
+		)
+		self.assertEqual(frappe.db.get_value("Expenses", doc.expenses[0].name, "fingerprint"), expected)
+
+	def test_edit_after_submit_skips_unposted_voucher(self):
+		doc = make_expenses_entry()
+		create_gl_entry._remove_and_delete_gl_entries(doc.name)
+		doc.db_set("gl_posting_hash", None)
+		doc.reload()
+
+		doc.flags.ignore_after_submit_permission = True
+		doc.expenses[0].amount_without_vat = 120
+		doc.save()
+		self.assertEqual(get_posted_gl_entries(doc.name), [])
+
+	def test_allocated_line_keeps_posted_split(self):
+		rule = make_allocation_rule(
+			"_Test Allocation Rule Posted", [("_Test Cost Center - _TC", 60), ("_Test Cost Center 2 - _TC", 40)]
+		)
+		doc = make_expenses_entry(
+			[
+				{
+					"account_paid_to": "_Test Account Cost for Goods Sold - _TC",
+					"amount_without_vat": 100,
+					"allocation_rule": rule.name,
+				}
+			]
+		)
+		rule.allocations[0].percentage = 50
+		rule.allocations[1].percentage = 50
+		rule.disabled = 1
+		rule.save()
+
+		# the edit is split like the posted line, not by the edited (and disabled) rule
+		doc.flags.ignore_after_submit_permission = True
+		doc.expenses[0].amount_without_vat = 120
+		doc.save()
+		expense_net = {}
+		for d in get_posted_gl_entries(doc.name):
+			if d.account == "_Test Account Cost for Goods Sold - _TC":
+				expense_net[d.cost_center] = flt(expense_net.get(d.cost_center, 0) + d.debit - d.credit, 2)
+		self.assertEqual(expense_net, {"_Test Cost Center - _TC": 72, "_Test Cost Center 2 - _TC": 48})
+
+		# the reversal mirrors the posted rows, so every cost center nets to zero
+		doc.cancel()
+		net = frappe.get_all(
+			"GL Entry",
+			filters={"voucher_type": "Expenses Entry", "voucher_no": doc.name},
+			fields=["account", "cost_center", "sum(debit) - sum(credit) as net"],
+			group_by="account, cost_center",
+		)
+		self.assertEqual(len(net), 3)
+		self.assertTrue(all(not flt(d.net, 2) for d in net))
+
+	def test_bulk_cancel_and_delete(self):
+		first = make_expenses_entry()
+		second = make_expenses_entry()
+		frappe.db.commit()
+		self.addCleanup(purge_expenses_entry, first.name)
+		self.addCleanup(purge_expenses_entry, second.name)
+
+		summary = bulk_actions.bulk_cancel_expenses_entries(names=[first.name, second.name])
+		self.assertEqual((summary.succeeded, summary.gl_reversed, summary.failed), (2, 2, []))
+		for name in (first.name, second.name):
+			self.assertEqual(frappe.db.get_value("Expenses Entry", name, "docstatus"), 2)
+			self.assertEqual(get_posted_gl_entries(name), [])
+			reversed_rows = frappe.get_all(
+				"GL Entry",
+				filters={"voucher_type": "Expenses Entry", "voucher_no": name, "is_cancelled": 1},
+				fields=["sum(debit) as debit", "sum(credit) as credit", "count(*) as count"],
+			)[0]
+			self.assertEqual((reversed_rows.debit, reversed_rows.credit, reversed_rows.count), (200, 200, 4))
+
+		# cancelled vouchers have no active GL rows left, their cancelled pairs are deleted too
+		summary = bulk_actions.bulk_delete_expenses_entries(names=[first.name, second.name])
+		self.assertEqual((summary.succeeded, summary.gl_deleted, summary.failed), (2, 2, []))
+		for name in (first.name, second.name):
+			self.assertFalse(frappe.db.exists("Expenses Entry", name))
+			self.assertFalse(frappe.db.exists("GL Entry", {"voucher_type": "Expenses Entry", "voucher_no": name}))
+
+	def test_bulk_cancel_detects_group_vat_account(self):
+		doc = frappe._dict(
+			name="ACC-PAY-TEST-00001",
+			account_paid_from="Cash - _TC",
+			expenses=[
+				frappe._dict(account_paid_to="_Test Account Cost for Goods Sold - _TC", vat_template="_Test VAT")
+			],
+		)
+		ledger_vat_account = ("_Test Account Cost for Goods Sold - _TC", None)
+		with patch.object(bulk_actions, "_get_vat_account", return_value=ledger_vat_account):
+			self.assertEqual(bulk_actions._get_vouchers_with_invalid_accounts([doc]), set())
+		with patch.object(bulk_actions, "_get_vat_account", return_value=("Duties and Taxes - _TC", None)):
+			self.assertEqual(bulk_actions._get_vouchers_with_invalid_accounts([doc]), {doc.name})
+
+	def test_archive_cancelled_gl_entries(self):
+		balanced = make_expenses_entry()
+		unbalanced = make_expenses_entry()
+		active = make_expenses_entry()
+		balanced.cancel()
+		unbalanced.cancel()
+		frappe.db.sql(
+			"""update `tabGL Entry` set debit = debit - 1
+			where voucher_type = 'Expenses Entry' and voucher_no = %s and account = 'Cash - _TC' and debit > 0""",
+			unbalanced.name,
+		)
+		frappe.db.commit()
+		for doc in (balanced, unbalanced, active):
+			self.addCleanup(purge_expenses_entry, doc.name)
+
+		def get_archived_rows(doc):
+			return frappe.db.sql(
+				f"select count(*) from `{gl_archive.GL_ARCHIVE_TABLE}` where voucher_no = %s", doc.name
+			)[0][0]
+
+		# cancelled today: newer than the cutoff
+		gl_archive.archive_cancelled_gl_entries(cutoff_days=1)
+		self.assertEqual([get_archived_rows(doc) for doc in (balanced, unbalanced, active)], [0, 0, 0])
+
+		with patch.object(gl_archive, "nowdate", return_value=add_days(nowdate(), 30)):
+			gl_archive.archive_cancelled_gl_entries(cutoff_days=1)
+		# only the cancelled voucher whose rows net to zero on every account is moved
+		self.assertEqual([get_archived_rows(doc) for doc in (balanced, unbalanced, active)], [4, 0, 0])
+		self.assertFalse(frappe.db.exists("GL Entry", {"voucher_type": "Expenses Entry", "voucher_no": balanced.name}))
+
+		frappe.delete_doc("Expenses Entry", balanced.name)
+		self.assertEqual(get_archived_rows(balanced), 0)
+
+	def test_export_writes_chunked_csv(self):
+		kept = make_expenses_entry()
+		cancelled = make_expenses_entry()
+		cancelled.cancel()
+		draft = make_expenses_entry(submit=False)
+
+		def export(include_cancelled):
+			directory = tempfile.mkdtemp()
+			self.addCleanup(shutil.rmtree, directory)
+			datasets = {}
+			for path in export_expenses_entries(
+				from_date=nowdate(),
+				to_date=nowdate(),
+				company="_Test Company",
+				rows_per_file=2,
+				include_cancelled=include_cancelled,
+				directory=directory,
+			):
+				with open(path, newline="", encoding="utf-8") as f:
+					_header, *rows = csv.reader(f)
+				datasets.setdefault(os.path.basename(path).rsplit("-", 1)[0], []).append(rows)
+			return datasets
+
+		datasets = export(include_cancelled=0)
+		for chunks in datasets.values():
+			self.assertTrue(all(len(rows) == 2 for rows in chunks[:-1]))
+			self.assertIn(len(chunks[-1]), (1, 2))
+		gl_vouchers = {row[1] for rows in datasets["expenses_entry_gl"] for row in rows}
+		self.assertIn(kept.name, gl_vouchers)
+		self.assertNotIn(cancelled.name, gl_vouchers)
+		self.assertNotIn(cancelled.name, {row[0] for rows in datasets["expenses_entry_lines"] for row in rows})
+
+		# drafts are never exported, with or without cancelled vouchers
+		for include_cancelled in (0, 1):
+			line_vouchers = {row[0] for rows in export(include_cancelled)["expenses_entry_lines"] for row in rows}
+			self.assertIn(kept.name, line_vouchers)
+			self.assertNotIn(draft.name, line_vouchers)
+			self.assertEqual(cancelled.name in line_vouchers, bool(include_cancelled))
+
+		datasets = export(include_cancelled=1)
+		self.assertGreater(len(datasets["expenses_entry_gl"]), 2)
+		cancelled_rows = [row for rows in datasets["expenses_entry_gl"] for row in rows if row[1] == cancelled.name]
+		# the original rows and their reversals
+		self.assertEqual(len(cancelled_rows), 4)
+		self.assertTrue(all(row[10] == "1" for row in cancelled_rows))
+
+	def test_gl_posting_hash_ignores_row_grouping(self):
+		common = {"posting_date": "2026-01-31", "company": "_Test Company", "cost_center": "Main - _TC"}
+		per_line = [
+			{**common, "account": "Cash - _TC", "credit": 150},
+			{**common, "account": "Rent - _TC", "debit": 100, "remarks": "line 1"},
+			{**common, "account": "Rent - _TC", "debit": 50, "remarks": "line 2"},
+		]
+		summarized = [
+			{**common, "account": "Rent - _TC", "debit": 150},
+			{**common, "account": "Cash - _TC", "credit": 150},
+		]
+		self.assertEqual(get_gl_posting_hash(per_line), get_gl_posting_hash(summarized))
+
+		summarized[0]["debit"] = 140
+		self.assertNotEqual(get_gl_posting_hash(per_line), get_gl_posting_hash(summarized))
+
+	def test_summarize_gl_entries(self):
+		doc = frappe._dict(name="ACC-PAY-2026-00001", precision=lambda fieldname: 2)
+		common = {"posting_date": "2026-01-31", "company": "_Test Company", "cost_center": "Main - _TC"}
+		gl_entries = [
+			{**common, "account": "Cash - _TC", "credit": 150.5, "against": "Rent - _TC"},
+			{**common, "account": "Rent - _TC", "debit": 100.2, "against": "Cash - _TC", "remarks": "line 1"},
+			{**common, "account": "Rent - _TC", "debit": 50.3, "against": "Cash - _TC", "remarks": "line 2"},
+		]
+
+		summarized = summarize_gl_entries(doc, gl_entries)
+		self.assertEqual(len(summarized), 2)
+		self.assertEqual(summarized[1]["debit"], 150.5)
+		self.assertEqual(summarized[1]["against"], "Cash - _TC")
+		self.assertEqual(summarized[1]["remarks"], "2 expense lines of ACC-PAY-2026-00001")
+		self.assertEqual(get_gl_posting_hash(summarized), get_gl_posting_hash(gl_entries))
+
+	def test_expense_fingerprint_normalizes_remarks(self):
+		fingerprint = get_expense_fingerprint("_Test Company", "2026-01-31", "Rent - _TC", 100, "Office  Rent ")
+		self.assertEqual(
+			fingerprint, get_expense_fingerprint("_Test Company", "2026-01-31", "Rent - _TC", 100.0, "office rent")
+		)
+		self.assertNotEqual(
+			fingerprint, get_expense_fingerprint("_Test Company", "2026-01-31", "Rent - _TC", 100.01, "office rent")
+		)
+
+	def test_exchange_rate_on_posting_date(self):
+		pairs = {
+			("USD", "INR"): (
+				[getdate("2026-01-01"), getdate("2026-02-01"), getdate("2026-02-01")],
+				[82.0, 83.0, 83.5],
+				["CE-1", "CE-2", "CE-3"],
+			),
+			("INR", "USD"): ([], [], []),
+		}
+		with patch.object(exchange_rate, "_get_site_pairs", return_value=pairs):
+			self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2026-01-31"), 82.0)
+			# the last rate created on a date wins
+			self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2026-03-15"), 83.5)
+			self.assertEqual(exchange_rate.get_exchange_rate("INR", "USD", "2026-02-01"), 1 / 83.5)
+			self.assertIsNone(exchange_rate.get_exchange_rate("USD", "INR", "2025-12-31", raise_exception=False))
+			self.assertEqual(exchange_rate.get_exchange_rate("INR", "INR", "2025-12-31"), 1.0)
+
+	def test_exchange_rate_index_is_checked_per_request(self):
+		def make_currency_exchange(rate):
+			return frappe.get_doc(
+				{
+					"doctype": "Currency Exchange",
+					"date": "2031-01-01",
+					"from_currency": "USD",
+					"to_currency": "INR",
+					"exchange_rate": rate,
+					"for_buying": 1,
+					"for_selling": 1,
+				}
+			).insert()
+
+		currency_exchange = make_currency_exchange(90)
+		frappe.local.expense_pay_rate_index_checked = False
+		self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2031-06-30"), 90)
+		self.assertTrue(frappe.local.expense_pay_rate_index_checked)
+
+		# saving a Currency Exchange drops the index of this process right away
+		currency_exchange.exchange_rate = 91
+		currency_exchange.save()
+		self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2031-06-30"), 91)
+
+		# another process changed the rates: picked up by the next request, not mid-request
+		frappe.db.set_value("Currency Exchange", currency_exchange.name, "exchange_rate", 92)
+		frappe.cache().set_value(exchange_rate.EXCHANGE_RATE_VERSION_CACHE_KEY, frappe.generate_hash(length=12))
+		self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2031-06-30"), 91)
+		frappe.local.expense_pay_rate_index_checked = False
+		self.assertEqual(exchange_rate.get_exchange_rate("USD", "INR", "2031-06-30"), 92)
+
+	def test_first_save_after_warmup_reads_masters_from_cache(self):
+		rule = make_allocation_rule(
+			"_Test Allocation Rule Warmup", [("_Test Cost Center - _TC", 50), ("_Test Cost Center 2 - _TC", 50)]
+		)
+		doc = make_expenses_entry(
+			[{"account_paid_to": "_Test Write Off - _TC", "amount_without_vat": 100, "allocation_rule": rule.name}],
+			submit=False,
+		)
+		frappe.clear_cache()
+		warmup.warm_caches()
+
+		# the benchmark is the number of master data queries: none on the first save, as in steady state
+		queries = []
+		sql = frappe.db.sql
+
+		def record(query, *args, **kwargs):
+			queries.append(str(query))
+			return sql(query, *args, **kwargs)
+
+		for _attempt in ("first", "steady"):
+			queries.clear()
+			with patch.object(frappe.db, "sql", side_effect=record):
+				doc.validate()
+			for table in ("`tabAccount`", "`tabExpense Allocation Rule`", "`tabPurchase Taxes and Charges"):
+				self.assertFalse([q for q in queries if table in q], table)
+
+	def test_hook_modules_import_lazily(self):
+		# python -X importtime writes "import time: self [us] | cumulative | imported package" to stderr
+		result = subprocess.run(
+			[
+				sys.executable,
+				"-X",
+				"importtime",
+				"-c",
+				"import frappe, frappe.utils; import expense_pay.create_gl_entry, expense_pay.hooks",
+			],
+			capture_output=True,
+			text=True,
+			check=True,
+		)
+		cumulative = {}
+		for line in result.stderr.splitlines():
+			if not line.startswith("import time:") or "|" not in line:
+				continue
+			_self, total, package = line[len("import time:") :].split("|")
+			if total.strip().isdigit():
+				cumulative[package.strip()] = int(total)
+
+		self.assertNotIn("erpnext.accounts.utils", cumulative)
+		self.assertLess(cumulative["expense_pay.create_gl_entry"], IMPORT_TIME_BUDGET_US)
@@ -0,0 +1,10 @@
+// Copyright (c) 2026, Kishan Panchal and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Recurring Expenses Entry", {
+    setup: function (frm) {
+        frm.set_query("reference_document", function () {
+            return { filters: { docstatus: 1 } };
+        });
+    },
+});
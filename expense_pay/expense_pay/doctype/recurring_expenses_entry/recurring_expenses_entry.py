@@ -0,0 +1,19 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import getdate
+
+
+class RecurringExpensesEntry(Document):
+	def validate(self):
+		if frappe.db.get_value("Expenses Entry", self.reference_document, "docstatus") != 1:
+			frappe.throw(_("Reference Expenses Entry {0} must be submitted.").format(self.reference_document))
+
+		if self.end_date and getdate(self.end_date) < getdate(self.start_date):
+			frappe.throw(_("End Date cannot be before Start Date."))
+
+		if not self.next_date or self.has_value_changed("start_date"):
+			self.next_date = self.start_date
@@ -0,0 +1,127 @@
+# Copyright (c) 2026, Kishan Panchal and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.budget.test_budget import make_budget
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate, nowdate
+
+from expense_pay import recurring
+from expense_pay.budget import _get_fiscal_year, clear_budget_cache, get_budget_spend
+from expense_pay.expense_pay.doctype.expenses_entry.test_expenses_entry import (
+	get_posted_gl_entries,
+	make_expenses_entry,
+	purge_expenses_entry,
+)
+from expense_pay.recurring import generate_recurring_expenses_entries, get_next_date
+
+
+class TestRecurringExpensesEntry(FrappeTestCase):
+	def test_monthly_schedule_keeps_start_day(self):
+		start_date = getdate("2026-01-31")
+		self.assertEqual(get_next_date(start_date, start_date, "Monthly"), getdate("2026-02-28"))
+		self.assertEqual(get_next_date(start_date, getdate("2026-02-28"), "Monthly"), getdate("2026-03-31"))
+		self.assertEqual(get_next_date(start_date, start_date, "Weekly"), getdate("2026-02-07"))
+
+	def make_template(self, expenses=None, weeks=2):
+		"""Weekly template due `weeks` + 1 times up to today; committed, as the generator commits per batch."""
+		reference = make_expenses_entry(
+			expenses or [{"account_paid_to": "_Test Write Off - _TC", "amount_without_vat": 10}]
+		)
+		template = frappe.get_doc(
+			{
+				"doctype": "Recurring Expenses Entry",
+				"reference_document": reference.name,
+				"company": "_Test Company",
+				"frequency": "Weekly",
+				"start_date": add_days(nowdate(), -7 * weeks),
+				"submit_on_creation": 1,
+			}
+		).insert()
+		frappe.db.commit()
+		self.addCleanup(self.purge_template, template.name, reference.name)
+		return template
+
+	def purge_template(self, template, reference):
+		for name in frappe.get_all("Expenses Entry", filters={"recurring_expenses_entry": template}, pluck="name"):
+			purge_expenses_entry(name)
+		frappe.db.delete("Recurring Expenses Entry", {"name": template})
+		purge_expenses_entry(reference)
+
+	def get_generated(self, template):
+		return frappe.get_all(
+			"Expenses Entry",
+			filters={"recurring_expenses_entry": template, "docstatus": 1},
+			fields=["name", "posting_date", "recurrence_key", "gl_posting_hash"],
+			order_by="posting_date asc",
+		)
+
+	def assert_generated_and_posted(self, template):
+		generated = self.get_generated(template.name)
+		self.assertEqual(
+			[d.recurrence_key for d in generated],
+			[f"{template.name}:{getdate(add_days(nowdate(), days))}" for days in (-14, -7, 0)],
+		)
+		for d in generated:
+			self.assertTrue(d.gl_posting_hash)
+			self.assertEqual(len(get_posted_gl_entries(d.name)), 2)
+
+	def test_batch_posting_is_idempotent(self):
+		template = self.make_template()
+
+		generate_recurring_expenses_entries()
+		self.assert_generated_and_posted(template)
+		self.assertEqual(
+			getdate(frappe.db.get_value("Recurring Expenses Entry", template.name, "next_date")),
+			getdate(add_days(nowdate(), 7)),
+		)
+
+		# a rerun over the same dates (e.g. an overlapping run) finds the recurrence keys
+		frappe.db.set_value("Recurring Expenses Entry", template.name, "next_date", template.start_date)
+		frappe.db.commit()
+		generate_recurring_expenses_entries()
+		self.assert_generated_and_posted(template)
+
+	def test_invalid_accounts_fall_back_to_per_template(self):
+		template = self.make_template()
+
+		with patch.object(recurring, "validate_all_accounts", side_effect=frappe.ValidationError):
+			generate_recurring_expenses_entries()
+		# the batch was rolled back and generated again through the regular submit hooks
+		self.assert_generated_and_posted(template)
+
+	def test_batch_cannot_run_past_stop_budget(self):
+		template = self.make_template(
+			[{"account_paid_to": "_Test Account Cost for Goods Sold - _TC", "amount_without_vat": 100}], weeks=1
+		)
+		budget = make_budget(budget_against="Cost Center", cost_center="_Test Cost Center - _TC")
+		self.addCleanup(self.purge_budget, budget.name)
+
+		fiscal_year, from_date, to_date = _get_fiscal_year(nowdate(), "_Test Company")
+		budget_key = ("Cost Center", "_Test Cost Center - _TC", "_Test Account Cost for Goods Sold - _TC")
+		spent = get_budget_spend("_Test Company", *budget_key, fiscal_year, from_date, to_date, for_update=True)
+		# room for one of the two occurrences of 100, not for both
+		budget.db_set("action_if_annual_budget_exceeded", "Stop")
+		frappe.db.set_value("Budget Account", {"parent": budget.name}, "budget_amount", spent + 150)
+		frappe.db.commit()
+		clear_budget_cache()
+
+		generate_recurring_expenses_entries()
+		self.assertEqual(self.get_generated(template.name), [])
+		self.assertEqual(
+			get_budget_spend("_Test Company", *budget_key, fiscal_year, from_date, to_date, for_update=True), spent
+		)
+
+	def purge_budget(self, budget):
+		frappe.db.delete("Budget Account", {"parent": budget})
+		frappe.db.delete("Budget", {"name": budget})
+		frappe.db.commit()
+		clear_budget_cache()
+
+	def test_exchange_rates_are_not_copied(self):
+		for doctype in ("Expenses Entry", "Expenses"):
+			copy_fields = recurring._get_copy_fields(doctype)
+			for fieldname in ("exchange_rate", "exchange_rate_date", "currency_exchange_link"):
+				self.assertNotIn(fieldname, copy_fields)
@@ -0,0 +1,52 @@
+// Copyright (c) 2026, Kishan Panchal and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Expenses Entry Ledger"] = {
+    filters: [
+        {
+            fieldname: "company",
+            label: __("Company"),
+            fieldtype: "Link",
+            options: "Company",
+            default: frappe.defaults.get_user_default("Company"),
+            reqd: 1,
+        },
+        {
+            fieldname: "from_date",
+            label: __("From Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.add_months(frappe.datetime.get_today(), -1),
+            reqd: 1,
+        },
+        {
+            fieldname: "to_date",
+            label: __("To Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.get_today(),
+            reqd: 1,
+        },
+        {
+            fieldname: "voucher_no",
+            label: __("Expenses Entry"),
+            fieldtype: "Link",
+            options: "Expenses Entry",
+        },
+        {
+            fieldname: "account",
+            label: __("Account"),
+            fieldtype: "Link",
+            options: "Account",
+        },
+        {
+            fieldname: "show_cancelled_entries",
+            label: __("Show Cancelled Entries"),
+            fieldtype: "Check",
+        },
+        {
+            fieldname: "include_archived",
+            label: __("Include Archived Entries"),
+            fieldtype: "Check",
+            depends_on: "show_cancelled_entries",
+        },
+    ],
+};
@@ -0,0 +1,94 @@
+# Copyright (c) 2026, Kishan Panchal and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+
+from expense_pay.create_gl_entry import (
+	VOUCHER_TYPE_EXPENSES_ENTRY,
+	parse_reference_remarks,
+	render_reference_remarks,
+)
+from expense_pay.gl_archive import get_archived_gl_entries
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	return get_columns(), get_data(filters)
+
+
+def get_columns():
+	return [
+		{"fieldname": "posting_date", "label": _("Posting Date"), "fieldtype": "Date", "width": 100},
+		{
+			"fieldname": "voucher_no",
+			"label": _("Expenses Entry"),
+			"fieldtype": "Link",
+			"options": VOUCHER_TYPE_EXPENSES_ENTRY,
+			"width": 170,
+		},
+		{"fieldname": "account", "label": _("Account"), "fieldtype": "Link", "options": "Account", "width": 200},
+		{"fieldname": "debit", "label": _("Debit"), "fieldtype": "Currency", "width": 120},
+		{"fieldname": "credit", "label": _("Credit"), "fieldtype": "Currency", "width": 120},
+		{
+			"fieldname": "cost_center",
+			"label": _("Cost Center"),
+			"fieldtype": "Link",
+			"options": "Cost Center",
+			"width": 150,
+		},
+		{"fieldname": "project", "label": _("Project"), "fieldtype": "Link", "options": "Project", "width": 120},
+		{"fieldname": "is_cancelled", "label": _("Cancelled"), "fieldtype": "Check", "width": 80},
+		{"fieldname": "remarks", "label": _("Remarks"), "fieldtype": "Small Text", "width": 400},
+	]
+
+
+def get_data(filters):
+	conditions = {
+		"voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+		"company": filters.company,
+		"posting_date": ["between", [filters.from_date, filters.to_date]],
+	}
+	if filters.voucher_no:
+		conditions["voucher_no"] = filters.voucher_no
+	if filters.account:
+		conditions["account"] = filters.account
+	if not filters.show_cancelled_entries:
+		conditions["is_cancelled"] = 0
+
+	gl_entries = frappe.get_all(
+		"GL Entry",
+		filters=conditions,
+		fields=[
+			"posting_date",
+			"voucher_no",
+			"account",
+			"debit",
+			"credit",
+			"cost_center",
+			"project",
+			"is_cancelled",
+			"remarks",
+		],
+		order_by="posting_date, voucher_no, creation",
+	)
+
+	# Archived rows are cancelled pairs moved out of `tabGL Entry`; merge them in date order
+	if filters.show_cancelled_entries and filters.include_archived:
+		gl_entries = sorted(
+			gl_entries + get_archived_gl_entries(filters),
+			key=lambda d: (d.posting_date, d.voucher_no),
+		)
+
+	# Rows posted with the Reference Only remarks policy only carry a pointer to the voucher row;
+	# render the detail for the rows on this page in one pass.
+	references = [
+		d.remarks
+		for d in gl_entries
+		if (reference := parse_reference_remarks(d.remarks)) and reference.voucher_no == d.voucher_no
+	]
+	rendered = render_reference_remarks(references)
+	for d in gl_entries:
+		d.remarks = rendered.get(d.remarks, d.remarks)
+
+	return gl_entries
@@ -0,0 +1,281 @@
+import csv
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, now_datetime
+
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY
+from expense_pay.utils import logger, stream_sql
+
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_PARQUET = "parquet"
+EXPORT_FORMATS = (EXPORT_FORMAT_CSV, EXPORT_FORMAT_PARQUET)
+EXPORT_ROWS_PER_FILE = 500_000
+EXPORT_BATCH_SIZE = 10_000  # rows buffered per Parquet row group
+
+# (column, type) per dataset; the type drives Parquet schemas and value conversion
+LINE_COLUMNS = (
+    ("voucher_no", "string"),
+    ("posting_date", "date"),
+    ("company", "string"),
+    ("docstatus", "int"),
+    ("account_paid_from", "string"),
+    ("paid_amount", "float"),
+    ("voucher_remarks", "string"),
+    ("idx", "int"),
+    ("expense_entry_type", "string"),
+    ("account_paid_to", "string"),
+    ("cost_center", "string"),
+    ("project", "string"),
+    ("vat_template", "string"),
+    ("amount_without_vat", "float"),
+    ("vat_amount", "float"),
+    ("amount", "float"),
+    ("remarks", "string"),
+)
+
+GL_COLUMNS = (
+    ("gl_entry", "string"),
+    ("voucher_no", "string"),
+    ("posting_date", "date"),
+    ("company", "string"),
+    ("account", "string"),
+    ("debit", "float"),
+    ("credit", "float"),
+    ("cost_center", "string"),
+    ("project", "string"),
+    ("against", "string"),
+    ("is_cancelled", "int"),
+    ("remarks", "string"),
+)
+
+_LINES_QUERY = """
+    select ee.name, ee.posting_date, ee.company, ee.docstatus, ee.account_paid_from, ee.paid_amount,
+        ee.remarks, e.idx, e.expense_entry_type, e.account_paid_to, e.cost_center, e.project,
+        e.vat_template, e.amount_without_vat, e.vat_amount, e.amount, e.remarks
+    from `tabExpenses Entry` ee
+    inner join `tabExpenses` e
+        on e.parent = ee.name and e.parenttype = 'Expenses Entry' and e.parentfield = 'expenses'
+    where ee.posting_date between %(from_date)s and %(to_date)s
+        and ee.docstatus in %(docstatus)s {company_condition}
+    order by ee.posting_date, ee.name, e.idx
+"""
+
+_GL_QUERY = """
+    select name, voucher_no, posting_date, company, account, debit, credit, cost_center, project,
+        against, is_cancelled, remarks
+    from `tabGL Entry`
+    where voucher_type = %(voucher_type)s and posting_date between %(from_date)s and %(to_date)s
+        {company_condition} {cancelled_condition}
+    order by posting_date, voucher_no, creation
+"""
+
+
+class _ChunkedWriter:
+    """Write rows to ``<prefix>-0001.<ext>``, ``<prefix>-0002.<ext>``... rolling over every `rows_per_file`."""
+
+    def __init__(self, directory, prefix, columns, export_format, rows_per_file):
+        self.directory = directory
+        self.prefix = prefix
+        self.columns = columns
+        self.export_format = export_format
+        self.rows_per_file = rows_per_file
+        self.paths = []
+        self.row_count = 0
+        self._file_rows = 0
+        self._file = None
+        self._writer = None
+        self._batch = []
+
+        if export_format == EXPORT_FORMAT_PARQUET:
+            self._schema = _get_parquet_schema(columns)
+
+    def write(self, row):
+        if self._writer is None or self._file_rows >= self.rows_per_file:
+            self._open_next_file()
+
+        if self.export_format == EXPORT_FORMAT_CSV:
+            self._writer.writerow(row)
+        else:
+            self._batch.append(row)
+            if len(self._batch) >= EXPORT_BATCH_SIZE:
+                self._flush_batch()
+
+        self._file_rows += 1
+        self.row_count += 1
+
+    def close(self):
+        if self.export_format == EXPORT_FORMAT_PARQUET:
+            self._flush_batch()
+            if self._writer is not None:
+                self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = self._writer = None
+
+    def _open_next_file(self):
+        self.close()
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths) + 1:04d}.{self.export_format}")
+        self.paths.append(path)
+        self._file_rows = 0
+
+        if self.export_format == EXPORT_FORMAT_CSV:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow([column for column, _type in self.columns])
+        else:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _flush_batch(self):
+        if not self._batch:
+            return
+        import pyarrow as pa
+
+        arrays = [
+            pa.array([_to_parquet_value(row[i], column_type) for row in self._batch], type=self._schema.field(i).type)
+            for i, (_column, column_type) in enumerate(self.columns)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self._batch = []
+
+
+def _get_parquet_schema(columns):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        frappe.throw(_("Parquet export needs the pyarrow package. Install it or export as CSV."))
+
+    types = {"string": pa.string(), "date": pa.date32(), "float": pa.float64(), "int": pa.int64()}
+    return pa.schema([(column, types[column_type]) for column, column_type in columns])
+
+
+def _to_parquet_value(value, column_type):
+    if value is None:
+        return None
+    if column_type == "float":
+        return flt(value)
+    if column_type == "int":
+        return cint(value)
+    return value
+
+
+def _get_export_period(fiscal_year=None, from_date=None, to_date=None):
+    if fiscal_year:
+        from_date, to_date = frappe.db.get_value(
+            "Fiscal Year", fiscal_year, ["year_start_date", "year_end_date"]
+        ) or (None, None)
+    if not (from_date and to_date):
+        frappe.throw(_("Select a Fiscal Year or both From Date and To Date to export."))
+    return from_date, to_date
+
+
+def export_expenses_entries(
+    fiscal_year=None,
+    from_date=None,
+    to_date=None,
+    company=None,
+    export_format=EXPORT_FORMAT_CSV,
+    rows_per_file=EXPORT_ROWS_PER_FILE,
+    include_cancelled=False,
+    directory=None,
+):
+    """
+    Export Expenses Entries with their expense lines and GL rows for a period.
+
+    Two datasets are written, each as numbered chunk files: ``expenses_entry_lines`` (one row
+    per expense line with its voucher header) and ``expenses_entry_gl`` (one row per GL Entry).
+    Each dataset is a single joined query streamed through a server-side cursor, so memory
+    stays bounded by one row (CSV) or one row group (Parquet). Returns the list of file paths.
+    """
+    if export_format not in EXPORT_FORMATS:
+        frappe.throw(_("Export format must be one of: {0}").format(", ".join(EXPORT_FORMATS)))
+
+    from_date, to_date = _get_export_period(fiscal_year, from_date, to_date)
+    rows_per_file = cint(rows_per_file) or EXPORT_ROWS_PER_FILE
+    directory = directory or frappe.get_site_path(
+        "private", "files", "expense_pay_exports", now_datetime().strftime("%Y%m%d-%H%M%S")
+    )
+    os.makedirs(directory, exist_ok=True)
+
+    values = {
+        "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+        "from_date": from_date,
+        "to_date": to_date,
+        "company": company,
+        "docstatus": (1, 2) if cint(include_cancelled) else (1,),
+    }
+    datasets = (
+        ("expenses_entry_lines", LINE_COLUMNS, _LINES_QUERY, "and ee.company = %(company)s"),
+        ("expenses_entry_gl", GL_COLUMNS, _GL_QUERY, "and company = %(company)s"),
+    )
+
+    paths = []
+    for prefix, columns, query, company_condition in datasets:
+        writer = _ChunkedWriter(directory, prefix, columns, export_format, rows_per_file)
+        try:
+            query = query.format(
+                company_condition=company_condition if company else "",
+                cancelled_condition="" if cint(include_cancelled) else "and is_cancelled = 0",
+            )
+            for row in stream_sql(query, values):
+                writer.write(row)
+        finally:
+            writer.close()
+        logger.info(f"Expenses export: {writer.row_count} rows in {len(writer.paths)} {prefix} files")
+        paths.extend(writer.paths)
+
+    return paths
+
+
+@frappe.whitelist()
+def enqueue_expenses_export(
+    fiscal_year=None, from_date=None, to_date=None, company=None, export_format=EXPORT_FORMAT_CSV, include_cancelled=0
+):
+    """Run the export on the long queue; the caller is notified with links to the files."""
+    frappe.only_for(("Accounts Manager", "System Manager"))
+    _get_export_period(fiscal_year, from_date, to_date)
+    frappe.enqueue(
+        "expense_pay.export.run_expenses_export",
+        queue="long",
+        timeout=6 * 3600,
+        fiscal_year=fiscal_year,
+        from_date=from_date,
+        to_date=to_date,
+        company=company,
+        export_format=export_format,
+        include_cancelled=include_cancelled,
+        user=frappe.session.user,
+    )
+    frappe.msgprint(_("Export queued. You will be notified when the files are ready."), alert=True)
+
+
+def run_expenses_export(user=None, **kwargs):
+    paths = export_expenses_entries(**kwargs)
+
+    file_urls = []
+    site_files = os.path.abspath(frappe.get_site_path("private", "files"))
+    for path in paths:
+        file_url = "/private/files/" + os.path.relpath(os.path.abspath(path), site_files)
+        frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": os.path.basename(path),
+                "file_url": file_url,
+                "is_private": 1,
+            }
+        ).insert(ignore_permissions=True)
+        file_urls.append(file_url)
+    frappe.db.commit()
+
+    if user:
+        frappe.publish_realtime(
+            "msgprint",
+            _("Expenses export finished:<br>{0}").format(
+                "<br>".join(f'<a href="{url}">{os.path.basename(url)}</a>' for url in file_urls)
+            ),
+            user=user,
+        )
+    return file_urls
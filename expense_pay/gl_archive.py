@@ -0,0 +1,220 @@
+import frappe
+from frappe.utils import add_days, cint, nowdate
+
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY, logger
+
+# Plain table (no DocType and no "tab" prefix, so schema cleanup tools leave it alone)
+GL_ARCHIVE_TABLE = "expense_pay_gl_entry_archive"
+GL_ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVED_GL_FIELDS = (
+    "posting_date",
+    "voucher_no",
+    "account",
+    "debit",
+    "credit",
+    "cost_center",
+    "project",
+    "is_cancelled",
+    "remarks",
+)
+
+
+def archive_cancelled_gl_entries(cutoff_days=None, batch_size=GL_ARCHIVE_BATCH_SIZE):
+    """
+    Move the GL rows of cancelled Expenses Entries older than the cutoff into the archive table.
+
+    A voucher is archived when all its GL rows are cancelled, they net to zero on every
+    account (original rows and their reversal), and both its last posting date and its
+    cancellation are older than the cutoff. Each batch is copied and deleted in one
+    transaction. Returns the number of rows moved and the estimated space reclaimed.
+    """
+    cutoff_days = cint(
+        cutoff_days
+        if cutoff_days is not None
+        else frappe.db.get_single_value("Expense Entry Settings", "gl_archive_after_days")
+    )
+    if cutoff_days <= 0:
+        return None
+
+    cutoff = add_days(nowdate(), -cutoff_days)
+    ensure_archive_table()
+    before = get_table_size("tabGL Entry")
+
+    moved_vouchers = moved_rows = 0
+    last_voucher = ""
+    while True:
+        # The voucher's `modified` stands in for its cancellation time (cancel is its last
+        # write in practice); a later edit of the cancelled voucher only delays archiving
+        vouchers = frappe.db.sql_list(
+            """select gle.voucher_no
+            from `tabGL Entry` gle
+            inner join `tabExpenses Entry` ee on ee.name = gle.voucher_no
+            where gle.voucher_type = %(voucher_type)s and gle.voucher_no > %(last_voucher)s
+                and ee.docstatus = 2 and ee.modified < %(cutoff)s
+            group by gle.voucher_no
+            having sum(gle.is_cancelled = 0) = 0 and max(gle.posting_date) < %(cutoff)s
+            order by gle.voucher_no
+            limit %(batch_size)s""",
+            {
+                "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY,
+                "last_voucher": last_voucher,
+                "cutoff": cutoff,
+                "batch_size": cint(batch_size) or GL_ARCHIVE_BATCH_SIZE,
+            },
+        )
+        if not vouchers:
+            break
+        last_voucher = vouchers[-1]
+
+        unbalanced = set(
+            frappe.db.sql_list(
+                """select distinct voucher_no
+                from `tabGL Entry`
+                where voucher_type = %s and voucher_no in %s
+                group by voucher_no, account
+                having abs(sum(debit) - sum(credit)) >= 0.005""",
+                (VOUCHER_TYPE_EXPENSES_ENTRY, vouchers),
+            )
+        )
+        vouchers = [voucher_no for voucher_no in vouchers if voucher_no not in unbalanced]
+        if not vouchers:
+            continue
+
+        moved_rows += _move_to_archive(vouchers)
+        moved_vouchers += len(vouchers)
+        frappe.db.commit()
+
+    result = {
+        "vouchers": moved_vouchers,
+        "rows": moved_rows,
+        "estimated_reclaimed_data_bytes": int(before.avg_row_length * moved_rows),
+        "estimated_reclaimed_index_bytes": int(before.index_length / before.table_rows * moved_rows)
+        if before.table_rows
+        else 0,
+    }
+    logger.info(
+        f"Archived {moved_rows} cancelled GL rows of {moved_vouchers} Expenses Entries; estimated space "
+        f"reclaimed: {result['estimated_reclaimed_data_bytes']} bytes data, "
+        f"{result['estimated_reclaimed_index_bytes']} bytes indexes (run OPTIMIZE TABLE to release it)"
+    )
+    return result
+
+
+def _move_to_archive(vouchers):
+    rows = frappe.db.sql(
+        "select count(*) from `tabGL Entry` where voucher_type = %s and voucher_no in %s and is_cancelled = 1",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, vouchers),
+    )[0][0]
+    columns = ", ".join(f"`{column}`" for column in _get_columns("tabGL Entry"))
+    frappe.db.sql(
+        f"""insert into `{GL_ARCHIVE_TABLE}` ({columns})
+        select {columns} from `tabGL Entry`
+        where voucher_type = %s and voucher_no in %s and is_cancelled = 1""",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, vouchers),
+    )
+    frappe.db.sql(
+        "delete from `tabGL Entry` where voucher_type = %s and voucher_no in %s and is_cancelled = 1",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, vouchers),
+    )
+    return cint(rows)
+
+
+def ensure_archive_table():
+    """Create the archive table like `tabGL Entry` and add columns GL Entry gained since."""
+    frappe.db.sql_ddl(f"create table if not exists `{GL_ARCHIVE_TABLE}` like `tabGL Entry`")
+
+    archive_columns = set(_get_columns(GL_ARCHIVE_TABLE))
+    for column in frappe.db.sql(
+        """select column_name, column_type, is_nullable, column_default
+        from information_schema.columns
+        where table_schema = database() and table_name = 'tabGL Entry'
+        order by ordinal_position""",
+        as_dict=True,
+    ):
+        if column.column_name in archive_columns:
+            continue
+        definition = f"`{column.column_name}` {column.column_type}"
+        if column.is_nullable == "NO":
+            definition += " not null"
+        if column.column_default is not None:
+            definition += f" default {frappe.db.escape(column.column_default)}"
+        frappe.db.sql_ddl(f"alter table `{GL_ARCHIVE_TABLE}` add column {definition}")
+
+
+def _get_columns(table):
+    return frappe.db.sql_list(
+        """select column_name from information_schema.columns
+        where table_schema = database() and table_name = %s
+        order by ordinal_position""",
+        (table,),
+    )
+
+
+def get_table_size(table):
+    size = frappe.db.sql(
+        """select ifnull(table_rows, 0) as table_rows, ifnull(avg_row_length, 0) as avg_row_length,
+            ifnull(data_length, 0) as data_length, ifnull(index_length, 0) as index_length,
+            ifnull(data_free, 0) as data_free
+        from information_schema.tables
+        where table_schema = database() and table_name = %s""",
+        (table,),
+        as_dict=True,
+    )
+    return size[0] if size else frappe._dict(table_rows=0, avg_row_length=0, data_length=0, index_length=0, data_free=0)
+
+
+@frappe.whitelist()
+def get_gl_archive_stats():
+    """Size of `tabGL Entry` and of the archive table (information_schema estimates)."""
+    frappe.only_for(("Accounts Manager", "System Manager"))
+    return {
+        "gl_entry": get_table_size("tabGL Entry"),
+        "archive": get_table_size(GL_ARCHIVE_TABLE),
+    }
+
+
+def archive_table_exists():
+    return bool(
+        frappe.db.sql(
+            """select 1 from information_schema.tables
+            where table_schema = database() and table_name = %s""",
+            (GL_ARCHIVE_TABLE,),
+        )
+    )
+
+
+def delete_archived_gl_entries(voucher_nos):
+    """Delete the archived GL rows of Expenses Entries that are being deleted."""
+    if not voucher_nos or not archive_table_exists():
+        return
+    frappe.db.sql(
+        f"delete from `{GL_ARCHIVE_TABLE}` where voucher_type = %s and voucher_no in %s",
+        (VOUCHER_TYPE_EXPENSES_ENTRY, list(voucher_nos)),
+    )
+
+
+def get_archived_gl_entries(filters):
+    """Archived GL rows of Expenses Entries for the Expenses Entry Ledger report."""
+    if not archive_table_exists():
+        return []
+
+    conditions = [
+        "voucher_type = %(voucher_type)s",
+        "company = %(company)s",
+        "posting_date between %(from_date)s and %(to_date)s",
+    ]
+    if filters.voucher_no:
+        conditions.append("voucher_no = %(voucher_no)s")
+    if filters.account:
+        conditions.append("account = %(account)s")
+
+    return frappe.db.sql(
+        f"""select {", ".join(ARCHIVED_GL_FIELDS)}, 1 as is_archived
+        from `{GL_ARCHIVE_TABLE}`
+        where {" and ".join(conditions)}
+        order by posting_date, voucher_no, creation""",
+        {**filters, "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY},
+        as_dict=True,
+    )
+
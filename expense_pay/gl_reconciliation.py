@@ -0,0 +1,167 @@
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY
+from expense_pay.utils import logger, stream_sql
+
+MISMATCH_MISSING_GL = "Missing GL Entries"
+MISMATCH_UNEXPECTED_GL = "Unexpected GL Entries"
+MISMATCH_AMOUNT = "Amount Mismatch"
+
+# Net amount (debit - credit) each submitted voucher should have on each account:
+# credit on Account Paid From, debit per row on Account Paid To and on the VAT account of
+# the row's template (first tax row, as used by create_gl_entries). Legacy vouchers with a
+# row without Amount Without VAT were posted before VAT was split out: the full row amount
+# went to Account Paid To.
+_LEGACY_VOUCHER_CONDITION = """exists (
+    select 1 from `tabExpenses` legacy
+    where legacy.parent = ee.name and legacy.parenttype = 'Expenses Entry'
+        and legacy.parentfield = 'expenses' and ifnull(legacy.amount_without_vat, 0) <= 0
+)"""
+
+_EXPECTED_GL_QUERY = """
+    select voucher_no, account, sum(amount) as amount
+    from (
+        select ee.name as voucher_no, ee.account_paid_from as account, -ee.paid_amount as amount
+        from `tabExpenses Entry` ee
+        where ee.docstatus = 1 {entry_conditions}
+
+        union all
+
+        select ee.name, e.account_paid_to, if({legacy_condition}, e.amount, e.amount_without_vat)
+        from `tabExpenses Entry` ee
+        inner join `tabExpenses` e
+            on e.parent = ee.name and e.parenttype = 'Expenses Entry' and e.parentfield = 'expenses'
+        where ee.docstatus = 1 {entry_conditions}
+
+        union all
+
+        select ee.name, tax.account_head, e.vat_amount
+        from `tabExpenses Entry` ee
+        inner join `tabExpenses` e
+            on e.parent = ee.name and e.parenttype = 'Expenses Entry' and e.parentfield = 'expenses'
+        inner join `tabPurchase Taxes and Charges` tax
+            on tax.parent = e.vat_template
+            and tax.parenttype = 'Purchase Taxes and Charges Template'
+            and tax.idx = 1
+        where ee.docstatus = 1 and e.vat_amount > 0 and not {legacy_condition} {entry_conditions}
+    ) expected
+    group by voucher_no, account
+    order by voucher_no, account
+"""
+
+_ACTUAL_GL_QUERY = """
+    select voucher_no, account, sum(debit) - sum(credit) as amount
+    from `tabGL Entry`
+    where voucher_type = %(voucher_type)s and is_cancelled = 0 {gl_conditions}
+    group by voucher_no, account
+    order by voucher_no, account
+"""
+
+
+def _iter_voucher_digests(rows, precision):
+    """
+    Fold ``(voucher_no, account, amount)`` rows ordered by voucher_no into one digest per voucher.
+
+    Accounts netting to zero are ignored so a reversed-and-reposted account does not count
+    as a difference.
+    """
+    current, parts = None, []
+    for voucher_no, account, amount in rows:
+        if voucher_no != current:
+            if current is not None:
+                yield current, _digest(parts)
+            current, parts = voucher_no, []
+        amount = flt(amount, precision)
+        if amount:
+            parts.append(f"{account}:{amount:.{precision}f}")
+    if current is not None:
+        yield current, _digest(parts)
+
+
+def _digest(parts) -> bytes:
+    return hashlib.sha1("\n".join(sorted(parts)).encode()).digest()
+
+
+def check_gl_consistency(company=None):
+    """
+    Compare the expected GL rows of every submitted Expenses Entry with the posted GL rows.
+
+    Both sides are aggregated per (voucher, account) in SQL and streamed in voucher order;
+    only a 20 byte digest per voucher is kept in memory. Returns the mismatched vouchers as
+    a list of ``{"voucher_no", "reason"}`` dicts.
+    """
+    precision = frappe.get_precision(VOUCHER_TYPE_EXPENSES_ENTRY, "paid_amount") or 2
+    values = {"voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY, "company": company}
+    entry_conditions = "and ee.company = %(company)s" if company else ""
+    gl_conditions = "and company = %(company)s" if company else ""
+
+    expected_query = _EXPECTED_GL_QUERY.format(
+        entry_conditions=entry_conditions, legacy_condition=_LEGACY_VOUCHER_CONDITION
+    )
+    expected = dict(_iter_voucher_digests(stream_sql(expected_query, values), precision))
+    logger.info(f"GL consistency check: {len(expected)} submitted Expenses Entries")
+
+    empty_digest = _digest([])
+    mismatches = []
+    for voucher_no, actual_digest in _iter_voucher_digests(
+        stream_sql(_ACTUAL_GL_QUERY.format(gl_conditions=gl_conditions), values), precision
+    ):
+        expected_digest = expected.pop(voucher_no, None)
+        if expected_digest == actual_digest:
+            continue
+        if expected_digest is None:
+            if actual_digest != empty_digest:
+                mismatches.append({"voucher_no": voucher_no, "reason": MISMATCH_UNEXPECTED_GL})
+        else:
+            mismatches.append({"voucher_no": voucher_no, "reason": MISMATCH_AMOUNT})
+
+    mismatches.extend(
+        {"voucher_no": voucher_no, "reason": MISMATCH_MISSING_GL}
+        for voucher_no, expected_digest in expected.items()
+        if expected_digest != empty_digest
+    )
+    mismatches.sort(key=lambda d: d["voucher_no"])
+
+    logger.info(f"GL consistency check: {len(mismatches)} mismatched vouchers")
+    return mismatches
+
+
+@frappe.whitelist()
+def find_gl_mismatches(company=None):
+    """Return Expenses Entries whose active GL rows do not match the document."""
+    frappe.only_for(("Accounts Manager", "System Manager"))
+    return check_gl_consistency(company)
+
+
+@frappe.whitelist()
+def enqueue_gl_consistency_check(company=None):
+    """Run the consistency check on the long queue and notify the caller when it finishes."""
+    frappe.only_for(("Accounts Manager", "System Manager"))
+    frappe.enqueue(
+        "expense_pay.gl_reconciliation.run_gl_consistency_check",
+        queue="long",
+        timeout=3600,
+        company=company,
+        user=frappe.session.user,
+    )
+    frappe.msgprint(_("GL consistency check queued. You will be notified when it completes."), alert=True)
+
+
+def run_gl_consistency_check(company=None, user=None):
+    mismatches = check_gl_consistency(company)
+    if not user:
+        return mismatches
+
+    if mismatches:
+        message = _("{0} Expenses Entries do not match their GL Entries:<br>{1}").format(
+            len(mismatches),
+            "<br>".join(f"{d['voucher_no']}: {_(d['reason'])}" for d in mismatches[:100]),
+        )
+    else:
+        message = _("All Expenses Entries match their GL Entries.")
+    frappe.publish_realtime("msgprint", message, user=user)
+    return mismatches
@@ -63,6 +63,9 @@ app_license = "MIT"
 # Installation
 # ------------
 
+after_migrate = "expense_pay.warmup.enqueue_warmup"
+boot_session = "expense_pay.warmup.boot_session"
+
 # before_install = "expense_pay.install.before_install"
 # after_install = "expense_pay.install.after_install"
 
@@ -98,6 +101,9 @@ app_license = "MIT"
 #	"ToDo": "custom_app.overrides.CustomToDo"
 # }
 
+# The search index row is removed in on_trash; do not block deleting the voucher on it
+ignore_links_on_delete = ["Expense Search Index"]
+
 # Document Events
 # ---------------
 # Hook on document methods and events
@@ -112,31 +118,62 @@ app_license = "MIT"
 
 doc_events = {
     "Expenses Entry": {
-        "on_submit": "expense_pay.create_gl_entry.create_gl_entries",
-        "on_cancel": "expense_pay.create_gl_entry.cancel_gl_entries",
-        "on_trash": "expense_pay.create_gl_entry.delete_gl_entries"
+        "on_update": "expense_pay.search.update_search_index",
+        "on_submit": [
+            "expense_pay.create_gl_entry.create_gl_entries",
+            "expense_pay.search.update_search_index",
+            "expense_pay.period_snapshot.invalidate_period_snapshots"
+        ],
+        "on_update_after_submit": [
+            "expense_pay.create_gl_entry.repost_gl_entries_after_submit",
+            "expense_pay.search.update_search_index",
+            "expense_pay.period_snapshot.invalidate_period_snapshots"
+        ],
+        "on_cancel": [
+            "expense_pay.create_gl_entry.cancel_gl_entries",
+            "expense_pay.search.update_search_index",
+            "expense_pay.period_snapshot.invalidate_period_snapshots"
+        ],
+        "on_trash": [
+            "expense_pay.create_gl_entry.delete_gl_entries",
+            "expense_pay.search.delete_search_index"
+        ]
+    },
+    "Currency Exchange": {
+        "on_update": "expense_pay.exchange_rate.clear_exchange_rate_index",
+        "on_trash": "expense_pay.exchange_rate.clear_exchange_rate_index",
+        "after_rename": "expense_pay.exchange_rate.clear_exchange_rate_index"
+    },
+    "Period Closing Voucher": {
+        "on_submit": "expense_pay.period_snapshot.on_period_closing_voucher_submit",
+        "on_cancel": "expense_pay.period_snapshot.on_period_closing_voucher_cancel"
+    },
+    "GL Entry": {
+        "on_submit": "expense_pay.account_balance.on_gl_entry_submit"
+    },
+    "Budget": {
+        "on_submit": "expense_pay.budget.clear_budget_cache",
+        "on_update_after_submit": "expense_pay.budget.clear_budget_cache",
+        "on_cancel": "expense_pay.budget.clear_budget_cache"
     }
 }
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-#	"all": [
-#		"expense_pay.tasks.all"
-#	],
-#	"daily": [
-#		"expense_pay.tasks.daily"
-#	],
-#	"hourly": [
-#		"expense_pay.tasks.hourly"
-#	],
-#	"weekly": [
-#		"expense_pay.tasks.weekly"
-#	],
-#	"monthly": [
-#		"expense_pay.tasks.monthly"
-#	],
-# }
+scheduler_events = {
+	"daily": [
+		"expense_pay.account_balance.verify_account_balances",
+		"expense_pay.budget.verify_budget_spend",
+		"expense_pay.period_snapshot.rebuild_period_snapshots"
+	],
+	"daily_long": [
+		"expense_pay.recurring.generate_recurring_expenses_entries"
+	],
+	"weekly_long": [
+		"expense_pay.gl_archive.archive_cancelled_gl_entries"
+	],
+}
+
 
 # Testing
 # -------
@@ -0,0 +1,227 @@
+import frappe
+from frappe.utils import add_days, flt, getdate, now
+
+from expense_pay.allocation import get_cost_center_amounts, get_split_table
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY
+from expense_pay.utils import logger
+
+SNAPSHOT_DOCTYPE = "Expense Period Snapshot"
+SNAPSHOT_ITEM_DOCTYPE = "Expense Period Snapshot Item"
+SNAPSHOT_STATUS_VALID = "Valid"
+SNAPSHOT_STATUS_STALE = "Stale"
+
+# Key of a snapshot total
+SNAPSHOT_DIMENSIONS = ("account", "cost_center", "project", "expense_entry_type")
+
+
+def on_period_closing_voucher_submit(doc, method=None):
+    """Period Closing Voucher on_submit: create (or reset) the snapshot at the period end and compute it in the background."""
+    period_end_date = doc.get("period_end_date") or doc.posting_date
+    name = frappe.db.get_value(SNAPSHOT_DOCTYPE, {"company": doc.company, "period_end_date": period_end_date})
+    snapshot = frappe.get_doc(SNAPSHOT_DOCTYPE, name) if name else frappe.new_doc(SNAPSHOT_DOCTYPE)
+    snapshot.update(
+        {
+            "company": doc.company,
+            "period_end_date": period_end_date,
+            "period_closing_voucher": doc.name,
+            "status": SNAPSHOT_STATUS_STALE,
+        }
+    )
+    snapshot.flags.ignore_permissions = True
+    snapshot.save()
+    enqueue_period_snapshot_rebuild(doc.company)
+
+
+def on_period_closing_voucher_cancel(doc, method=None):
+    """Period Closing Voucher on_cancel: the period is open again, drop its snapshot."""
+    for name in frappe.get_all(SNAPSHOT_DOCTYPE, filters={"period_closing_voucher": doc.name}, pluck="name"):
+        frappe.delete_doc(SNAPSHOT_DOCTYPE, name, ignore_permissions=True, force=True)
+
+
+def invalidate_period_snapshots(doc, method=None):
+    """
+    Expenses Entry on_submit / on_cancel / on_update_after_submit.
+
+    Snapshots hold cumulative totals, so a voucher posted on or before a snapshot's period
+    end changes that snapshot and every later one. They are marked stale (historical
+    queries skip them) and recomputed in the background.
+    """
+    stale = frappe.get_all(
+        SNAPSHOT_DOCTYPE,
+        filters={
+            "company": doc.company,
+            "period_end_date": [">=", doc.posting_date],
+            "status": SNAPSHOT_STATUS_VALID,
+        },
+        pluck="name",
+    )
+    if not stale:
+        return
+    frappe.db.set_value(SNAPSHOT_DOCTYPE, {"name": ["in", stale]}, "status", SNAPSHOT_STATUS_STALE)
+    enqueue_period_snapshot_rebuild(doc.company)
+
+
+def enqueue_period_snapshot_rebuild(company):
+    frappe.enqueue(
+        "expense_pay.period_snapshot.rebuild_period_snapshots",
+        queue="long",
+        timeout=3600,
+        job_id=f"expense_pay_period_snapshots:{company}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        company=company,
+    )
+
+
+def rebuild_period_snapshots(company=None):
+    """
+    Recompute stale snapshots, oldest first, one commit each. Each snapshot is built from
+    the previous (valid) snapshot plus the lines posted after it. Also the daily job that
+    catches snapshots invalidated while a rebuild was already running.
+    """
+    filters = {"status": SNAPSHOT_STATUS_STALE}
+    if company:
+        filters["company"] = company
+
+    rebuilt = 0
+    while True:
+        stale = frappe.get_all(SNAPSHOT_DOCTYPE, filters=filters, pluck="name", order_by="period_end_date asc", limit=1)
+        if not stale:
+            break
+        _rebuild_snapshot(stale[0])
+        frappe.db.commit()
+        rebuilt += 1
+
+    if rebuilt:
+        logger.info(f"Recomputed {rebuilt} expense period snapshots")
+    return rebuilt
+
+
+def _rebuild_snapshot(name):
+    snapshot = frappe.get_doc(SNAPSHOT_DOCTYPE, name)
+    previous = _get_nearest_snapshot(snapshot.company, add_days(snapshot.period_end_date, -1))
+    totals = _get_snapshot_totals(previous.name) if previous else {}
+    _add_line_totals(totals, snapshot.company, previous.period_end_date if previous else None, snapshot.period_end_date)
+
+    snapshot.set("items", _to_rows(totals))
+    snapshot.status = SNAPSHOT_STATUS_VALID
+    snapshot.computed_on = now()
+    snapshot.flags.ignore_permissions = True
+    snapshot.save()
+
+
+@frappe.whitelist()
+def get_expense_totals(company, to_date, from_date=None):
+    """
+    Expense amounts (without VAT, company currency) per account, cost center, project and
+    expense type of submitted Expenses Entries, posted up to `to_date` (or between
+    `from_date` and `to_date`).
+
+    Each bound is the nearest valid snapshot on or before it plus the lines posted after
+    that snapshot, so a historical query only reads the lines of the open period.
+    """
+    frappe.has_permission(SNAPSHOT_DOCTYPE, "read", throw=True)
+    totals = _get_totals_as_of(company, to_date)
+    if from_date:
+        for key, amount in _get_totals_as_of(company, add_days(from_date, -1)).items():
+            totals[key] = totals.get(key, 0.0) - amount
+    return _to_rows(totals)
+
+
+def _get_totals_as_of(company, date):
+    snapshot = _get_nearest_snapshot(company, date)
+    totals = _get_snapshot_totals(snapshot.name) if snapshot else {}
+    _add_line_totals(totals, company, snapshot.period_end_date if snapshot else None, date)
+    return totals
+
+
+def _get_nearest_snapshot(company, date):
+    snapshot = frappe.get_all(
+        SNAPSHOT_DOCTYPE,
+        filters={"company": company, "period_end_date": ["<=", date], "status": SNAPSHOT_STATUS_VALID},
+        fields=["name", "period_end_date"],
+        order_by="period_end_date desc",
+        limit=1,
+    )
+    return snapshot[0] if snapshot else None
+
+
+def _get_snapshot_totals(name):
+    return {
+        _get_key(d): flt(d.amount)
+        for d in frappe.get_all(
+            SNAPSHOT_ITEM_DOCTYPE,
+            filters={"parenttype": SNAPSHOT_DOCTYPE, "parent": name},
+            fields=[*SNAPSHOT_DIMENSIONS, "amount"],
+        )
+    }
+
+
+def _add_line_totals(totals, company, after_date, to_date):
+    """
+    Add the expense lines of submitted vouchers posted in (after_date, to_date] to `totals`.
+
+    Lines without an allocation rule are summed in SQL. Lines with one are split per line by
+    the split stored on the line at submit, exactly as they were posted to the GL, read
+    through a server-side cursor; later edits of the rule do not move past totals.
+    """
+    values = {"company": company, "after_date": after_date, "to_date": getdate(to_date)}
+    conditions = "ee.company = %(company)s and ee.docstatus = 1 and ee.posting_date <= %(to_date)s"
+    if after_date:
+        conditions += " and ee.posting_date > %(after_date)s"
+
+    for d in frappe.db.sql(
+        f"""select e.account_paid_to as account,
+            ifnull(nullif(e.cost_center, ''), ee.default_cost_center) as cost_center,
+            e.project, e.expense_entry_type, sum(e.amount_without_vat) as amount
+        from `tabExpenses` e
+        inner join `tabExpenses Entry` ee on ee.name = e.parent
+        where e.parenttype = %(voucher_type)s and ifnull(e.allocation_rule, '') = '' and {conditions}
+        group by 1, 2, 3, 4""",
+        {**values, "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY},
+        as_dict=True,
+    ):
+        key = _get_key(d)
+        totals[key] = totals.get(key, 0.0) + flt(d.amount)
+
+    # Lines without a stored split fall back to their rule: compile those split tables up
+    # front, no other query may run while the cursor streams
+    for rule in frappe.db.sql_list(
+        f"""select distinct e.allocation_rule
+        from `tabExpenses` e
+        inner join `tabExpenses Entry` ee on ee.name = e.parent
+        where e.parenttype = %(voucher_type)s and ifnull(e.allocation_rule, '') != ''
+            and ifnull(e.allocation_split, '') = '' and {conditions}""",
+        {**values, "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY},
+    ):
+        get_split_table(rule)
+
+    precision = frappe.get_precision("Expenses", "amount_without_vat") or 2
+    with frappe.db.unbuffered_cursor():
+        for d in frappe.db.sql(
+            f"""select e.account_paid_to as account, e.cost_center, e.allocation_rule, e.allocation_split,
+                e.project, e.expense_entry_type, e.amount_without_vat, ee.default_cost_center
+            from `tabExpenses` e
+            inner join `tabExpenses Entry` ee on ee.name = e.parent
+            where e.parenttype = %(voucher_type)s and ifnull(e.allocation_rule, '') != '' and {conditions}""",
+            {**values, "voucher_type": VOUCHER_TYPE_EXPENSES_ENTRY},
+            as_dict=True,
+            as_iterator=True,
+        ):
+            for cost_center, amount in get_cost_center_amounts(d, d, flt(d.amount_without_vat, precision), precision):
+                key = _get_key(d, cost_center=cost_center)
+                totals[key] = totals.get(key, 0.0) + amount
+
+
+def _get_key(row, **overrides):
+    # Empty links come back as NULL or ""; normalize so they land on the same total
+    return tuple(overrides.get(dimension, row.get(dimension)) or None for dimension in SNAPSHOT_DIMENSIONS)
+
+
+def _to_rows(totals):
+    precision = frappe.get_precision(SNAPSHOT_ITEM_DOCTYPE, "amount") or 2
+    return [
+        dict(zip(SNAPSHOT_DIMENSIONS, key), amount=flt(amount, precision))
+        for key, amount in sorted(totals.items(), key=lambda item: tuple(value or "" for value in item[0]))
+        if flt(amount, precision)
+    ]
@@ -0,0 +1,260 @@
+import frappe
+from frappe.model import no_value_fields, table_fields
+from frappe.utils import add_days, add_months, cint, create_batch, getdate, nowdate
+
+from expense_pay.budget import add_pending_budget_spend, clear_pending_budget_spend
+from expense_pay.create_gl_entry import (
+    VOUCHER_TYPE_EXPENSES_ENTRY,
+    _post_gl_entries,
+    _set_gl_posting_hash,
+    build_gl_entries,
+    get_gl_posting_hash,
+    logger,
+    run_with_lock_retry,
+    validate_all_accounts,
+)
+
+RECURRING_DOCTYPE = "Recurring Expenses Entry"
+RECURRING_BATCH_SIZE = 200
+# Upper bound of occurrences generated per template and run (catch-up after downtime)
+RECURRING_MAX_OCCURRENCES = 366
+
+FREQUENCY_DAYS = {"Daily": 1, "Weekly": 7}
+FREQUENCY_MONTHS = {"Monthly": 1, "Quarterly": 3, "Half-yearly": 6, "Yearly": 12}
+
+# Header and row fields never copied from the reference voucher. Exchange rates are left
+# empty so the new voucher takes the Currency Exchange of its own posting date.
+_SKIP_FIELDS = {
+    "name", "owner", "creation", "modified", "modified_by", "docstatus", "idx", "amended_from",
+    "exchange_rate", "exchange_rate_date", "currency_exchange_link",
+}
+
+
+def get_next_date(start_date, current_date, frequency):
+    """
+    Next occurrence after `current_date`. Month-based schedules are anchored on the start
+    date, so a series starting on the 31st returns to the 31st after a short month.
+    """
+    start_date, current_date = getdate(start_date), getdate(current_date)
+    if frequency in FREQUENCY_DAYS:
+        return getdate(add_days(current_date, FREQUENCY_DAYS[frequency]))
+
+    step = FREQUENCY_MONTHS[frequency]
+    months = (current_date.year - start_date.year) * 12 + current_date.month - start_date.month
+    months = max(months // step * step, 0)
+    next_date = getdate(add_months(start_date, months))
+    while next_date <= current_date:
+        months += step
+        next_date = getdate(add_months(start_date, months))
+    return next_date
+
+
+def generate_recurring_expenses_entries(posting_date=None):
+    """
+    daily_long scheduler event: create all Expenses Entries due up to `posting_date`.
+
+    Templates are processed in batches with one commit per batch. Reference vouchers of a
+    batch are loaded in two queries, and the GL rows of all vouchers submitted in the batch
+    are posted together. Every generated voucher carries a unique recurrence key
+    (``<template>:<date>``), so a rerun or an overlapping run skips what already exists.
+    """
+    posting_date = getdate(posting_date or nowdate())
+    templates = frappe.get_all(
+        RECURRING_DOCTYPE,
+        filters={"disabled": 0, "next_date": ["<=", posting_date]},
+        fields=["name", "reference_document", "frequency", "start_date", "end_date", "next_date", "submit_on_creation"],
+        order_by="name asc",
+    )
+    templates = [t for t in templates if not t.end_date or getdate(t.next_date) <= getdate(t.end_date)]
+
+    generated = 0
+    for batch in create_batch(templates, RECURRING_BATCH_SIZE):
+        try:
+            generated += _generate_batch(batch, posting_date)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            logger.warning(
+                f"Recurring Expenses Entry batch {batch[0].name}..{batch[-1].name} failed, retrying per template: "
+                f"{frappe.get_traceback()}"
+            )
+            generated += _generate_per_template(batch, posting_date)
+
+    logger.info(f"Recurring Expenses Entries: {generated} vouchers generated from {len(templates)} templates")
+    return generated
+
+
+def _generate_batch(templates, posting_date):
+    references = _load_reference_documents({t.reference_document for t in templates})
+    schedule = {t.name: _get_due_dates(t, posting_date) for t in templates}
+    existing = set(
+        frappe.get_all(
+            VOUCHER_TYPE_EXPENSES_ENTRY,
+            filters={
+                "recurrence_key": ["in", [f"{name}:{d}" for name, dates in schedule.items() for d in dates] or [""]]
+            },
+            pluck="recurrence_key",
+        )
+    )
+
+    created = 0
+    submitted = []
+    template_updates = {}
+    frappe.flags.in_bulk_expenses_action = True
+    mute_messages = frappe.flags.mute_messages
+    frappe.flags.mute_messages = True
+    try:
+        for template in templates:
+            last_entry = None
+            for due_date in schedule[template.name]:
+                recurrence_key = f"{template.name}:{due_date}"
+                if recurrence_key in existing:
+                    continue
+                doc = _make_expenses_entry(references[template.reference_document], template, due_date, recurrence_key)
+                if cint(template.submit_on_creation):
+                    doc.submit()
+                    submitted.append(doc)
+                    # GL rows are posted for the whole batch below: count them in the next checks
+                    add_pending_budget_spend(doc, build_gl_entries(doc))
+                created += 1
+                last_entry = doc.name
+
+            update = {"next_date": _get_next_date_after(template, schedule[template.name])}
+            if last_entry:
+                update["last_generated_entry"] = last_entry
+            template_updates[template.name] = update
+
+        _post_gl_entries_for_batch(submitted)
+    finally:
+        frappe.flags.in_bulk_expenses_action = False
+        frappe.flags.mute_messages = mute_messages
+        clear_pending_budget_spend()
+
+    frappe.db.bulk_update(RECURRING_DOCTYPE, template_updates, update_modified=False)
+    return created
+
+
+def _generate_per_template(templates, posting_date):
+    """
+    Fallback: generate each template on its own through the regular submit hooks, in its own
+    transaction, retried from scratch on deadlock.
+    """
+    generated = 0
+    for template in templates:
+        try:
+            generated += run_with_lock_retry(_generate_template, template, posting_date)
+        except Exception:
+            frappe.db.rollback()
+            logger.error(f"Recurring Expenses Entry {template.name} failed: {frappe.get_traceback()}")
+    return generated
+
+
+def _generate_template(template, posting_date):
+    reference = _load_reference_documents({template.reference_document})[template.reference_document]
+    due_dates = _get_due_dates(template, posting_date)
+    created = []
+    for due_date in due_dates:
+        recurrence_key = f"{template.name}:{due_date}"
+        if frappe.db.exists(VOUCHER_TYPE_EXPENSES_ENTRY, {"recurrence_key": recurrence_key}):
+            continue
+        doc = _make_expenses_entry(reference, template, due_date, recurrence_key)
+        if cint(template.submit_on_creation):
+            doc.submit()
+        created.append(doc.name)
+
+    update = {"next_date": _get_next_date_after(template, due_dates)}
+    if created:
+        update["last_generated_entry"] = created[-1]
+    frappe.db.set_value(RECURRING_DOCTYPE, template.name, update, update_modified=False)
+    frappe.db.commit()
+    return len(created)
+
+
+def _get_due_dates(template, posting_date):
+    due_dates = []
+    due_date = getdate(template.next_date)
+    end_date = getdate(template.end_date) if template.end_date else None
+    while due_date <= posting_date and (not end_date or due_date <= end_date):
+        due_dates.append(due_date)
+        if len(due_dates) >= RECURRING_MAX_OCCURRENCES:
+            break
+        due_date = get_next_date(template.start_date, due_date, template.frequency)
+    return due_dates
+
+
+def _get_next_date_after(template, due_dates):
+    if not due_dates:
+        return template.next_date
+    return get_next_date(template.start_date, due_dates[-1], template.frequency)
+
+
+def _load_reference_documents(names):
+    """Copyable header and row values of the reference vouchers, in two queries."""
+    names = list(names)
+    header_fields = _get_copy_fields(VOUCHER_TYPE_EXPENSES_ENTRY) + ["name"]
+    row_fields = _get_copy_fields("Expenses") + ["parent"]
+
+    references = {
+        d.pop("name"): frappe._dict(d, expenses=[])
+        for d in frappe.get_all(
+            VOUCHER_TYPE_EXPENSES_ENTRY, filters={"name": ["in", names]}, fields=header_fields
+        )
+    }
+    for d in frappe.get_all(
+        "Expenses",
+        filters={"parenttype": VOUCHER_TYPE_EXPENSES_ENTRY, "parentfield": "expenses", "parent": ["in", names]},
+        fields=row_fields,
+        order_by="parent asc, idx asc",
+    ):
+        references[d.pop("parent")].expenses.append(d)
+    return references
+
+
+def _get_copy_fields(doctype):
+    return [
+        df.fieldname
+        for df in frappe.get_meta(doctype).fields
+        if not df.no_copy
+        and df.fieldtype not in no_value_fields
+        and df.fieldtype not in table_fields
+        and df.fieldname not in _SKIP_FIELDS
+    ]
+
+
+def _make_expenses_entry(reference, template, posting_date, recurrence_key):
+    doc = frappe.get_doc(
+        {
+            **reference,
+            "doctype": VOUCHER_TYPE_EXPENSES_ENTRY,
+            "expenses": [dict(d) for d in reference.expenses],
+            "posting_date": posting_date,
+            "recurring_expenses_entry": template.name,
+            "recurrence_key": recurrence_key,
+        }
+    )
+    doc.flags.ignore_permissions = True
+    doc.insert()
+    return doc
+
+
+def _post_gl_entries_for_batch(docs):
+    """
+    Post the GL rows of all vouchers submitted in a batch in one locked posting.
+
+    Accounts are validated per voucher first, like create_gl_entries does on submit: an
+    invalid one fails the batch, which is then generated per template through the hooks.
+    """
+    if not docs:
+        return
+
+    gl_entries = []
+    posting_hashes = {}
+    for doc in docs:
+        validate_all_accounts(doc)
+        doc_gl_entries = build_gl_entries(doc)
+        posting_hashes[doc.name] = get_gl_posting_hash(doc_gl_entries)
+        gl_entries.extend(doc_gl_entries)
+
+    _post_gl_entries(f"{len(docs)} recurring Expenses Entries", gl_entries)
+    for name, posting_hash in posting_hashes.items():
+        _set_gl_posting_hash(name, posting_hash)
@@ -0,0 +1,140 @@
+import re
+
+import frappe
+from frappe import _
+from frappe.desk.reportview import get_match_cond
+from frappe.utils import cint, flt, now
+
+from expense_pay.create_gl_entry import VOUCHER_TYPE_EXPENSES_ENTRY
+
+SEARCH_INDEX_DOCTYPE = "Expense Search Index"
+SEARCH_MAX_PAGE_LENGTH = 100
+# InnoDB FULLTEXT ignores shorter words (innodb_ft_min_token_size)
+SEARCH_MIN_TERM_LENGTH = 3
+
+SEARCH_STATUS = {0: "Draft", 1: "Submitted", 2: "Cancelled"}
+
+_SEARCH_INDEX_COLUMNS = (
+    "name",
+    "expenses_entry",
+    "company",
+    "posting_date",
+    "status",
+    "total_amount",
+    "content",
+    "owner",
+    "modified_by",
+    "creation",
+    "modified",
+)
+
+
+def build_search_content(doc, expenses):
+    """Searchable text of a voucher: remarks, expense types, accounts and amounts of the voucher and its lines."""
+    parts = [doc.name, doc.remarks, doc.account_paid_from, _format_amount(doc.paid_amount)]
+    for d in expenses:
+        parts.extend(
+            (
+                d.expense_entry_type,
+                d.account_paid_to,
+                d.remarks,
+                _format_amount(d.amount_without_vat),
+                _format_amount(d.amount),
+            )
+        )
+    return " ".join(str(part) for part in parts if part)
+
+
+def _format_amount(amount):
+    return f"{flt(amount):.2f}" if flt(amount) else None
+
+
+def update_search_index(doc, method=None):
+    """Expenses Entry on_update / on_submit / on_update_after_submit / on_cancel."""
+    write_search_index_rows([(doc, doc.expenses)])
+
+
+def delete_search_index(doc, method=None):
+    """Expenses Entry on_trash."""
+    frappe.db.delete(SEARCH_INDEX_DOCTYPE, {"name": doc.name})
+
+
+def write_search_index_rows(vouchers):
+    """Replace the index rows of `[(header, expenses), ...]` with one delete and one insert."""
+    if not vouchers:
+        return
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.delete(SEARCH_INDEX_DOCTYPE, {"name": ["in", [header.name for header, _expenses in vouchers]]})
+    frappe.db.bulk_insert(
+        SEARCH_INDEX_DOCTYPE,
+        _SEARCH_INDEX_COLUMNS,
+        [
+            (
+                header.name,
+                header.name,
+                header.company,
+                header.posting_date,
+                SEARCH_STATUS.get(cint(header.docstatus)),
+                flt(header.total_debit),
+                build_search_content(header, expenses),
+                user,
+                user,
+                timestamp,
+                timestamp,
+            )
+            for header, expenses in vouchers
+        ],
+    )
+
+
+@frappe.whitelist()
+def search_expenses(query, company=None, status=None, start=0, page_length=20):
+    """
+    Full-text search over Expenses Entries, best match first.
+
+    Every word of `query` must match (as a word prefix) the voucher's or a line's remarks,
+    expense type, account or amount. Served from the FULLTEXT index of Expense Search
+    Index, joined to the vouchers so the user's permission conditions (user permissions,
+    permission query hooks, shared documents) apply before paging. Returns
+    ``{"data": [...], "has_more": bool}``.
+    """
+    frappe.has_permission(VOUCHER_TYPE_EXPENSES_ENTRY, "read", throw=True)
+    if frappe.db.db_type != "mariadb":
+        frappe.throw(_("Expense search requires MariaDB full-text indexes."))
+
+    terms = [t for t in re.findall(r"\w+", query or "") if len(t) >= SEARCH_MIN_TERM_LENGTH]
+    if not terms:
+        frappe.throw(_("Enter at least one word of {0} or more characters.").format(SEARCH_MIN_TERM_LENGTH))
+
+    page_length = min(cint(page_length) or 20, SEARCH_MAX_PAGE_LENGTH)
+    values = {
+        "against": " ".join(f"+{t}*" for t in terms),
+        "company": company,
+        "status": status,
+        "start": max(cint(start), 0),
+        "page_length": page_length + 1,
+    }
+    conditions = ["match(esi.content) against (%(against)s in boolean mode)"]
+    if company:
+        conditions.append("esi.company = %(company)s")
+    if status:
+        conditions.append("esi.status = %(status)s")
+
+    # Conditions on `tabExpenses Entry`, "%" already escaped for the query values
+    match_conditions = get_match_cond(VOUCHER_TYPE_EXPENSES_ENTRY)
+
+    rows = frappe.db.sql(
+        f"""select esi.expenses_entry, esi.company, esi.posting_date, esi.status, esi.total_amount,
+            left(esi.content, 200) as content,
+            match(esi.content) against (%(against)s in boolean mode) as score
+        from `tabExpense Search Index` esi
+        inner join `tabExpenses Entry` on `tabExpenses Entry`.name = esi.expenses_entry
+        where {" and ".join(conditions)} {match_conditions}
+        order by score desc, esi.posting_date desc, esi.expenses_entry desc
+        limit %(start)s, %(page_length)s""",
+        values,
+        as_dict=True,
+    )
+    has_more = len(rows) > page_length
+    return {"data": rows[:page_length], "has_more": has_more}
@@ -0,0 +1,54 @@
+import logging
+
+import frappe
+
+
+class LazyLogger:
+    """
+    Stand-in for ``frappe.logger(module)`` that builds the logger and its file handler on
+    first use instead of at import time. Frappe caches loggers per site, so later calls
+    are a dict lookup. Only this logger's level is changed, not the process-wide one.
+    """
+
+    def __init__(self, module, level=logging.DEBUG, file_count=1):
+        self.module = module
+        self.level = level
+        self.file_count = file_count
+
+    def get_logger(self):
+        logger = frappe.logger(self.module, allow_site=True, file_count=self.file_count)
+        logger.setLevel(self.level)
+        return logger
+
+    def __getattr__(self, name):
+        return getattr(self.get_logger(), name)
+
+
+logger = LazyLogger("expensepay")
+
+
+def lock_accounts(accounts):
+    """
+    Lock Account rows in a fixed (sorted) order.
+
+    Every expense_pay write that touches per-account state (GL posting, running balances,
+    budget counters) takes these locks first, so concurrent submitters hitting the same
+    accounts (typically one cash account as Account Paid From) queue on the first shared
+    account instead of taking locks in row order and deadlocking each other.
+    """
+    accounts = sorted({account for account in accounts if account})
+    if not accounts:
+        return
+    frappe.db.sql(
+        "select name from `tabAccount` where name in %(accounts)s order by name for update",
+        {"accounts": accounts},
+    )
+
+
+def stream_sql(query, values=None):
+    """
+    Yield rows of `query` from a server-side (unbuffered) cursor so memory does not grow
+    with the table. No other query may run on the connection until the rows are consumed.
+    """
+    with frappe.db.unbuffered_cursor():
+        yield from frappe.db.sql(query, values, as_iterator=True)
@@ -0,0 +1,134 @@
+import time
+
+import frappe
+from frappe.utils import add_days, cint, nowdate
+
+from expense_pay.allocation import get_split_table
+from expense_pay.budget import get_budgets
+from expense_pay.expense_pay.doctype.expense_entry_type.expense_entry_type import get_expense_entry_type_index_data
+from expense_pay.utils import logger
+
+# Set while the caches are warm; Redis is flushed on migrate and `bench clear-cache`,
+# which is exactly when a new warmup is due.
+WARMUP_DONE_CACHE_KEY = "expense_pay:warmup_done"
+WARMUP_JOB_ID = "expense_pay_warmup"
+WARMUP_DEFAULT_MAX_DOCUMENTS = 1000
+# Accounts used by Expenses Entries posted in this window are warmed first
+WARMUP_ACCOUNT_WINDOW_DAYS = 90
+
+
+def enqueue_warmup():
+    """after_migrate: warm the caches in the background once the new code is in place."""
+    if not _get_max_documents():
+        return
+    frappe.enqueue(
+        "expense_pay.warmup.warm_caches",
+        queue="short",
+        job_id=WARMUP_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def boot_session(bootinfo):
+    """boot_session: the first desk load after a cache flush (deploy, worker recycle) triggers a warmup."""
+    if frappe.cache().get_value(WARMUP_DONE_CACHE_KEY):
+        return
+    frappe.cache().set_value(WARMUP_DONE_CACHE_KEY, "queued", expires_in_sec=600)
+    enqueue_warmup()
+
+
+def warm_caches(max_documents=None):
+    """
+    Preload the master data expense_pay reads on submit into Redis, per company.
+
+    Loads the Expense Entry Settings, the Expense Entry Type index, and per company: the
+    current fiscal year, its budgets, the enabled allocation rules (documents and split
+    tables), the VAT templates and the most used accounts. At most `max_documents` documents are loaded (Expense Entry
+    Settings → Cache Warmup Max Documents); the most used accounts come first so a small
+    limit still covers the common submits.
+    """
+    max_documents = cint(max_documents if max_documents is not None else _get_max_documents())
+    if max_documents <= 0:
+        return 0
+
+    from erpnext.accounts.utils import FiscalYearError, get_fiscal_year
+
+    start = time.monotonic()
+    loaded = 0
+
+    frappe.get_cached_doc("Expense Entry Settings")
+    get_expense_entry_type_index_data()
+
+    for company in frappe.get_all("Company", pluck="name", order_by="name asc"):
+        frappe.get_cached_doc("Company", company)
+        loaded += 1
+
+        try:
+            fiscal_year = get_fiscal_year(nowdate(), company=company)[0]
+        except FiscalYearError:
+            fiscal_year = None
+        if fiscal_year:
+            get_budgets(company, fiscal_year)
+
+        for rule in frappe.get_all(
+            "Expense Allocation Rule", filters={"company": company, "disabled": 0}, pluck="name"
+        ):
+            frappe.get_cached_doc("Expense Allocation Rule", rule)
+            get_split_table(rule)
+
+        for doctype, names in (
+            ("Account", _get_used_accounts(company, max_documents - loaded)),
+            (
+                "Purchase Taxes and Charges Template",
+                frappe.get_all(
+                    "Purchase Taxes and Charges Template",
+                    filters={"company": company, "disabled": 0},
+                    pluck="name",
+                    limit=max(max_documents - loaded, 0),
+                ),
+            ),
+        ):
+            for name in names:
+                if loaded >= max_documents:
+                    break
+                frappe.get_cached_doc(doctype, name)
+                loaded += 1
+
+        if loaded >= max_documents:
+            break
+
+    frappe.cache().set_value(WARMUP_DONE_CACHE_KEY, "done")
+    logger.info(f"Warmed expense_pay caches: {loaded} documents in {time.monotonic() - start:.2f}s")
+    return loaded
+
+
+def _get_used_accounts(company, limit):
+    """Accounts of a company by how often recent Expenses Entries used them."""
+    if limit <= 0:
+        return []
+    return frappe.db.sql_list(
+        """select account from (
+            select ee.account_paid_from as account
+            from `tabExpenses Entry` ee
+            where ee.company = %(company)s and ee.posting_date >= %(from_date)s and ee.docstatus < 2
+            union all
+            select e.account_paid_to as account
+            from `tabExpenses` e
+            inner join `tabExpenses Entry` ee on ee.name = e.parent
+            where e.parenttype = 'Expenses Entry' and ee.company = %(company)s
+                and ee.posting_date >= %(from_date)s and ee.docstatus < 2
+        ) used
+        where account is not null
+        group by account
+        order by count(*) desc, account asc
+        limit %(limit)s""",
+        {"company": company, "from_date": add_days(nowdate(), -WARMUP_ACCOUNT_WINDOW_DAYS), "limit": limit},
+    )
+
+
+def _get_max_documents():
+    settings = frappe.get_cached_doc("Expense Entry Settings")
+    if settings.get("disable_cache_warmup"):
+        return 0
+    return cint(settings.get("warmup_max_documents")) or WARMUP_DEFAULT_MAX_DOCUMENTS